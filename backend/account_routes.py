@@ -1,7 +1,7 @@
 # Create file: account_routes.py
 import azure.functions as func
 import json
-from passlib.hash import bcrypt
+from password_hashing import hash_password, verify_password
 from models import PasswordChange, UserSettings
 from database import get_user_by_email, _container
 from user_routes import verify_session
@@ -20,11 +20,11 @@ def change_password(req: func.HttpRequest) -> func.HttpResponse:
             return func.HttpResponse(json.dumps({"error": "User not found"}), status_code=404)
 
         # Verify current password
-        if not bcrypt.verify(pw_change.current_password, user_doc["password"]):
+        if not verify_password(pw_change.current_password, user_doc["password"]):
             return func.HttpResponse(json.dumps({"error": "Current password is incorrect"}), status_code=400)
 
         # Update to new password
-        user_doc["password"] = bcrypt.hash(pw_change.new_password)
+        user_doc["password"] = hash_password(pw_change.new_password)
         _container.upsert_item(user_doc)
 
         # Send password change notification email
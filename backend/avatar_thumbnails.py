@@ -0,0 +1,139 @@
+# avatar_thumbnails.py
+"""
+Fixed-size avatar thumbnails.
+
+Avatars are uploaded by the browser straight to blob storage (see blob_storage.py).
+A blob trigger then calls process_avatar(), which centre-crops the image to a square,
+renders one thumbnail per size in AVATAR_THUMBNAIL_SIZES (WebP by default, JPEG with
+AVATAR_THUMBNAIL_FORMAT=JPEG) and stores them next to the original under a derived
+prefix:
+
+    <email>/<timestamp>_<random>_me.png  ->  thumbnails/<size>/<email>/<timestamp>_<random>_me.webp
+
+The thumbnails are recorded in their own document in the users container rather
+than on the user document, which many routes upsert whole (a profile save racing the
+blob trigger would otherwise write back stale thumbnails):
+
+    {"id": "avatar_thumbnails:<email>", "type": "avatar_thumbnails", "user_email",
+     "blob_name", "source": <original URL>, "sizes": {"<size>": <URL>, ...}}
+
+avatar_thumbnails_for() returns the size -> URL map only while it still belongs to
+the user's current avatar, so pages fall back to `avatar` until processing is done.
+"""
+import io
+import os
+import logging
+from typing import Dict, Optional
+from azure.storage.blob import ContentSettings
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from blob_storage import get_container_client, delete_avatars
+from database import _container, etag_merge
+
+AVATAR_THUMBNAIL_SIZES = [int(size) for size in os.environ.get("AVATAR_THUMBNAIL_SIZES", "64,128,256").split(",")]
+AVATAR_THUMBNAIL_FORMAT = os.environ.get("AVATAR_THUMBNAIL_FORMAT", "WEBP").upper()
+AVATAR_THUMBNAIL_QUALITY = 80
+THUMBNAIL_PREFIX = "thumbnails/"
+
+_EXTENSIONS = {"WEBP": ("webp", "image/webp"), "JPEG": ("jpg", "image/jpeg")}
+
+def thumbnails_doc_id(user_email: str) -> str:
+    return f"avatar_thumbnails:{user_email}"
+
+def is_thumbnail(blob_name: str) -> bool:
+    return blob_name.startswith(THUMBNAIL_PREFIX)
+
+def thumbnail_blob_name(blob_name: str, size: int) -> str:
+    stem = os.path.splitext(blob_name)[0]
+    return f"{THUMBNAIL_PREFIX}{size}/{stem}.{_EXTENSIONS[AVATAR_THUMBNAIL_FORMAT][0]}"
+
+def make_thumbnails(data: bytes) -> Dict[int, bytes]:
+    """Encoded square thumbnails for every configured size, from one decode of the original"""
+    # Imported here so the profile/dashboard routes don't load Pillow just to read URLs
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        # JPEG has no alpha channel; WebP keeps transparency
+        image = image.convert("RGBA" if AVATAR_THUMBNAIL_FORMAT == "WEBP" else "RGB")
+
+        thumbnails = {}
+        # Largest first, so each smaller size is resampled from an already-reduced image
+        for size in sorted(AVATAR_THUMBNAIL_SIZES, reverse=True):
+            image = ImageOps.fit(image, (size, size), method=Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, format=AVATAR_THUMBNAIL_FORMAT, quality=AVATAR_THUMBNAIL_QUALITY)
+            thumbnails[size] = out.getvalue()
+        return thumbnails
+
+def process_avatar(blob_name: str, data: bytes) -> Optional[dict]:
+    """
+    Build and upload the thumbnails for an uploaded avatar and record them for the
+    owner. Returns {"source", "<size>": url, ...}, or None when the blob isn't an
+    avatar upload.
+    """
+    if is_thumbnail(blob_name) or "/" not in blob_name:
+        return None
+
+    container_client = get_container_client()
+    content_type = _EXTENSIONS[AVATAR_THUMBNAIL_FORMAT][1]
+    source = container_client.get_blob_client(blob_name).url
+    sizes = {}
+
+    for size, encoded in make_thumbnails(data).items():
+        blob_client = container_client.get_blob_client(thumbnail_blob_name(blob_name, size))
+        blob_client.upload_blob(
+            encoded,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type, cache_control="public, max-age=31536000")
+        )
+        sizes[str(size)] = blob_client.url
+
+    user_email = blob_name.split("/", 1)[0]
+
+    def record(doc):
+        # Blob names start with the upload timestamp; a slower run for an older upload
+        # must not replace the thumbnails of a newer one
+        if doc.get("blob_name", "") <= blob_name:
+            doc.update({"blob_name": blob_name, "source": source, "sizes": sizes})
+
+    try:
+        etag_merge(
+            _container,
+            thumbnails_doc_id(user_email),
+            thumbnails_doc_id(user_email),
+            record,
+            new_doc=lambda: {"id": thumbnails_doc_id(user_email), "type": "avatar_thumbnails", "user_email": user_email}
+        )
+    except Exception as e:
+        logging.error(f"Error recording avatar thumbnails for {user_email}: {str(e)}")
+
+    logging.info(f"Generated {len(sizes)} thumbnails for {blob_name}")
+    return {"source": source, **sizes}
+
+def avatar_thumbnails_for(user_doc: dict) -> Dict[str, str]:
+    """{"64": url, ...} for the user's current avatar, or {} if none have been generated yet"""
+    avatar = (user_doc.get("avatar") or "").split("?", 1)[0]
+    user_email = user_doc.get("email") or user_doc.get("id")
+    if not avatar or not user_email:
+        return {}
+    try:
+        thumbnails = _container.read_item(item=thumbnails_doc_id(user_email), partition_key=thumbnails_doc_id(user_email))
+    except CosmosResourceNotFoundError:
+        return {}
+    if thumbnails.get("source") != avatar:
+        return {}
+    return thumbnails.get("sizes", {})
+
+def delete_user_thumbnails(user_email: str) -> dict:
+    """Deletes every thumbnail generated for a user's avatars (with blob_storage.delete_user_avatars)"""
+    container_client = get_container_client()
+    blob_names = [
+        blob.name
+        for size in AVATAR_THUMBNAIL_SIZES
+        for blob in container_client.list_blobs(name_starts_with=f"{THUMBNAIL_PREFIX}{size}/{user_email}/")
+    ]
+    try:
+        _container.delete_item(item=thumbnails_doc_id(user_email), partition_key=thumbnails_doc_id(user_email))
+    except CosmosResourceNotFoundError:
+        pass
+    return delete_avatars(blob_names)
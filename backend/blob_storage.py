@@ -1,8 +1,22 @@
 # blob_storage.py
+"""
+Avatar storage in Azure Blob Storage.
+
+Clients are kept in a module-level registry: the BlobServiceClient for a connection
+string (and its HTTP pipeline / connection pool) and the container clients are built
+once per process and reused by every call.
+
+Upload URLs are signed with the account key, which is a local HMAC with no service
+round trip, so every request gets a fresh blob name and SAS: re-uploading a file with
+the same name never reuses an earlier blob or avatar URL.
+"""
 import os
+import uuid
 import logging
+import threading
 from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+from typing import Dict, List, Tuple
+from azure.storage.blob import BlobServiceClient, ContainerClient, generate_blob_sas, BlobSasPermissions
 from azure.core.exceptions import AzureError
 
 # Configure logging
@@ -13,6 +27,41 @@ logger = logging.getLogger(__name__)
 STORAGE_CONNECTION_STRING = os.environ.get("STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = os.environ.get("STORAGE_CONTAINER_NAME", "user-avatars")
 
+AVATAR_SAS_VALIDITY_MINUTES = 30
+BLOB_DELETE_BATCH_SIZE = 256  # Max sub-requests in one Blob batch call
+
+# ---- client registry ----
+
+_service_clients: Dict[str, BlobServiceClient] = {}
+_container_clients: Dict[Tuple[str, str], ContainerClient] = {}
+_clients_lock = threading.Lock()
+
+def get_blob_service_client(connection_string: str = None) -> BlobServiceClient:
+    """Shared BlobServiceClient for a connection string (created on first use)"""
+    connection_string = connection_string or STORAGE_CONNECTION_STRING
+    if not connection_string:
+        raise ValueError("Storage connection string is not configured")
+    with _clients_lock:
+        client = _service_clients.get(connection_string)
+        if client is None:
+            client = BlobServiceClient.from_connection_string(connection_string)
+            _service_clients[connection_string] = client
+        return client
+
+def get_container_client(container_name: str = None, connection_string: str = None) -> ContainerClient:
+    """Shared ContainerClient (the avatar container by default)"""
+    container_name = container_name or CONTAINER_NAME
+    service_client = get_blob_service_client(connection_string)
+    key = (service_client.url, container_name)
+    with _clients_lock:
+        client = _container_clients.get(key)
+        if client is None:
+            client = service_client.get_container_client(container_name)
+            _container_clients[key] = client
+        return client
+
+# ---- upload URLs ----
+
 def generate_avatar_upload_url(user_email, filename):
     """
     Generates a SAS URL for direct browser upload to blob storage.
@@ -25,27 +74,24 @@ def generate_avatar_upload_url(user_email, filename):
         if not filename:
             raise ValueError("Filename is required")
 
-        # Validate storage connection
-        if not STORAGE_CONNECTION_STRING:
-            raise ValueError("Storage connection string is not configured")
+        # Sanitize filename to prevent path traversal
+        safe_filename = os.path.basename(filename)
 
-        # Create blob service client
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
-            container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+            blob_service_client = get_blob_service_client()
+            container_client = get_container_client()
         except Exception as e:
             logger.error(f"Failed to create blob service client: {str(e)}")
             raise
 
-        # Create a safe blob name using user email as folder
-        # Sanitize filename to prevent path traversal
-        safe_filename = os.path.basename(filename)
+        # Create a safe blob name using user email as folder; the random part keeps two
+        # uploads of the same file within one second from sharing a blob (and avatar URL)
         timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        blob_name = f"{user_email}/{timestamp}_{safe_filename}"
-        
+        blob_name = f"{user_email}/{timestamp}_{uuid.uuid4().hex[:8]}_{safe_filename}"
+
         # Get blob client
         blob_client = container_client.get_blob_client(blob_name)
-        
+
         # Generate SAS token with write permission (for frontend upload)
         try:
             sas_token = generate_blob_sas(
@@ -54,21 +100,21 @@ def generate_avatar_upload_url(user_email, filename):
                 blob_name=blob_name,
                 account_key=blob_service_client.credential.account_key,
                 permission=BlobSasPermissions(write=True, create=True),
-                expiry=datetime.utcnow() + timedelta(minutes=30)
+                expiry=datetime.utcnow() + timedelta(minutes=AVATAR_SAS_VALIDITY_MINUTES)
             )
         except Exception as e:
             logger.error(f"Failed to generate SAS token: {str(e)}")
             raise
-        
+
         # Full URL for upload
         upload_url = f"{blob_client.url}?{sas_token}"
-        
+
         # Public URL for access after upload
         public_url = blob_client.url
-        
+
         logger.info(f"Generated upload URL for {user_email}: {upload_url}")
         logger.info(f"Public avatar URL: {public_url}")
-        
+
         return {
             "uploadUrl": upload_url,
             "avatarUrl": public_url,
@@ -78,6 +124,8 @@ def generate_avatar_upload_url(user_email, filename):
         logger.error(f"Error in generate_avatar_upload_url: {str(e)}")
         raise
 
+# ---- deletes ----
+
 def delete_avatar(blob_name):
     """
     Deletes an avatar blob by its full name.
@@ -87,13 +135,8 @@ def delete_avatar(blob_name):
         if not blob_name:
             raise ValueError("Blob name is required")
 
-        # Create blob service client
-        blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.delete_blob()
-        
+        get_container_client().get_blob_client(blob_name).delete_blob()
+
         logger.info(f"Successfully deleted blob: {blob_name}")
         return True
     except AzureError as e:
@@ -101,4 +144,35 @@ def delete_avatar(blob_name):
         return False
     except Exception as e:
         logger.error(f"Error deleting blob {blob_name}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def delete_avatars(blob_names: List[str]) -> dict:
+    """
+    Deletes many avatar blobs with Blob batch requests (up to 256 per call).
+    Returns {"deleted": n, "failed": [blob names]}; blobs already gone count as deleted.
+    """
+    container_client = get_container_client()
+    deleted, failed = 0, []
+    for i in range(0, len(blob_names), BLOB_DELETE_BATCH_SIZE):
+        chunk = blob_names[i:i + BLOB_DELETE_BATCH_SIZE]
+        try:
+            responses = container_client.delete_blobs(*chunk, raise_on_any_failure=False)
+        except AzureError as e:
+            logger.error(f"Azure error deleting {len(chunk)} blobs: {str(e)}")
+            failed.extend(chunk)
+            continue
+        for blob_name, response in zip(chunk, responses):
+            if response.status_code in (202, 404):
+                deleted += 1
+            else:
+                failed.append(blob_name)
+
+    logger.info(f"Deleted {deleted} blobs ({len(failed)} failed)")
+    return {"deleted": deleted, "failed": failed}
+
+def delete_user_avatars(user_email: str) -> dict:
+    """Deletes every blob under a user's folder (account cleanup)"""
+    if not user_email:
+        raise ValueError("User email is required")
+    blob_names = [blob.name for blob in get_container_client().list_blobs(name_starts_with=f"{user_email}/")]
+    return delete_avatars(blob_names)
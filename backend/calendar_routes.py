@@ -1,11 +1,21 @@
 # calendar_routes.py with enhanced error handling
 import azure.functions as func
+import io
+import os
 import json
 import traceback
+from itertools import islice
 from models import CalendarEvent
 from database import create_calendar_event, get_user_events, update_calendar_event, delete_calendar_event
+from database import create_calendar_events, iter_user_events
+from ical import ICalendarError, iter_ics_events, iter_ics_lines
+from recurrence import occurrence_id
+from datetime import date
 from user_routes import verify_session
 
+# Events parsed from an .ics upload are validated and written this many at a time
+ICAL_IMPORT_BATCH_SIZE = int(os.environ.get("ICAL_IMPORT_BATCH_SIZE", 200))
+
 def get_events(req: func.HttpRequest) -> func.HttpResponse:
     is_valid, identity = verify_session(req)
     if not is_valid:
@@ -132,4 +142,92 @@ def delete_event(req: func.HttpRequest) -> func.HttpResponse:
     except Exception as e:
         print(f"Error deleting event: {str(e)}")
         print(traceback.format_exc())
-        return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500)
\ No newline at end of file
+        return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500)
+
+def export_events_ics(req: func.HttpRequest) -> func.HttpResponse:
+    """Download the user's calendar as an iCalendar (.ics) file"""
+    is_valid, identity = verify_session(req)
+    if not is_valid:
+        return func.HttpResponse(json.dumps({"error": identity}), status_code=401)
+
+    try:
+        # Events are serialized as the Cosmos pages arrive; HttpResponse still needs
+        # the whole body, so the lines are joined once at the end
+        body = "".join(iter_ics_lines(iter_user_events(identity)))
+        return func.HttpResponse(
+            body,
+            status_code=200,
+            mimetype="text/calendar",
+            charset="utf-8",
+            headers={"Content-Disposition": 'attachment; filename="gradeguard.ics"'}
+        )
+    except Exception as e:
+        print(f"Error exporting events: {str(e)}")
+        print(traceback.format_exc())
+        return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500)
+
+def import_events_ics(req: func.HttpRequest) -> func.HttpResponse:
+    """Bulk-create events from an uploaded iCalendar (.ics) file"""
+    is_valid, identity = verify_session(req)
+    if not is_valid:
+        return func.HttpResponse(json.dumps({"error": identity}), status_code=401)
+
+    try:
+        lines = io.StringIO(req.get_body().decode("utf-8-sig"))
+        parsed = iter_ics_events(lines)
+
+        imported = 0
+        failed = []
+        exceptions = []  # Changed occurrences, applied once their series exists
+
+        while True:
+            chunk = list(islice(parsed, ICAL_IMPORT_BATCH_SIZE))
+            if not chunk:
+                break
+
+            valid = []
+            for item in chunk:
+                if item.get("error"):
+                    failed.append({"id": item.get("id"), "title": item.get("title"), "error": item["error"]})
+                    continue
+                if item.get("recurrence_id"):
+                    exceptions.append(item)
+                    continue
+                if item.get("recurrence") and not item["recurrence"].get("freq"):
+                    item.pop("recurrence")  # EXDATE without an RRULE
+                try:
+                    event = CalendarEvent(**item, user_email=identity)
+                    valid.append(event.dict(exclude_none=True))
+                except Exception as e:
+                    failed.append({"id": item.get("id"), "title": item.get("title"), "error": str(e)})
+
+            for result in create_calendar_events(identity, valid):
+                if result["ok"]:
+                    imported += 1
+                else:
+                    failed.append({"id": result["id"], "error": result["error"]})
+
+        exceptions_applied = 0
+        for item in exceptions:
+            changes = {k: v for k, v in item.items() if k not in ("id", "recurrence_id", "recurrence")}
+            try:
+                update_calendar_event(identity, occurrence_id(item["id"], date.fromisoformat(item["recurrence_id"])), changes)
+                exceptions_applied += 1
+            except Exception as e:
+                failed.append({"id": item.get("id"), "title": item.get("title"), "error": str(e)})
+
+        return func.HttpResponse(
+            json.dumps({
+                "message": f"Imported {imported} events",
+                "importedCount": imported,
+                "exceptionsApplied": exceptions_applied,
+                "failed": failed
+            }),
+            status_code=200
+        )
+    except (ICalendarError, UnicodeDecodeError) as e:
+        return func.HttpResponse(json.dumps({"error": f"Invalid iCalendar file: {str(e)}"}), status_code=400)
+    except Exception as e:
+        print(f"Error importing events: {str(e)}")
+        print(traceback.format_exc())
+        return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500)
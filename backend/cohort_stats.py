@@ -0,0 +1,198 @@
+# cohort_stats.py
+"""
+Materialized module statistics per cohort (university + degree).
+
+Module analytics used to run a cross-partition AVG/COUNT ... GROUP BY over every
+module document on each request. Instead, every module create/update/delete applies
+a delta to one document per cohort in the cohort stats container, holding running
+totals for each module (grouped by name, code, credits, year and semester, like the
+old query):
+
+    {"id": "<hash>", "university": "...", "degree": "...",
+     "modules": {"<key>": {"name", "code", "credits", "year", "semester",
+                           "count", "scored", "sum", "sum_sq"}}}
+
+so analytics is a single point read. Deltas are applied with etag_merge and are
+exact under concurrency. When a delta can't be applied (etag_merge ran out of
+attempts on a busy cohort, throttling, ...) the cohort is marked dirty with a small
+"dirty:<id>" document instead of losing it silently; repair_dirty_cohorts(), run by
+a timer, recomputes those cohorts from their module documents.
+`python migrations.py cohort-stats` rebuilds everything.
+"""
+import json
+import math
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from database import _cohort_container, _modules_container, etag_merge
+
+DIRTY_PREFIX = "dirty:"
+
+GROUP_FIELDS = ("name", "code", "credits", "year", "semester")
+
+def cohort_id(university: str, degree: str) -> str:
+    # Names can contain characters Cosmos doesn't allow in ids ('/', '#', '?')
+    return hashlib.sha1(f"{university}\n{degree}".encode("utf-8")).hexdigest()
+
+def _module_key(module: dict) -> str:
+    return json.dumps([module.get(field) for field in GROUP_FIELDS])
+
+def _cohort_of(module: Optional[dict]):
+    if not module or module.get("type") != "module":
+        return None
+    if not module.get("university") or not module.get("degree"):
+        return None
+    return module["university"], module["degree"]
+
+def _apply(doc: dict, module: dict, sign: int):
+    """Add (sign=1) or remove (sign=-1) one module's contribution to a cohort document"""
+    modules = doc.setdefault("modules", {})
+    key = _module_key(module)
+    entry = modules.setdefault(key, {
+        **{field: module.get(field) for field in GROUP_FIELDS},
+        "count": 0, "scored": 0, "sum": 0.0, "sum_sq": 0.0
+    })
+    entry["count"] += sign
+    score = module.get("score")
+    if isinstance(score, (int, float)):
+        entry["scored"] += sign
+        entry["sum"] += sign * score
+        entry["sum_sq"] += sign * score * score
+    if entry["count"] <= 0:
+        del modules[key]
+
+def _new_cohort_doc(university: str, degree: str):
+    return lambda: {
+        "id": cohort_id(university, degree),
+        "type": "cohort_stats",
+        "university": university,
+        "degree": degree,
+        "modules": {}
+    }
+
+def record_module_change(before: Optional[dict], after: Optional[dict]):
+    """Apply a module create (before=None), update, or delete (after=None) to the cohort totals"""
+    record_module_changes([(before, after)])
+
+def record_module_changes(module_changes: List[tuple]):
+    """Apply many (before, after) changes with one write per affected cohort"""
+    changes: Dict[tuple, list] = {}
+    for before, after in module_changes:
+        for module, sign in ((before, -1), (after, 1)):
+            cohort = _cohort_of(module)
+            if cohort:
+                changes.setdefault(cohort, []).append((module, sign))
+
+    for (university, degree), deltas in changes.items():
+        def mutate(doc):
+            for module, sign in deltas:
+                _apply(doc, module, sign)
+
+        doc_id = cohort_id(university, degree)
+        try:
+            etag_merge(_cohort_container, doc_id, doc_id, mutate, new_doc=_new_cohort_doc(university, degree))
+        except Exception as e:
+            logging.error(f"Error updating cohort stats for {university} / {degree}: {str(e)}")
+            mark_dirty(university, degree)
+
+def mark_dirty(university: str, degree: str):
+    """Flag a cohort whose totals missed a delta, so repair_dirty_cohorts() rebuilds it"""
+    try:
+        _cohort_container.upsert_item({
+            "id": f"{DIRTY_PREFIX}{cohort_id(university, degree)}",
+            "type": "cohort_dirty",
+            "university": university,
+            "degree": degree,
+            "marked_at": datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        logging.error(f"Could not mark cohort {university} / {degree} for rebuild: {str(e)}")
+
+def rebuild_cohort(university: str, degree: str):
+    """Recompute one cohort document from its modules (conditional on it not changing meanwhile)"""
+    doc_id = cohort_id(university, degree)
+    try:
+        etag = _cohort_container.read_item(item=doc_id, partition_key=doc_id)["_etag"]
+    except CosmosResourceNotFoundError:
+        etag = None
+
+    doc = _new_cohort_doc(university, degree)()
+    query = "SELECT * FROM c WHERE c.type = 'module' AND c.university = @university AND c.degree = @degree"
+    parameters = [{"name": "@university", "value": university}, {"name": "@degree", "value": degree}]
+    for module in _modules_container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True):
+        _apply(doc, module, 1)
+
+    if etag is None:
+        _cohort_container.create_item(body=doc)
+    else:
+        _cohort_container.replace_item(item=doc_id, body=doc, etag=etag, match_condition=MatchConditions.IfNotModified)
+
+def repair_dirty_cohorts() -> dict:
+    """Rebuild every cohort marked dirty; markers stay for the next run if the rebuild fails"""
+    markers = list(_cohort_container.query_items(
+        query="SELECT * FROM c WHERE c.type = 'cohort_dirty'", enable_cross_partition_query=True
+    ))
+    rebuilt = 0
+    for marker in markers:
+        try:
+            rebuild_cohort(marker["university"], marker["degree"])
+            # Only clear the marker if nobody re-marked the cohort during the rebuild
+            _cohort_container.delete_item(
+                item=marker["id"],
+                partition_key=marker["id"],
+                etag=marker["_etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+            rebuilt += 1
+        except Exception as e:
+            logging.error(f"Error rebuilding cohort {marker['university']} / {marker['degree']}: {str(e)}")
+
+    summary = {"dirty": len(markers), "rebuilt": rebuilt}
+    if markers:
+        logging.info(f"Cohort stats repair: {summary}")
+    return summary
+
+def _summarize(entry: dict) -> dict:
+    stat = {field: entry.get(field) for field in GROUP_FIELDS}
+    stat["student_count"] = entry["count"]
+    if entry["scored"] > 0:
+        mean = entry["sum"] / entry["scored"]
+        variance = max(entry["sum_sq"] / entry["scored"] - mean * mean, 0.0)
+        stat["average_score"] = mean
+        stat["std_dev"] = math.sqrt(variance)
+    return stat
+
+def get_cohort_module_stats(university: str, degree: str) -> List[dict]:
+    """Per-module average/count for a cohort in the shape get_modules_with_stats returned"""
+    doc_id = cohort_id(university, degree)
+    try:
+        doc = _cohort_container.read_item(item=doc_id, partition_key=doc_id)
+    except CosmosResourceNotFoundError:
+        return []
+    return [_summarize(entry) for entry in doc.get("modules", {}).values()]
+
+def rebuild_cohort_stats(dry_run: bool = False) -> int:
+    """Recompute every cohort document from the module documents"""
+    cohorts: Dict[tuple, dict] = {}
+    query = "SELECT * FROM c WHERE c.type = 'module'"
+    for module in _modules_container.query_items(query=query, enable_cross_partition_query=True):
+        cohort = _cohort_of(module)
+        if cohort:
+            doc = cohorts.setdefault(cohort, _new_cohort_doc(*cohort)())
+            _apply(doc, module, 1)
+
+    if not dry_run:
+        for doc in cohorts.values():
+            _cohort_container.upsert_item(doc)
+        # Cohorts that no longer have any modules
+        existing = _cohort_container.query_items(query="SELECT c.id FROM c", enable_cross_partition_query=True)
+        current = {doc["id"] for doc in cohorts.values()}
+        for row in existing:
+            if row["id"] not in current:
+                _cohort_container.delete_item(item=row["id"], partition_key=row["id"])
+
+    print(f"{'Would rebuild' if dry_run else 'Rebuilt'} {len(cohorts)} cohorts")
+    return len(cohorts)
@@ -2,8 +2,10 @@
 import azure.functions as func
 import json
 from user_routes import verify_session
-from database import get_user_by_email, _container, get_user_modules
+from database import get_user_by_email, _container
 from grade_calculator import get_dashboard_stats, get_prediction_analysis
+from data_context import UserDataContext, get_context
+from avatar_thumbnails import avatar_thumbnails_for
 from datetime import datetime
 
 def get_dashboard_data(req: func.HttpRequest) -> func.HttpResponse:
@@ -13,15 +15,18 @@ def get_dashboard_data(req: func.HttpRequest) -> func.HttpResponse:
         return func.HttpResponse(json.dumps({"error": identity}), status_code=401)
 
     try:
+        # One loader for the whole request: the user doc and modules are read once
+        ctx = UserDataContext(identity)
+
         # Get statistics
-        stats = get_dashboard_stats(identity)
+        stats = get_dashboard_stats(identity, ctx)
         
         # Get predictions
-        predictions = get_prediction_analysis(identity)
+        predictions = get_prediction_analysis(identity, ctx)
         stats["predictions"] = predictions
 
         # Get user dashboard configuration
-        user_doc = get_user_by_email(identity)
+        user_doc = ctx.user_doc
         dashboard_config = user_doc.get("dashboardConfig", {})
         
         # Add personal information
@@ -31,7 +36,8 @@ def get_dashboard_data(req: func.HttpRequest) -> func.HttpResponse:
             "university": user_doc.get("university", ""),
             "degree": user_doc.get("degree", ""),
             "email": user_doc.get("email", ""),
-            "avatar": user_doc.get("avatar", "")
+            "avatar": user_doc.get("avatar", ""),
+            "avatarThumbnails": avatar_thumbnails_for(user_doc)
         }
 
         # Combine data
@@ -128,7 +134,8 @@ def update_goals(req: func.HttpRequest) -> func.HttpResponse:
 
     try:
         goals_data = req.get_json()
-        user_doc = get_user_by_email(identity)
+        ctx = UserDataContext(identity)
+        user_doc = ctx.user_doc
 
         if not user_doc:
             return func.HttpResponse(json.dumps({"error": "User not found"}), status_code=404)
@@ -141,7 +148,7 @@ def update_goals(req: func.HttpRequest) -> func.HttpResponse:
         user_doc["dashboardConfig"]["goals"] = goals_data
         
         # Calculate goal progress based on current stats
-        stats = get_dashboard_stats(identity)
+        stats = get_dashboard_stats(identity, ctx)
         current_avg = stats.get("overallAverage", 0)
         
         for goal in user_doc["dashboardConfig"]["goals"]:
@@ -167,8 +174,9 @@ def get_insights(req: func.HttpRequest) -> func.HttpResponse:
 
     try:
         # Get user modules and statistics
-        stats = get_dashboard_stats(identity)
-        predictions = get_prediction_analysis(identity)
+        ctx = UserDataContext(identity)
+        stats = get_dashboard_stats(identity, ctx)
+        predictions = get_prediction_analysis(identity, ctx)
         
         # Generate insights
         insights = []
@@ -251,21 +259,22 @@ def get_insights(req: func.HttpRequest) -> func.HttpResponse:
             })
             
         # Response with all insights
+        strengths_and_weaknesses = get_strengths_and_weaknesses(identity, ctx)
         response = {
             "insights": insights,
             "predictions": predictions,
-            "strengths": get_strengths_and_weaknesses(identity)["strengths"],
-            "weaknesses": get_strengths_and_weaknesses(identity)["weaknesses"]
+            "strengths": strengths_and_weaknesses["strengths"],
+            "weaknesses": strengths_and_weaknesses["weaknesses"]
         }
         
         return func.HttpResponse(json.dumps(response), status_code=200)
     except Exception as e:
         return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500)
 
-def get_strengths_and_weaknesses(user_email: str) -> dict:
+def get_strengths_and_weaknesses(user_email: str, ctx: UserDataContext = None) -> dict:
     """Identify user's academic strengths and weaknesses based on module performance"""
     # Get all user modules
-    modules = get_user_modules(user_email)
+    modules = get_context(user_email, ctx).modules
     
     if not modules or len(modules) < 2:
         return {
@@ -0,0 +1,36 @@
+# data_context.py
+from typing import Any, Callable, Dict, List, Optional
+from database import get_user_by_email, get_user_modules
+
+class UserDataContext:
+    """
+    Request-scoped loader for a user's data.
+
+    The user document and module list are fetched from Cosmos at most once per request
+    and shared by every grade_calculator and dashboard_routes helper the request calls.
+    Derived values (e.g. the grade aggregate) can be memoized on the context as well.
+    """
+
+    def __init__(self, email: str):
+        self.email = email
+        self._values: Dict[str, Any] = {}
+
+    def memoize(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing it with loader on first use"""
+        if key not in self._values:
+            self._values[key] = loader()
+        return self._values[key]
+
+    @property
+    def user_doc(self) -> Optional[dict]:
+        return self.memoize("user_doc", lambda: get_user_by_email(self.email))
+
+    @property
+    def modules(self) -> List[Dict[str, Any]]:
+        return self.memoize("modules", lambda: get_user_modules(self.email))
+
+def get_context(email: str, ctx: Optional[UserDataContext] = None) -> UserDataContext:
+    """Reuse the caller's context when one is passed, otherwise start a fresh one"""
+    if ctx is not None and ctx.email == email:
+        return ctx
+    return UserDataContext(email)
@@ -2,8 +2,18 @@
 
 import os
 import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from azure.core import MatchConditions
 from azure.cosmos import CosmosClient
-from typing import List, Dict, Any
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosBatchOperationError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError
+)
+from typing import List, Dict, Any, Optional
 
 COSMOS_ENDPOINT = os.environ.get("COSMOS_ENDPOINT")
 COSMOS_KEY = os.environ.get("COSMOS_KEY")
@@ -11,14 +21,95 @@ COSMOS_DBNAME = os.environ.get("COSMOS_DBNAME")
 COSMOS_CONTAINER = os.environ.get("COSMOS_CONTAINER")  # e.g., "users"
 COSMOS_UNI_CONTAINER = os.environ.get("COSMOS_UNI_CONTAINER")  # e.g. "universities"
 COSMOS_EVENTS_CONTAINER = os.environ.get("COSMOS_EVENTS_CONTAINER", "events")
+COSMOS_MODULES_CONTAINER = os.environ.get("COSMOS_MODULES_CONTAINER", "modules")  # partition key: /user_email
+COSMOS_COHORT_CONTAINER = os.environ.get("COSMOS_COHORT_CONTAINER", "cohort_stats")  # partition key: /id
+COSMOS_REMINDER_QUEUE_CONTAINER = os.environ.get("COSMOS_REMINDER_QUEUE_CONTAINER", "reminder_queue")  # partition key: /pk
+COSMOS_OUTBOX_CONTAINER = os.environ.get("COSMOS_OUTBOX_CONTAINER", "email_outbox")  # partition key: /id
 
 
-_client = CosmosClient(COSMOS_ENDPOINT, credential=COSMOS_KEY)
-_db = _client.get_database_client(COSMOS_DBNAME)
+_db = None
+_db_lock = threading.Lock()
 
-_container = _db.get_container_client(COSMOS_CONTAINER)
-_uni_container = _db.get_container_client(COSMOS_UNI_CONTAINER)
-_events_container = _db.get_container_client(COSMOS_EVENTS_CONTAINER)
+def _get_database():
+    """The CosmosClient is created on first use rather than at import (cold start)"""
+    global _db
+    with _db_lock:
+        if _db is None:
+            client = CosmosClient(COSMOS_ENDPOINT, credential=COSMOS_KEY)
+            _db = client.get_database_client(COSMOS_DBNAME)
+        return _db
+
+class LazyContainer:
+    """Stands in for a ContainerProxy and creates it on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._proxy = None
+
+    def __getattr__(self, attr):
+        if self._proxy is None:
+            self._proxy = _get_database().get_container_client(self._name)
+        return getattr(self._proxy, attr)
+
+_container = LazyContainer(COSMOS_CONTAINER)
+_uni_container = LazyContainer(COSMOS_UNI_CONTAINER)
+_events_container = LazyContainer(COSMOS_EVENTS_CONTAINER)
+_modules_container = LazyContainer(COSMOS_MODULES_CONTAINER)
+_cohort_container = LazyContainer(COSMOS_COHORT_CONTAINER)
+_reminder_queue_container = LazyContainer(COSMOS_REMINDER_QUEUE_CONTAINER)
+_outbox_container = LazyContainer(COSMOS_OUTBOX_CONTAINER)
+
+# Max requests in flight for bulk reads/writes from a single invocation
+DB_BULK_CONCURRENCY = int(os.environ.get("DB_BULK_CONCURRENCY", 16))
+
+def run_bounded(operation, items, concurrency: int = None) -> List[tuple]:
+    """
+    Apply operation(item) to every item with at most `concurrency` requests in flight.
+    Returns [(item, result, error), ...] in input order; one failure doesn't stop the rest.
+    """
+    def attempt(item):
+        try:
+            return item, operation(item), None
+        except Exception as e:
+            return item, None, e
+
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(concurrency or DB_BULK_CONCURRENCY, len(items))) as executor:
+        return list(executor.map(attempt, items))
+
+def etag_merge(container, item_id: str, partition_key, mutate, new_doc=None, attempts: int = 5):
+    """
+    Read-modify-write of a single document guarded by its ETag, retried when another
+    writer got there first. mutate(doc) changes the document in place; new_doc() builds
+    the document when it doesn't exist yet (without it, a missing document returns None).
+    """
+    for _ in range(attempts):
+        try:
+            doc = container.read_item(item=item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            if new_doc is None:
+                return None
+            doc = new_doc()
+            mutate(doc)
+            try:
+                return container.create_item(body=doc)
+            except CosmosResourceExistsError:
+                continue
+
+        mutate(doc)
+        try:
+            return container.replace_item(
+                item=item_id,
+                body=doc,
+                etag=doc["_etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+        except CosmosAccessConditionFailedError:
+            continue
+
+    raise Exception(f"Too many concurrent updates to {item_id}")
 
 def create_user(user_dict: dict):
     _container.create_item(user_dict)
@@ -30,59 +121,144 @@ def get_user_by_email(email: str):
     except Exception:
         return None
 
+def get_users_by_email(emails: List[str]) -> Dict[str, dict]:
+    """Fetch many user documents in one query per chunk of emails"""
+    users = {}
+    emails = list(dict.fromkeys(e for e in emails if e))
+    for i in range(0, len(emails), 100):
+        query = "SELECT * FROM c WHERE ARRAY_CONTAINS(@emails, c.id)"
+        parameters = [{"name": "@emails", "value": emails[i:i + 100]}]
+        for user_doc in _container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True):
+            users[user_doc["id"]] = user_doc
+    return users
+
 def get_user_modules(email: str) -> List[Dict[str, Any]]:
     """Retrieve modules for a user"""
-    query = f"SELECT * FROM c WHERE c.type = 'module' AND c.user_email = '{email}'"
-    modules = list(_container.query_items(query=query, enable_cross_partition_query=True))
-    return modules
+    return list_user_modules(email)
+
+# Modules live in their own container partitioned by user_email, so everything
+# for one user is a point read/write or a single-partition query.
+
+def list_user_modules(email: str, year: str = None, semester: int = None, status: str = None) -> List[Dict[str, Any]]:
+    """Single-partition query for a user's modules with optional filters"""
+    query = "SELECT * FROM c WHERE c.type = 'module'"
+    parameters = []
+
+    if year:
+        query += " AND c.year = @year"
+        parameters.append({"name": "@year", "value": year})
+
+    if semester is not None:
+        query += " AND c.semester = @semester"
+        parameters.append({"name": "@semester", "value": semester})
+
+    if status:
+        query += " AND c.status = @status"
+        parameters.append({"name": "@status", "value": status})
+
+    return list(_modules_container.query_items(
+        query=query,
+        parameters=parameters,
+        partition_key=email
+    ))
+
+def count_user_modules(email: str) -> int:
+    query = "SELECT VALUE COUNT(1) FROM c WHERE c.type = 'module'"
+    results = list(_modules_container.query_items(query=query, partition_key=email))
+    return results[0] if results else 0
+
+def get_module_doc(email: str, module_id: str):
+    """Point read of a single module; None if it doesn't exist for this user"""
+    try:
+        module = _modules_container.read_item(item=module_id, partition_key=email)
+    except CosmosResourceNotFoundError:
+        return None
+    return module if module.get("type") == "module" else None
+
+def _record_cohort_changes(changes):
+    # Keep the materialized cohort statistics in step; cohorts whose delta fails are
+    # marked for rebuild, and a failure here must not fail the module write itself
+    try:
+        from cohort_stats import record_module_changes
+        record_module_changes(changes)
+    except Exception as e:
+        logging.error(f"Error updating cohort stats: {str(e)}")
+
+def _record_cohort_change(before, after):
+    _record_cohort_changes([(before, after)])
+
+def create_module_doc(module_doc: dict):
+    created = _modules_container.create_item(body=module_doc)
+    _record_cohort_change(None, created)
+    return created
+
+# Cosmos DB limit on operations in one transactional batch
+MAX_BATCH_OPERATIONS = 100
+
+def create_in_batches(container, partition_key, docs: List[dict], concurrency: int = None) -> List[Dict[str, Any]]:
+    """
+    Create documents that share a partition key in transactional batches of up to
+    MAX_BATCH_OPERATIONS (one round-trip each). If a batch is rejected, its documents
+    are retried as individual concurrent creates so one bad item doesn't sink the rest.
+
+    Returns one result per input, in order: {"id", "ok", "doc"} or {"id", "ok", "error"}.
+    """
+    results = []
+    for i in range(0, len(docs), MAX_BATCH_OPERATIONS):
+        chunk = docs[i:i + MAX_BATCH_OPERATIONS]
+        try:
+            responses = container.execute_item_batch(
+                batch_operations=[("create", (doc,)) for doc in chunk],
+                partition_key=partition_key
+            )
+            results.extend(
+                {"id": doc["id"], "ok": True, "doc": response.get("resourceBody", doc)}
+                for doc, response in zip(chunk, responses)
+            )
+        except CosmosBatchOperationError as e:
+            print(f"Batch rejected at operation {e.error_index}, creating items individually")
+            for doc, created, error in run_bounded(lambda d: container.create_item(body=d), chunk, concurrency):
+                if error:
+                    results.append({"id": doc["id"], "ok": False, "error": str(error)})
+                else:
+                    results.append({"id": doc["id"], "ok": True, "doc": created})
+    return results
+
+def create_module_docs(email: str, module_docs: List[dict]) -> List[Dict[str, Any]]:
+    """Create many modules for one user (they share a partition, so this batches)"""
+    results = create_in_batches(_modules_container, email, module_docs)
+
+    created_docs = [result["doc"] for result in results if result["ok"]]
+    if created_docs:
+        _record_cohort_changes([(None, doc) for doc in created_docs])
+    return results
+
+def replace_module_doc(module_doc: dict, previous: Optional[dict] = None):
+    """Replace a module; pass the stored version as `previous` if already loaded (it is read otherwise)"""
+    if previous is None:
+        previous = get_module_doc(module_doc["user_email"], module_doc["id"])
+    replaced = _modules_container.replace_item(item=module_doc["id"], body=module_doc)
+    _record_cohort_change(previous, replaced)
+    return replaced
+
+def delete_module_doc(email: str, module_id: str, previous: Optional[dict] = None):
+    """Delete a module; pass the stored version as `previous` if already loaded (it is read otherwise)"""
+    if previous is None:
+        previous = get_module_doc(email, module_id)
+    _modules_container.delete_item(item=module_id, partition_key=email)
+    _record_cohort_change(previous, None)
 
 def increment_university_and_major_counter(university_name: str, major_name: str):
     """
-    Increments counters for university and major, handling the case when the university
-    already exists in a different document.
+    Count one more user/module for a university and major. The increment is buffered
+    and written as a delta before this returns, merged with any increments other
+    requests buffered meanwhile (see popularity_counters.py).
     """
     try:
-        # First, query for the university by name (instead of trying to read directly)
-        query = f"SELECT * FROM c WHERE c.name = '{university_name}'"
-        items = list(_uni_container.query_items(query=query, enable_cross_partition_query=True))
-        
-        # If we found items, use the first one
-        if items:
-            uni_doc = items[0]
-        else:
-            # Create a new university document
-            uni_doc = {
-                "id": university_name,  # Use name as ID
-                "name": university_name,
-                "counter": 0,
-                "majors": []
-            }
-        
-        # Increment the counter
-        uni_doc["counter"] = uni_doc.get("counter", 0) + 1
-        
-        # Check if the major exists
-        major_found = None
-        for m in uni_doc.get("majors", []):
-            if m["major_name"].lower() == major_name.lower():
-                major_found = m
-                break
-        
-        # If major found, increment counter, otherwise add it
-        if major_found:
-            major_found["counter"] += 1
-        else:
-            if "majors" not in uni_doc:
-                uni_doc["majors"] = []
-            
-            uni_doc["majors"].append({
-                "major_name": major_name,
-                "counter": 1
-            })
-        
-        # Upsert (update or insert) the document
-        _uni_container.upsert_item(uni_doc)
-        
+        from popularity_counters import popularity_counters
+        popularity_counters.increment(university_name, major_name)
+        # Don't leave it in memory after the invocation: the instance may be recycled
+        popularity_counters.flush()
     except Exception as e:
         print(f"Error updating university counter: {str(e)}")
         # Don't raise the exception - we don't want user registration to fail
@@ -107,13 +283,37 @@ def update_user_calculator(email: str, calculator_config: dict):
     user_doc["calculator"] = calculator_config
     _container.upsert_item(user_doc)
 
-def search_universities(query: str, limit: int = 10, offset: int = 0):
-    query_lower = query.lower()
-    query_str = "SELECT * FROM c WHERE CONTAINS(LOWER(c.name), @query)"
-    parameters = [{"name": "@query", "value": query_lower}]
-    items = list(_uni_container.query_items(query=query_str, parameters=parameters, enable_cross_partition_query=True))
-    return items[offset:offset+limit]
 
+# Events are bucketed by user and month: pk = "{email}:{YYYY-MM}" from the event's
+# date. A calendar month/week view reads one or two logical partitions instead of
+# running a cross-partition query over every event in the container. Recurring
+# events are stored once in "{email}:recurring" and expanded per request (see
+# recurrence.py), so a range read costs the month buckets plus that one partition.
+
+# Ranges wider than this are answered with one cross-partition query instead
+EVENT_MAX_BUCKETS_PER_QUERY = int(os.environ.get("EVENT_MAX_BUCKETS_PER_QUERY", 12))
+
+def event_bucket(user_email: str, date: str) -> str:
+    """Partition key for an event on `date` (ISO date or datetime string)"""
+    return f"{user_email}:{date[:7]}"
+
+def recurring_bucket(user_email: str) -> str:
+    """Recurring events span months, so their masters share one bucket per user"""
+    return f"{user_email}:recurring"
+
+def event_partition(user_email: str, event: dict) -> str:
+    if event.get("recurrence"):
+        return recurring_bucket(user_email)
+    return event_bucket(user_email, event["date"])
+
+def _month_buckets(user_email: str, start_date: str, end_date: str) -> List[str]:
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    end_year, end_month = int(end_date[:4]), int(end_date[5:7])
+    buckets = []
+    while (year, month) <= (end_year, end_month):
+        buckets.append(f"{user_email}:{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
 
 def create_calendar_event(user_email: str, event_data: dict):
     # Generate ID if not provided
@@ -121,139 +321,261 @@ def create_calendar_event(user_email: str, event_data: dict):
         event_data['id'] = str(uuid.uuid4())
     
     event_data['user_email'] = user_email
-    
-    # Create composite key for partitioning
-    event_id = event_data['id']
-    event_data['pk'] = f"{user_email}:{event_id}"
-    
-    print(f"Creating event with ID: {event_id} and partition key: {event_data['pk']}")
+    event_data['pk'] = event_partition(user_email, event_data)
     
     created_item = _events_container.create_item(body=event_data)
+    _update_event_directory(user_email, {created_item['id']: created_item['pk']})
     return created_item  # Return the actual created item from the database
 
+def create_calendar_events(user_email: str, events: List[dict]) -> List[Dict[str, Any]]:
+    """
+    Create many events: batched per bucket, with buckets written concurrently.
+    Returns one result per input, in order (see create_in_batches).
+    """
+    by_bucket: Dict[str, List[int]] = {}  # pk -> positions in `events`
+    for position, event_data in enumerate(events):
+        if not event_data.get('id'):
+            event_data['id'] = str(uuid.uuid4())
+        event_data['user_email'] = user_email
+        event_data['pk'] = event_partition(user_email, event_data)
+        by_bucket.setdefault(event_data['pk'], []).append(position)
+
+    def write_bucket(bucket):
+        pk, positions = bucket
+        return create_in_batches(_events_container, pk, [events[i] for i in positions])
+
+    results = [None] * len(events)
+    for (pk, positions), bucket_results, error in run_bounded(write_bucket, by_bucket.items()):
+        for offset, i in enumerate(positions):
+            if error:
+                results[i] = {"id": events[i]["id"], "ok": False, "error": str(error)}
+            else:
+                results[i] = bucket_results[offset]
+
+    created = {result["id"]: result["doc"]["pk"] for result in results if result["ok"]}
+    if created:
+        _update_event_directory(user_email, created)
+    return results
+
+def iter_user_events(user_email: str):
+    """Every stored event (recurring events unexpanded), paged lazily from Cosmos"""
+    return _events_container.query_items(
+        query="SELECT * FROM c WHERE c.user_email = @email",
+        parameters=[{"name": "@email", "value": user_email}],
+        enable_cross_partition_query=True
+    )
+
 def get_user_events(user_email: str, start_date: str = None, end_date: str = None):
-    query = "SELECT * FROM c WHERE c.user_email = @email"
-    params = [{"name": "@email", "value": user_email}]
-    
-    if start_date and end_date:
-        query += " AND c.date >= @start AND c.date <= @end"
-        params.extend([
-            {"name": "@start", "value": start_date},
-            {"name": "@end", "value": end_date}
-        ])
-    
-    events = list(_events_container.query_items(
+    if not (start_date and end_date):
+        # Unbounded: every bucket the user has
+        return list(iter_user_events(user_email))
+
+    query = ("SELECT * FROM c WHERE c.user_email = @email AND c.date >= @start AND c.date <= @end"
+             " AND NOT IS_DEFINED(c.recurrence)")
+    params = [
+        {"name": "@email", "value": user_email},
+        {"name": "@start", "value": start_date},
+        {"name": "@end", "value": end_date}
+    ]
+
+    try:
+        buckets = _month_buckets(user_email, start_date, end_date)
+    except ValueError:
+        buckets = None  # Not ISO dates; let the query filter them as before
+
+    if buckets is None or len(buckets) > EVENT_MAX_BUCKETS_PER_QUERY:
+        events = list(_events_container.query_items(
+            query=query,
+            parameters=params,
+            enable_cross_partition_query=True
+        ))
+    else:
+        def read_bucket(bucket):
+            return list(_events_container.query_items(query=query, parameters=params, partition_key=bucket))
+
+        events = []
+        for bucket, items, error in run_bounded(read_bucket, buckets):
+            if error:
+                raise error
+            events.extend(items)
+
+    if buckets is not None:
+        events.extend(_expand_recurring_events(user_email, start_date, end_date))
+    return events
+
+def _expand_recurring_events(user_email: str, start_date: str, end_date: str) -> List[dict]:
+    """Occurrences in the window of every recurring event that starts before it ends"""
+    from recurrence import expand_event
+
+    masters = _events_container.query_items(
+        query="SELECT * FROM c WHERE c.date <= @end",
+        parameters=[{"name": "@end", "value": end_date}],
+        partition_key=recurring_bucket(user_email)
+    )
+    return [occurrence for master in masters for occurrence in expand_event(master, start_date, end_date)]
+
+# Per-user directory of event id -> pk, so update/delete can point-read an event
+# without knowing its date. Events missing from the directory (written before it
+# existed) are found with one cross-partition query and then added to it; the
+# counters below show how often that fallback still runs.
+EVENT_DIRECTORY_ID = "event_directory"
+
+_event_resolver_stats = {"directory_hits": 0, "fallback_queries": 0, "fallback_found": 0, "not_found": 0}
+_event_resolver_lock = threading.Lock()
+
+def _count_resolution(outcome: str):
+    with _event_resolver_lock:
+        _event_resolver_stats[outcome] += 1
+
+def get_event_resolver_stats() -> dict:
+    """How event lookups were resolved since this process started"""
+    with _event_resolver_lock:
+        return dict(_event_resolver_stats)
+
+def event_directory_pk(user_email: str) -> str:
+    return f"{user_email}:directory"
+
+def _read_event_directory(user_email: str) -> dict:
+    try:
+        doc = _events_container.read_item(item=EVENT_DIRECTORY_ID, partition_key=event_directory_pk(user_email))
+    except CosmosResourceNotFoundError:
+        return {}
+    return doc.get("events", {})
+
+def _update_event_directory(user_email: str, entries: Dict[str, Any]):
+    """Set {event_id: pk} entries (None removes one); the directory is an optimisation, so errors are only logged"""
+    def apply_entries(doc):
+        for event_id, pk in entries.items():
+            if pk is None:
+                doc["events"].pop(event_id, None)
+            else:
+                doc["events"][event_id] = pk
+
+    try:
+        etag_merge(
+            _events_container,
+            EVENT_DIRECTORY_ID,
+            event_directory_pk(user_email),
+            apply_entries,
+            new_doc=lambda: {
+                "id": EVENT_DIRECTORY_ID,
+                "pk": event_directory_pk(user_email),
+                "type": "event_directory",
+                "events": {}
+            }
+        )
+    except Exception as e:
+        print(f"Error updating event directory for {user_email}: {str(e)}")
+
+def find_calendar_event(user_email: str, event_id: str):
+    """Resolve an event by id: directory + point read, falling back to a query"""
+    pk = _read_event_directory(user_email).get(event_id)
+    if pk:
+        try:
+            event = _events_container.read_item(item=event_id, partition_key=pk)
+            _count_resolution("directory_hits")
+            return event
+        except CosmosResourceNotFoundError:
+            pass  # Stale entry; fall through to the query
+
+    _count_resolution("fallback_queries")
+    query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @email"
+    params = [
+        {"name": "@id", "value": event_id},
+        {"name": "@email", "value": user_email}
+    ]
+    items = list(_events_container.query_items(
         query=query,
         parameters=params,
         enable_cross_partition_query=True
     ))
-    return events
+    if not items:
+        _count_resolution("not_found")
+        if pk:
+            _update_event_directory(user_email, {event_id: None})
+        return None
+
+    _count_resolution("fallback_found")
+    logging.debug(f"Event {event_id} resolved by fallback query; resolver stats: {get_event_resolver_stats()}")
+    _update_event_directory(user_email, {event_id: items[0]["pk"]})
+    return items[0]
+
+def _update_occurrence(user_email: str, master_id: str, day: str, update_data: dict = None, cancel: bool = False):
+    """Override (or cancel, via exdates) one occurrence of a recurring event"""
+    master = find_calendar_event(user_email, master_id)
+    if not master or not master.get("recurrence"):
+        return None
+
+    def apply_exception(doc):
+        rule = doc["recurrence"]
+        if cancel:
+            rule.setdefault("exdates", [])
+            if day not in rule["exdates"]:
+                rule["exdates"].append(day)
+            rule.get("overrides", {}).pop(day, None)
+        else:
+            override = rule.setdefault("overrides", {}).setdefault(day, {})
+            for key, value in update_data.items():
+                if key not in ['id', 'user_email', 'pk', 'recurrence']:
+                    override[key] = value
+
+    return etag_merge(_events_container, master_id, master["pk"], apply_exception)
 
 def update_calendar_event(user_email: str, event_id: str, update_data: dict):
-    pk = f"{user_email}:{event_id}"
-    try:
-        # Try to get the existing event with the constructed partition key
-        print(f"Attempting to read event with ID: {event_id} and partition key: {pk}")
-        event = _events_container.read_item(item=event_id, partition_key=pk)
-        
-        # Update fields
-        for key, value in update_data.items():
-            if key not in ['id', 'user_email', 'pk']:
-                event[key] = value
-        
-        # Save updates
+    from recurrence import split_occurrence_id
+
+    master_id, day = split_occurrence_id(event_id)
+    if day:
+        updated = _update_occurrence(user_email, master_id, day, update_data=update_data)
+        if not updated:
+            raise Exception("Event not found")
+        return updated
+
+    event = find_calendar_event(user_email, event_id)
+    if not event:
+        print(f"Event with ID {event_id} not found in database")
+        raise Exception("Event not found")
+
+    old_pk = event["pk"]
+    for key, value in update_data.items():
+        if key not in ['id', 'user_email', 'pk']:
+            event[key] = value
+    if event.get("recurrence") is None:
+        event.pop("recurrence", None)
+    event['pk'] = event_partition(user_email, event)
+
+    if event['pk'] == old_pk:
         return _events_container.replace_item(item=event_id, body=event)
-    except Exception as e:
-        print(f"Error updating with direct approach: {str(e)}")
-        
-        try:
-            # If direct update fails, try to find the event by query first
-            query = f"SELECT * FROM c WHERE c.id = '{event_id}' AND c.user_email = '{user_email}'"
-            items = list(_events_container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            
-            if items:
-                event = items[0]
-                print(f"Found item by query: {event}")
-                
-                # Update fields
-                for key, value in update_data.items():
-                    if key not in ['id', 'user_email', 'pk']:
-                        event[key] = value
-                
-                # Use the actual partition key from the found item
-                actual_pk = event.get("pk", pk)
-                print(f"Using actual partition key: {actual_pk}")
-                
-                # Save updates
-                return _events_container.replace_item(item=event_id, body=event)
-            else:
-                print(f"Event with ID {event_id} not found in database")
-                raise Exception("Event not found")
-                
-        except Exception as query_error:
-            print(f"Error in query approach: {str(query_error)}")
-            raise query_error
+
+    # The event moved to another bucket; partition keys are immutable, so move the document
+    moved = _events_container.upsert_item(body={k: v for k, v in event.items() if not k.startswith("_")})
+    _events_container.delete_item(item=event_id, partition_key=old_pk)
+    _update_event_directory(user_email, {event_id: event['pk']})
+    return moved
 
 def delete_calendar_event(user_email: str, event_id: str):
-    pk = f"{user_email}:{event_id}"
-    try:
-        # Try deleting with the constructed partition key
-        print(f"Attempting to delete event with ID: {event_id} and partition key: {pk}")
-        _events_container.delete_item(item=event_id, partition_key=pk)
-        return True
-    except Exception as e:
-        print(f"Error deleting with direct approach: {str(e)}")
-        
-        try:
-            # If direct delete fails, try to find the event by query first
-            query = f"SELECT * FROM c WHERE c.id = '{event_id}' AND c.user_email = '{user_email}'"
-            items = list(_events_container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            
-            if items:
-                item = items[0]
-                print(f"Found item by query: {item}")
-                # Use the actual partition key from the found item
-                actual_pk = item.get("pk", pk)
-                print(f"Using actual partition key: {actual_pk}")
-                _events_container.delete_item(item=event_id, partition_key=actual_pk)
-                return True
-            else:
-                print(f"Event with ID {event_id} not found in database")
-                return False
-                
-        except Exception as query_error:
-            print(f"Error in query approach: {str(query_error)}")
-            return False
+    from recurrence import split_occurrence_id
+
+    master_id, day = split_occurrence_id(event_id)
+    if day:
+        # Deleting one occurrence cancels that date; the series stays
+        return _update_occurrence(user_email, master_id, day, cancel=True) is not None
+
+    event = find_calendar_event(user_email, event_id)
+    if not event:
+        print(f"Event with ID {event_id} not found in database")
+        return False
+    _events_container.delete_item(item=event_id, partition_key=event["pk"])
+    _update_event_directory(user_email, {event_id: None})
+    return True
 
 
 # Add this helper function to get modules with statistics
 def get_modules_with_stats(university: str, degree: str):
-    """Get modules with statistics for a specific university and degree"""
+    """Get modules with statistics for a specific university and degree (one point read)"""
     try:
-        # Query for modules of this university and degree
-        query = f"""
-        SELECT c.name, c.code, c.credits, c.year, c.semester,
-               AVG(c.score) as average_score,
-               COUNT(c.id) as student_count
-        FROM c
-        WHERE c.type = 'module'
-          AND c.university = '{university}'
-          AND c.degree = '{degree}'
-        GROUP BY c.name, c.code, c.credits, c.year, c.semester
-        """
-        
-        modules = list(_container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-        
-        return modules
+        from cohort_stats import get_cohort_module_stats
+        return get_cohort_module_stats(university, degree)
     except Exception as e:
         print(f"Error getting modules with stats: {str(e)}")
         return []
\ No newline at end of file
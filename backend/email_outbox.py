@@ -0,0 +1,163 @@
+# email_outbox.py
+"""
+Durable outbox for transactional emails.
+
+Request handlers don't talk to SMTP: they store a small message document (template
+name, recipient and template values) in the outbox container and return. A timer
+trigger drains the outbox: it claims due messages, renders them with
+email_templates and sends them in batches over the pooled SMTP transport.
+
+    {"id", "template": "welcome", "to": "...", "values": {...}, "status": "pending",
+     "attempts": 0, "next_attempt_at": "<iso>", "created_at", "last_error"}
+
+Delivered messages are deleted. A failed message is retried with exponential
+backoff (EMAIL_OUTBOX_BACKOFF_SECONDS, doubling per attempt); after
+EMAIL_OUTBOX_MAX_ATTEMPTS it is kept with status "dead" for inspection. Claiming a
+message is an ETag-conditional write that pushes next_attempt_at past the lease, so
+overlapping drains don't send it twice.
+"""
+import os
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError, CosmosResourceNotFoundError
+from database import _outbox_container, run_bounded
+from email_templates import TEMPLATES
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", 100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.environ.get("EMAIL_OUTBOX_BACKOFF_SECONDS", 60))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.environ.get("EMAIL_OUTBOX_LEASE_SECONDS", 300))
+EMAIL_OUTBOX_TIME_BUDGET_SECONDS = float(os.environ.get("EMAIL_OUTBOX_TIME_BUDGET_SECONDS", 50))
+
+def enqueue_email(template: str, to_email: str, **values) -> dict:
+    """Store a message for the drainer; values must be JSON-serializable"""
+    if template not in TEMPLATES:
+        raise KeyError(f"Unknown email template: {template}")
+    now = datetime.utcnow().isoformat()
+    return _outbox_container.create_item(body={
+        "id": str(uuid.uuid4()),
+        "type": "outbox_email",
+        "template": template,
+        "to": to_email,
+        "values": values,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    })
+
+def _replace(message: dict, changes: dict):
+    body = {key: value for key, value in message.items() if not key.startswith("_")}
+    body.update(changes)
+    return _outbox_container.replace_item(
+        item=message["id"],
+        body=body,
+        etag=message["_etag"],
+        match_condition=MatchConditions.IfNotModified
+    )
+
+def find_due_messages(now_iso: str, limit: int) -> list:
+    query = "SELECT TOP @limit * FROM c WHERE c.status = 'pending' AND c.next_attempt_at <= @now"
+    parameters = [{"name": "@limit", "value": limit}, {"name": "@now", "value": now_iso}]
+    return list(_outbox_container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+
+def claim_messages(messages: list, now: datetime) -> list:
+    """Lease messages to this drain; returns the ones won (with their new ETags)"""
+    lease_until = (now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS)).isoformat()
+
+    def claim(message):
+        try:
+            return _replace(message, {"next_attempt_at": lease_until, "attempts": message.get("attempts", 0) + 1})
+        except (CosmosAccessConditionFailedError, CosmosResourceNotFoundError):
+            return None  # Another drain got it first
+
+    return [result for _, result, _ in run_bounded(claim, messages) if result]
+
+def _settle(message: dict, error: str, now: datetime, permanent: bool = False) -> str:
+    """Schedule a retry (or give up) on a failed message; returns its new status"""
+    attempts = message.get("attempts", 1)
+    if permanent or attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+        changes = {"status": "dead", "last_error": error}
+    else:
+        delay = EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1)
+        changes = {"next_attempt_at": (now + timedelta(seconds=delay)).isoformat(), "last_error": error}
+    _replace(message, changes)
+    return changes.get("status", "pending")
+
+def _delete(message: dict):
+    try:
+        _outbox_container.delete_item(
+            item=message["id"],
+            partition_key=message["id"],
+            etag=message["_etag"],
+            match_condition=MatchConditions.IfNotModified
+        )
+    except CosmosResourceNotFoundError:
+        pass
+
+def drain_batch(now: datetime = None, limit: int = None) -> dict:
+    """Claim, render and send one batch of due messages"""
+    from email_service import send_emails
+
+    now = now or datetime.utcnow()
+    due = find_due_messages(now.isoformat(), limit or EMAIL_OUTBOX_BATCH_SIZE)
+    messages = claim_messages(due, now)
+
+    rendered, failed = [], []
+    for message in messages:
+        try:
+            subject, html_content, text_content = TEMPLATES[message["template"]].render(message["values"])
+            rendered.append((message, (message["to"], subject, html_content, text_content)))
+        except KeyError as e:
+            # Retrying won't fix a message that can't be rendered
+            failed.append((message, f"Cannot render: missing {str(e)}", True))
+
+    summary = send_emails([outgoing for _, outgoing in rendered]) if rendered else {"failures": [], "failed_indexes": []}
+    # Matched by position: one address can have several messages in the batch
+    errors = {index: error for index, (_, error) in zip(summary["failed_indexes"], summary["failures"])}
+
+    delivered = []
+    for index, (message, _) in enumerate(rendered):
+        if index in errors:
+            failed.append((message, errors[index], False))
+        else:
+            delivered.append(message)
+
+    for message, _, error in run_bounded(_delete, delivered):
+        if error:
+            logging.error(f"Error removing sent email {message['id']} from the outbox: {str(error)}")
+
+    statuses = []
+    for (message, _, _), status, error in run_bounded(lambda item: _settle(item[0], item[1], now, item[2]), failed):
+        if error:
+            logging.error(f"Error rescheduling email {message['id']}: {str(error)}")
+        statuses.append(status)
+
+    return {
+        "due": len(due),
+        "claimed": len(messages),
+        "sent": len(delivered),
+        "retrying": statuses.count("pending"),
+        "dead": statuses.count("dead")
+    }
+
+def drain_outbox(time_budget_seconds: float = None) -> dict:
+    """Drain batches until the outbox has nothing due or the time budget runs out"""
+    started = time.monotonic()
+    deadline = started + (time_budget_seconds or EMAIL_OUTBOX_TIME_BUDGET_SECONDS)
+    totals = {"due": 0, "claimed": 0, "sent": 0, "retrying": 0, "dead": 0, "batches": 0}
+
+    while time.monotonic() < deadline:
+        batch = drain_batch()
+        totals["batches"] += 1
+        for key, value in batch.items():
+            totals[key] += value
+        if batch["due"] < EMAIL_OUTBOX_BATCH_SIZE or batch["claimed"] == 0:
+            break
+
+    totals["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    logging.info(f"Email outbox drain: {totals}")
+    return totals
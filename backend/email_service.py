@@ -1,13 +1,15 @@
 # email_service.py
 import os
-import smtplib
-import ssl
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
 import datetime
 import uuid
 from database import get_user_by_email, _container
+from mail_transport import SMTPConnectionPool, MailTransport
+from email_templates import render, html_to_text
+from email_outbox import enqueue_email
 
 # Email configuration
 EMAIL_HOST = os.environ.get("EMAIL_HOST", "smtp.gmail.com")
@@ -16,116 +18,121 @@ EMAIL_USER = os.environ.get("EMAIL_USER", "support.gradeguard@gmail.com")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD", "")  # Set in environment variables
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "GradeGuard <support.gradeguard@gmail.com>")
 SITE_URL = os.environ.get("SITE_URL", "https://sarveshmina.co.uk/GradeGuard")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "true").lower() != "false"
+EMAIL_POOL_SIZE = int(os.environ.get("EMAIL_POOL_SIZE", 2))
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 50))
 
 # Token validity (in seconds)
 PASSWORD_RESET_TOKEN_VALIDITY = 86400  # 24 hours
 
-def send_email(to_email, subject, html_content, text_content=None):
-    """Send an email using the configured SMTP settings"""
-    if not EMAIL_PASSWORD:
-        logging.warning("EMAIL_PASSWORD not set. Email not sent.")
-        return False
-    
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_mail_transport() -> MailTransport:
+    """Process-wide pooled SMTP transport, created on first use"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            pool = SMTPConnectionPool(
+                EMAIL_HOST,
+                EMAIL_PORT,
+                username=EMAIL_USER,
+                password=EMAIL_PASSWORD,
+                use_tls=EMAIL_USE_TLS,
+                size=EMAIL_POOL_SIZE
+            )
+            _transport = MailTransport(pool, batch_size=EMAIL_BATCH_SIZE)
+        return _transport
+
+def build_message(to_email, subject, html_content, text_content=None):
+    """Build the multipart (plain text + HTML) message for one recipient"""
     message = MIMEMultipart("alternative")
     message["Subject"] = subject
     message["From"] = DEFAULT_FROM_EMAIL
     message["To"] = to_email
     
-    # Create plain text version if not provided
+    # Create plain text version if not provided (templates from email_templates always provide one)
     if not text_content:
-        text_content = html_content.replace('<br>', '\n').replace('<p>', '\n').replace('</p>', '\n')
-        # Remove other HTML tags
-        import re
-        text_content = re.sub(r'<[^>]*>', '', text_content)
+        text_content = html_to_text(html_content)
     
     part1 = MIMEText(text_content, "plain")
     part2 = MIMEText(html_content, "html")
     
     message.attach(part1)
     message.attach(part2)
+    return message
+
+def send_email(to_email, subject, html_content, text_content=None):
+    """Send an email using the configured SMTP settings"""
+    if not EMAIL_PASSWORD:
+        logging.warning("EMAIL_PASSWORD not set. Email not sent.")
+        return False
+
+    message = build_message(to_email, subject, html_content, text_content)
     
     try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls(context=context)
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, to_email, message.as_string())
-        logging.info(f"Email sent to {to_email}")
-        return True
+        if get_mail_transport().send(EMAIL_USER, to_email, message):
+            logging.info(f"Email sent to {to_email}")
+            return True
+        logging.error(f"Error sending email to {to_email}")
+        return False
     except Exception as e:
         logging.error(f"Error sending email: {str(e)}")
         return False
 
-def send_welcome_email(user_email, first_name):
-    """Send a welcome email to a newly registered user"""
-    subject = "Welcome to GradeGuard!"
-    
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-        <h1 style="color: #4f46e5;">Welcome to GradeGuard!</h1>
-        <p>Hello {first_name},</p>
-        <p>Thank you for registering with GradeGuard! We're excited to have you on board.</p>
-        <p>GradeGuard helps you track your academic progress, calculate your grades, and stay on top of your educational journey.</p>
-        <p>Here are some things you can do with your new account:</p>
-        <ul>
-            <li>Track your modules and assignments</li>
-            <li>Calculate your potential final grades</li>
-            <li>Set goals and monitor your progress</li>
-            <li>Get insights into your academic performance</li>
-        </ul>
-        <p>If you have any questions or need assistance, please don't hesitate to contact our support team.</p>
-        <p>Best regards,<br>The GradeGuard Team</p>
-    </div>
+def send_emails(messages):
     """
-    
-    return send_email(user_email, subject, html_content)
+    Send many emails over pooled connections.
+    messages: [(to_email, subject, html_content, text_content or None), ...]
+    Returns the transport summary (sent/failed counts, positions of the failed messages,
+    per-batch latency, throughput).
+    """
+    if not EMAIL_PASSWORD:
+        logging.warning("EMAIL_PASSWORD not set. Emails not sent.")
+        return {"sent": 0, "failed": len(messages),
+                "failures": [(to_email, "EMAIL_PASSWORD not set") for to_email, _, _, _ in messages],
+                "failed_indexes": list(range(len(messages))), "batches": [],
+                "elapsed_seconds": 0, "messages_per_second": 0}
+
+    queued = [
+        (EMAIL_USER, to_email, build_message(to_email, subject, html_content, text_content))
+        for to_email, subject, html_content, text_content in messages
+    ]
+    return get_mail_transport().send_batch(queued)
+
+def _queue_email(template, user_email, **values):
+    """Put a message in the outbox; an outbox failure is logged, never raised to the caller"""
+    try:
+        enqueue_email(template, user_email, **values)
+        return True
+    except Exception as e:
+        logging.error(f"Error queueing {template} email: {str(e)}")
+        return False
+
+def send_welcome_email(user_email, first_name):
+    """Queue a welcome email to a newly registered user"""
+    return _queue_email("welcome", user_email, first_name=first_name)
 
 def send_login_notification(user_email, first_name, ip_address, device_info, location=None):
-    """Send a notification when a user logs in from a new device"""
-    subject = "New Login Detected - GradeGuard Account"
-    
-    location_str = f" from {location}" if location else ""
-    login_time = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-    
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-        <h1 style="color: #4f46e5;">New Login Alert</h1>
-        <p>Hello {first_name},</p>
-        <p>We detected a new login to your GradeGuard account{location_str}.</p>
-        <p><strong>Details:</strong></p>
-        <ul>
-            <li><strong>Time:</strong> {login_time}</li>
-            <li><strong>IP Address:</strong> {ip_address}</li>
-            <li><strong>Device:</strong> {device_info}</li>
-        </ul>
-        <p>If this was you, you can ignore this email. If you didn't log in recently, please secure your account by:</p>
-        <ol>
-            <li>Changing your password immediately</li>
-            <li>Contacting our support team</li>
-        </ol>
-        <p>Best regards,<br>The GradeGuard Team</p>
-    </div>
-    """
-    
-    return send_email(user_email, subject, html_content)
+    """Queue a notification when a user logs in from a new device"""
+    return _queue_email(
+        "login_notification",
+        user_email,
+        first_name=first_name,
+        location_suffix=f" from {location}" if location else "",
+        login_time=datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
+        ip_address=ip_address,
+        device_info=device_info
+    )
 
 def send_password_changed_email(user_email, first_name):
-    """Send notification when a user changes their password"""
-    subject = "Password Changed - GradeGuard Account"
-    
-    change_time = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-    
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-        <h1 style="color: #4f46e5;">Password Changed</h1>
-        <p>Hello {first_name},</p>
-        <p>Your GradeGuard account password was successfully changed at {change_time}.</p>
-        <p>If you did not make this change, please contact our support team immediately.</p>
-        <p>Best regards,<br>The GradeGuard Team</p>
-    </div>
-    """
-    
-    return send_email(user_email, subject, html_content)
+    """Queue a notification when a user changes their password"""
+    return _queue_email(
+        "password_changed",
+        user_email,
+        first_name=first_name,
+        change_time=datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+    )
 
 def generate_password_reset_token(user_email):
     """Generate a password reset token and store it in the database"""
@@ -183,7 +190,7 @@ def invalidate_reset_token(token):
         return False
 
 def send_password_reset_email(user_email):
-    """Send password reset link to user"""
+    """Create a reset token and queue the reset link email"""
     user_doc = get_user_by_email(user_email)
     if not user_doc:
         return False
@@ -203,52 +210,29 @@ def send_password_reset_email(user_email):
     
     reset_link = f"{site_url}/reset-password?token={token}"
     
-    subject = "Password Reset - GradeGuard Account"
-    
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-        <h1 style="color: #4f46e5;">Password Reset Request</h1>
-        <p>Hello {first_name},</p>
-        <p>We received a request to reset your password for your GradeGuard account.</p>
-        <p>To reset your password, please click the link below:</p>
-        <p><a href="{reset_link}" style="display: inline-block; background-color: #4f46e5; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Reset Password</a></p>
-        <p>Or copy and paste this URL into your browser: <br><a href="{reset_link}">{reset_link}</a></p>
-        <p>This link will expire in 24 hours.</p>
-        <p>If you did not request a password reset, please ignore this email.</p>
-        <p>Best regards,<br>The GradeGuard Team</p>
-    </div>
-    """
-
     print("\n\n==== PASSWORD RESET LINK ====")
     print(reset_link)
     print("=============================\n\n")
     
-    return send_email(user_email, subject, html_content)
+    return _queue_email("password_reset", user_email, first_name=first_name, reset_link=reset_link)
 
-def send_reminder_email(user_email, event_title, event_date, event_time=None):
-    """Send a reminder email for an upcoming event or deadline"""
-    user_doc = get_user_by_email(user_email)
+def reminder_values(user_doc, event_title, event_date, event_time=None):
+    """Template values for the "reminder" email"""
+    return {
+        "first_name": user_doc.get("firstName", "User"),
+        "event_title": event_title,
+        "event_date": event_date,
+        "time_suffix": f" at {event_time}" if event_time else ""
+    }
+
+def send_reminder_email(user_email, event_title, event_date, event_time=None, user_doc=None):
+    """Send a reminder email for an upcoming event or deadline (pass user_doc if already loaded)"""
+    if user_doc is None:
+        user_doc = get_user_by_email(user_email)
     if not user_doc:
         return False
     
-    first_name = user_doc.get("firstName", "User")
-    
-    subject = f"Reminder: {event_title} - GradeGuard"
-    
-    time_str = f" at {event_time}" if event_time else ""
-    
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-        <h1 style="color: #4f46e5;">Event Reminder</h1>
-        <p>Hello {first_name},</p>
-        <p>This is a reminder about your upcoming event:</p>
-        <div style="background-color: #f9f9f9; padding: 15px; border-left: 4px solid #4f46e5; margin: 15px 0;">
-            <h2 style="margin-top: 0;">{event_title}</h2>
-            <p><strong>Date:</strong> {event_date}{time_str}</p>
-        </div>
-        <p>Log in to your GradeGuard account to view more details.</p>
-        <p>Best regards,<br>The GradeGuard Team</p>
-    </div>
-    """
-    
-    return send_email(user_email, subject, html_content)
\ No newline at end of file
+    subject, html_content, text_content = render(
+        "reminder", **reminder_values(user_doc, event_title, event_date, event_time)
+    )
+    return send_email(user_email, subject, html_content, text_content)
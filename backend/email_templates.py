@@ -0,0 +1,135 @@
+# email_templates.py
+"""
+Email template registry.
+
+Each template (subject, HTML body, and the plain-text body derived from the HTML) is
+compiled once at import into a list of literal chunks and field names, so rendering
+is a join over the values instead of building f-strings and stripping tags with a
+regex for every message. Values are HTML-escaped in the HTML part only.
+
+    subject, html_content, text_content = render("reminder", first_name=..., ...)
+    rendered = render_many("reminder", [values, values, ...])  # batch jobs
+
+The (subject, html, text) tuples fit straight into email_service.send_emails.
+"""
+import re
+import html
+from string import Formatter
+from typing import Dict, Iterable, List, Tuple
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+_LAYOUT = """
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
+{body}
+        <p>Best regards,<br>The GradeGuard Team</p>
+    </div>
+    """
+
+def html_to_text(html_content: str) -> str:
+    """Plain-text version of an HTML body (paragraphs and line breaks become newlines)"""
+    text = html_content.replace('<br>', '\n').replace('<p>', '\n').replace('</p>', '\n')
+    return _TAG_RE.sub('', text)
+
+class CompiledTemplate:
+    """A "{field}" template split once into literal chunks and field names"""
+
+    def __init__(self, source: str, escape: bool = False):
+        self.parts: List[Tuple[str, str]] = [
+            (literal, field or "") for literal, field, _, _ in Formatter().parse(source)
+        ]
+        self.fields = {field for _, field in self.parts if field}
+        self.escape = escape
+
+    def render(self, values: Dict[str, object]) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field:
+                value = str(values[field])
+                out.append(html.escape(value) if self.escape else value)
+        return "".join(out)
+
+class EmailTemplate:
+    def __init__(self, subject: str, body: str):
+        html_source = _LAYOUT.replace("{body}", body)
+        self.subject = CompiledTemplate(subject)
+        self.html = CompiledTemplate(html_source, escape=True)
+        # Derived from the template, not from each rendered message
+        self.text = CompiledTemplate(html_to_text(html_source))
+
+    def render(self, values: Dict[str, object]) -> Tuple[str, str, str]:
+        return self.subject.render(values), self.html.render(values), self.text.render(values)
+
+TEMPLATES: Dict[str, EmailTemplate] = {
+    "welcome": EmailTemplate(
+        "Welcome to GradeGuard!",
+        """        <h1 style="color: #4f46e5;">Welcome to GradeGuard!</h1>
+        <p>Hello {first_name},</p>
+        <p>Thank you for registering with GradeGuard! We're excited to have you on board.</p>
+        <p>GradeGuard helps you track your academic progress, calculate your grades, and stay on top of your educational journey.</p>
+        <p>Here are some things you can do with your new account:</p>
+        <ul>
+            <li>Track your modules and assignments</li>
+            <li>Calculate your potential final grades</li>
+            <li>Set goals and monitor your progress</li>
+            <li>Get insights into your academic performance</li>
+        </ul>
+        <p>If you have any questions or need assistance, please don't hesitate to contact our support team.</p>"""
+    ),
+    "login_notification": EmailTemplate(
+        "New Login Detected - GradeGuard Account",
+        """        <h1 style="color: #4f46e5;">New Login Alert</h1>
+        <p>Hello {first_name},</p>
+        <p>We detected a new login to your GradeGuard account{location_suffix}.</p>
+        <p><strong>Details:</strong></p>
+        <ul>
+            <li><strong>Time:</strong> {login_time}</li>
+            <li><strong>IP Address:</strong> {ip_address}</li>
+            <li><strong>Device:</strong> {device_info}</li>
+        </ul>
+        <p>If this was you, you can ignore this email. If you didn't log in recently, please secure your account by:</p>
+        <ol>
+            <li>Changing your password immediately</li>
+            <li>Contacting our support team</li>
+        </ol>"""
+    ),
+    "password_changed": EmailTemplate(
+        "Password Changed - GradeGuard Account",
+        """        <h1 style="color: #4f46e5;">Password Changed</h1>
+        <p>Hello {first_name},</p>
+        <p>Your GradeGuard account password was successfully changed at {change_time}.</p>
+        <p>If you did not make this change, please contact our support team immediately.</p>"""
+    ),
+    "password_reset": EmailTemplate(
+        "Password Reset - GradeGuard Account",
+        """        <h1 style="color: #4f46e5;">Password Reset Request</h1>
+        <p>Hello {first_name},</p>
+        <p>We received a request to reset your password for your GradeGuard account.</p>
+        <p>To reset your password, please click the link below:</p>
+        <p><a href="{reset_link}" style="display: inline-block; background-color: #4f46e5; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Reset Password</a></p>
+        <p>Or copy and paste this URL into your browser: <br><a href="{reset_link}">{reset_link}</a></p>
+        <p>This link will expire in 24 hours.</p>
+        <p>If you did not request a password reset, please ignore this email.</p>"""
+    ),
+    "reminder": EmailTemplate(
+        "Reminder: {event_title} - GradeGuard",
+        """        <h1 style="color: #4f46e5;">Event Reminder</h1>
+        <p>Hello {first_name},</p>
+        <p>This is a reminder about your upcoming event:</p>
+        <div style="background-color: #f9f9f9; padding: 15px; border-left: 4px solid #4f46e5; margin: 15px 0;">
+            <h2 style="margin-top: 0;">{event_title}</h2>
+            <p><strong>Date:</strong> {event_date}{time_suffix}</p>
+        </div>
+        <p>Log in to your GradeGuard account to view more details.</p>"""
+    ),
+}
+
+def render(name: str, **values) -> Tuple[str, str, str]:
+    """(subject, html_content, text_content) for one message"""
+    return TEMPLATES[name].render(values)
+
+def render_many(name: str, rows: Iterable[Dict[str, object]]) -> List[Tuple[str, str, str]]:
+    """Render one template for many value dicts (template lookup done once)"""
+    template = TEMPLATES[name]
+    return [template.render(values) for values in rows]
@@ -1,3 +1,6 @@
+import time
+_started = time.perf_counter()
+
 import azure.functions as func
 import json
 import sys
@@ -7,47 +10,65 @@ import datetime
 # Add the current directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from user_routes import (
-    register_user,
-    login_user,
-    protected_resource,
-    get_universities_endpoint,
-    get_university_endpoint,
-    search_universities_endpoint,
-    update_calculator_config,
-    get_calculator_config
-)
-from google_auth import google_login_redirect, google_auth_callback
-from calendar_routes import get_events, create_event, update_event, delete_event
-from user_profile_routes import get_user_profile, update_user_profile, get_avatar_upload_url
-from account_routes import change_password, get_settings, update_settings
-from module_routes import (
-    get_all_modules,
-    get_module,
-    create_module,
-    update_module,
-    delete_module,
-    get_modules_by_year_semester,
-    get_module_suggestions
-)
-from dashboard_routes import (
-    get_dashboard_data,
-    update_dashboard_config,
-    add_activity,
-    update_goals,
-    get_insights
-)
-from university_routes import (
-    get_university_modules,
-    get_degree_requirements,
-    import_template_modules
-)
-from user_routes import verify_session, logout_user
-from database import get_user_by_email, _container
-from onboarding_routes import get_onboarding_status, save_onboarding_questionnaire
-from module_routes import get_module_analytics
-from password_reset_routes import request_password_reset, reset_password, verify_token
-from reminder_routes import create_reminder, get_reminders, delete_reminder, process_reminders, create_event_reminder
+# Route modules (and the SDKs they pull in) are imported on first use, not at cold start;
+# route_loader logs each one's import time when that happens and a summary at startup
+from route_loader import lazy_handler, record_import_time, log_startup_summary
+
+register_user = lazy_handler("user_routes", "register_user")
+login_user = lazy_handler("user_routes", "login_user")
+protected_resource = lazy_handler("user_routes", "protected_resource")
+get_universities_endpoint = lazy_handler("user_routes", "get_universities_endpoint")
+get_university_endpoint = lazy_handler("user_routes", "get_university_endpoint")
+search_universities_endpoint = lazy_handler("user_routes", "search_universities_endpoint")
+update_calculator_config = lazy_handler("user_routes", "update_calculator_config")
+get_calculator_config = lazy_handler("user_routes", "get_calculator_config")
+google_login_redirect = lazy_handler("google_auth", "google_login_redirect")
+google_auth_callback = lazy_handler("google_auth", "google_auth_callback")
+get_events = lazy_handler("calendar_routes", "get_events")
+create_event = lazy_handler("calendar_routes", "create_event")
+update_event = lazy_handler("calendar_routes", "update_event")
+delete_event = lazy_handler("calendar_routes", "delete_event")
+export_events_ics = lazy_handler("calendar_routes", "export_events_ics")
+import_events_ics = lazy_handler("calendar_routes", "import_events_ics")
+get_user_profile = lazy_handler("user_profile_routes", "get_user_profile")
+update_user_profile = lazy_handler("user_profile_routes", "update_user_profile")
+get_avatar_upload_url = lazy_handler("user_profile_routes", "get_avatar_upload_url")
+change_password = lazy_handler("account_routes", "change_password")
+get_settings = lazy_handler("account_routes", "get_settings")
+update_settings = lazy_handler("account_routes", "update_settings")
+get_all_modules = lazy_handler("module_routes", "get_all_modules")
+get_module = lazy_handler("module_routes", "get_module")
+create_module = lazy_handler("module_routes", "create_module")
+update_module = lazy_handler("module_routes", "update_module")
+delete_module = lazy_handler("module_routes", "delete_module")
+get_modules_by_year_semester = lazy_handler("module_routes", "get_modules_by_year_semester")
+get_module_suggestions = lazy_handler("module_routes", "get_module_suggestions")
+get_dashboard_data = lazy_handler("dashboard_routes", "get_dashboard_data")
+update_dashboard_config = lazy_handler("dashboard_routes", "update_dashboard_config")
+add_activity = lazy_handler("dashboard_routes", "add_activity")
+update_goals = lazy_handler("dashboard_routes", "update_goals")
+get_insights = lazy_handler("dashboard_routes", "get_insights")
+get_university_modules = lazy_handler("university_routes", "get_university_modules")
+get_degree_requirements = lazy_handler("university_routes", "get_degree_requirements")
+import_template_modules = lazy_handler("university_routes", "import_template_modules")
+verify_session = lazy_handler("user_routes", "verify_session")
+logout_user = lazy_handler("user_routes", "logout_user")
+get_user_by_email = lazy_handler("database", "get_user_by_email")
+get_onboarding_status = lazy_handler("onboarding_routes", "get_onboarding_status")
+save_onboarding_questionnaire = lazy_handler("onboarding_routes", "save_onboarding_questionnaire")
+get_module_analytics = lazy_handler("module_routes", "get_module_analytics")
+request_password_reset = lazy_handler("password_reset_routes", "request_password_reset")
+reset_password = lazy_handler("password_reset_routes", "reset_password")
+verify_token = lazy_handler("password_reset_routes", "verify_token")
+create_reminder = lazy_handler("reminder_routes", "create_reminder")
+get_reminders = lazy_handler("reminder_routes", "get_reminders")
+delete_reminder = lazy_handler("reminder_routes", "delete_reminder")
+process_reminders = lazy_handler("reminder_routes", "process_reminders")
+create_event_reminder = lazy_handler("reminder_routes", "create_event_reminder")
+drain_outbox = lazy_handler("email_outbox", "drain_outbox")
+repair_dirty_cohorts = lazy_handler("cohort_stats", "repair_dirty_cohorts")
+process_avatar = lazy_handler("avatar_thumbnails", "process_avatar")
+is_thumbnail = lazy_handler("avatar_thumbnails", "is_thumbnail")
 
 # Configure CORS settings - UPDATED FOR MULTIPLE ENVIRONMENTS
 ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "http://localhost:5173,https://sarveshmina.co.uk").split(",")
@@ -81,6 +102,9 @@ def add_cors_headers(response: func.HttpResponse, req: func.HttpRequest = None)
 
 app = func.FunctionApp()
 
+record_import_time("function_app", _started)
+log_startup_summary()
+
 @app.route(route="register", methods=["POST", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
 def register_endpoint(req: func.HttpRequest) -> func.HttpResponse:
     if req.method == "OPTIONS":
@@ -149,6 +173,7 @@ def search_universities_route(req: func.HttpRequest) -> func.HttpResponse:
     if req.method == "OPTIONS":
         return cors_preflight_response(req)
     response = search_universities_endpoint(req)
+    response.headers["Access-Control-Expose-Headers"] = "X-Total-Count"
     return add_cors_headers(response, req)
 
 @app.route(route="user/config", methods=["GET", "PUT", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
@@ -196,6 +221,7 @@ def user_config_endpoint(req: func.HttpRequest) -> func.HttpResponse:
         for key, value in config_update.items():
             user_doc["config"][key] = value
 
+        from database import _container
         _container.upsert_item(user_doc)
 
         response = func.HttpResponse(
@@ -223,6 +249,20 @@ def calendar_events(req: func.HttpRequest) -> func.HttpResponse:
 
     return add_cors_headers(response, req)
 
+@app.route(route="calendar/events.ics", methods=["GET", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
+def calendar_export_ics(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method == "OPTIONS":
+        return cors_preflight_response(req)
+    response = export_events_ics(req)
+    return add_cors_headers(response, req)
+
+@app.route(route="calendar/import", methods=["POST", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
+def calendar_import_ics(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method == "OPTIONS":
+        return cors_preflight_response(req)
+    response = import_events_ics(req)
+    return add_cors_headers(response, req)
+
 @app.route(route="calendar/events/{id}", methods=["PUT", "DELETE", "OPTIONS"], auth_level=func.AuthLevel.ANONYMOUS)
 def calendar_event_by_id(req: func.HttpRequest) -> func.HttpResponse:
     if req.method == "OPTIONS":
@@ -526,4 +566,33 @@ def create_event_reminder_endpoint(req: func.HttpRequest) -> func.HttpResponse:
     if req.method == "OPTIONS":
         return cors_preflight_response(req)
     response = create_event_reminder(req)
-    return add_cors_headers(response, req)
\ No newline at end of file
+    return add_cors_headers(response, req)
+
+@app.timer_trigger(schedule="0 */1 * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+def email_outbox_timer(timer: func.TimerRequest) -> None:
+    """Send queued emails (welcome, password reset, notifications) from the outbox"""
+    try:
+        drain_outbox()
+    except Exception as e:
+        print(f"Error draining email outbox: {str(e)}")
+
+@app.timer_trigger(schedule="0 */5 * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+def cohort_stats_repair_timer(timer: func.TimerRequest) -> None:
+    """Rebuild module statistics for cohorts whose running totals missed an update"""
+    try:
+        repair_dirty_cohorts()
+    except Exception as e:
+        print(f"Error repairing cohort stats: {str(e)}")
+
+# Container name must match STORAGE_CONTAINER_NAME; thumbnails written back under
+# "thumbnails/" fire this trigger too and are skipped before their content is read
+@app.blob_trigger(arg_name="blob", path="user-avatars/{name}", connection="STORAGE_CONNECTION_STRING")
+def avatar_thumbnail_trigger(blob: func.InputStream) -> None:
+    """Generate fixed-size thumbnails for a newly uploaded avatar"""
+    blob_name = blob.name.split("/", 1)[1]  # blob.name includes the container
+    try:
+        if is_thumbnail(blob_name):
+            return
+        process_avatar(blob_name, blob.read())
+    except Exception as e:
+        print(f"Error generating thumbnails for {blob_name}: {str(e)}")
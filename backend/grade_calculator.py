@@ -1,13 +1,12 @@
 # grade_calculator.py
 import json
 from typing import List, Dict, Any, Optional
-from database import get_user_by_email, _container
+from database import list_user_modules
+from data_context import UserDataContext, get_context
 
 def get_user_modules(email: str) -> List[Dict[str, Any]]:
     """Retrieve modules for a user"""
-    query = f"SELECT * FROM c WHERE c.type = 'module' AND c.user_email = '{email}'"
-    modules = list(_container.query_items(query=query, enable_cross_partition_query=True))
-    return modules
+    return list_user_modules(email)
 
 def get_modules_by_year_semester(email: str) -> Dict[str, Dict[int, List[Dict[str, Any]]]]:
     """Get modules organized by year and semester"""
@@ -28,52 +27,172 @@ def get_modules_by_year_semester(email: str) -> Dict[str, Dict[int, List[Dict[st
     
     return organized
 
+# Grade bands used for the grade distribution (inclusive bounds, same as the dashboard ranges)
+GRADE_BANDS = [
+    ("0-39%", 0, 39),
+    ("40-49%", 40, 49),
+    ("50-59%", 50, 59),
+    ("60-69%", 60, 69),
+    ("70-100%", 70, 100)
+]
+
+def _grade_band(score: float) -> Optional[int]:
+    """Return the index of the grade band a score falls in, or None if it falls between bands"""
+    for index, (_, low, high) in enumerate(GRADE_BANDS):
+        if low <= score <= high:
+            return index
+    return None
+
+class GradeBucket:
+    """Running totals for a group of modules (a semester, a year or the whole degree)"""
+    __slots__ = ("credits", "weighted_sum", "count", "score_sum", "_running_mean", "_m2",
+                 "min_score", "max_score", "histogram", "modules")
+
+    def __init__(self):
+        self.credits = 0
+        self.weighted_sum = 0
+        self.count = 0
+        self.score_sum = 0
+        self._running_mean = 0
+        self._m2 = 0
+        self.min_score = None
+        self.max_score = None
+        self.histogram = [0] * len(GRADE_BANDS)
+        self.modules = []
+
+    def add(self, module: Dict[str, Any], score: float, credits: float, band: Optional[int]):
+        self.credits += credits
+        self.weighted_sum += score * credits
+        self.count += 1
+        self.score_sum += score
+        # Welford's update keeps the variance numerically stable in a single pass
+        delta = score - self._running_mean
+        self._running_mean += delta / self.count
+        self._m2 += delta * (score - self._running_mean)
+        if self.min_score is None or score < self.min_score:
+            self.min_score = score
+        if self.max_score is None or score > self.max_score:
+            self.max_score = score
+        if band is not None:
+            self.histogram[band] += 1
+        self.modules.append(module)
+
+    @property
+    def weighted_average(self) -> float:
+        """Credit-weighted average, rounded the same way the dashboard has always shown it"""
+        if self.count == 0 or self.credits == 0:
+            return 0.0
+        return round(self.weighted_sum / self.credits, 1)
+
+    @property
+    def mean(self) -> float:
+        return self.score_sum / self.count if self.count else 0
+
+    @property
+    def std_dev(self) -> float:
+        """Population standard deviation of the raw module scores"""
+        if not self.count:
+            return 0
+        return (self._m2 / self.count) ** 0.5
+
+class GradeAggregate:
+    """
+    Walks a user's module list once and keeps credit-weighted sums, counts, min/max and
+    grade-band histograms per (year, semester), per year and for the whole degree.
+    Every dashboard, target and prediction calculation reads from this structure instead
+    of re-filtering the module list.
+
+    Modules without a semester are listed (and their credits counted) under semester 1,
+    but semester averages match on the stored semester, as calculate_semester_average
+    always did, so they are left out of the semester 1 average.
+    """
+
+    def __init__(self, modules: List[Dict[str, Any]]):
+        self.buckets: Dict[tuple, GradeBucket] = {}
+        self.scheduled: Dict[tuple, GradeBucket] = {}  # (year, semester as stored) -> modules, for averages
+        self.years: Dict[Any, GradeBucket] = {}
+        self.total = GradeBucket()
+        self.top_module: Optional[Dict[str, Any]] = None
+
+        for module in modules:
+            year = module.get("year")
+            semester = module.get("semester", 1)
+            score = module.get("score", 0)
+            credits = module.get("credits", 0)
+            band = _grade_band(score)
+
+            key = (year, semester)
+            if key not in self.buckets:
+                self.buckets[key] = GradeBucket()
+            if year not in self.years:
+                self.years[year] = GradeBucket()
+
+            self.buckets[key].add(module, score, credits, band)
+            self.years[year].add(module, score, credits, band)
+            self.total.add(module, score, credits, band)
+
+            average_key = (year, module.get("semester"))
+            if average_key not in self.scheduled:
+                self.scheduled[average_key] = GradeBucket()
+            self.scheduled[average_key].add(module, score, credits, band)
+
+            if self.top_module is None or score > self.top_module.get("score", 0):
+                self.top_module = module
+
+    def year_bucket(self, year: str) -> GradeBucket:
+        return self.years.get(year) or GradeBucket()
+
+    def semester_bucket(self, year: str, semester: int) -> GradeBucket:
+        return self.buckets.get((year, semester)) or GradeBucket()
+
+    def year_average(self, year: str) -> float:
+        return self.year_bucket(year).weighted_average
+
+    def semester_average(self, year: str, semester: int) -> float:
+        bucket = self.scheduled.get((year, semester))
+        return bucket.weighted_average if bucket else 0.0
+
+    def semesters(self, year: str) -> List[int]:
+        """Distinct semesters that have modules in the given year, in order"""
+        return sorted(semester for (y, semester) in self.buckets if y == year)
+
+    def overall_average(self, year_weights: Dict[str, float]) -> float:
+        """Weighted average of the year averages using the configured year weights"""
+        if not self.total.count or not year_weights:
+            return 0.0
+
+        year_averages = {year: self.year_average(year) for year in year_weights}
+
+        total_weight = sum(weight for year, weight in year_weights.items() if year_averages[year] > 0)
+        if total_weight == 0:
+            return 0.0
+
+        weighted_sum = sum(year_averages[year] * weight for year, weight in year_weights.items())
+        return round(weighted_sum / total_weight, 1)
+
+    def grade_distribution(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": name, "range": [low, high], "count": self.total.histogram[index]}
+            for index, (name, low, high) in enumerate(GRADE_BANDS)
+        ]
+
+def get_aggregate(ctx: UserDataContext) -> GradeAggregate:
+    """The grade aggregate for the context's modules, built once per request"""
+    return ctx.memoize("aggregate", lambda: GradeAggregate(ctx.modules))
+
 def calculate_year_average(modules: List[Dict[str, Any]], year: str) -> float:
     """Calculate the weighted average for a specific year"""
-    year_modules = [m for m in modules if m.get("year") == year]
-
-    if not year_modules:
-        return 0.0
-
-    total_credits = sum(m.get("credits", 0) for m in year_modules)
-    if total_credits == 0:
-        return 0.0
-
-    weighted_sum = sum(m.get("score", 0) * m.get("credits", 0) for m in year_modules)
-    return round(weighted_sum / total_credits, 1)
+    return GradeAggregate(modules).year_average(year)
 
 def calculate_semester_average(modules: List[Dict[str, Any]], year: str, semester: int) -> float:
     """Calculate the weighted average for a specific semester within a year"""
-    semester_modules = [
-        m for m in modules 
-        if m.get("year") == year and m.get("semester") == semester
-    ]
-
-    if not semester_modules:
-        return 0.0
-
-    total_credits = sum(m.get("credits", 0) for m in semester_modules)
-    if total_credits == 0:
-        return 0.0
-
-    weighted_sum = sum(m.get("score", 0) * m.get("credits", 0) for m in semester_modules)
-    return round(weighted_sum / total_credits, 1)
+    return GradeAggregate(modules).semester_average(year, semester)
 
 def calculate_overall_average(modules: List[Dict[str, Any]], year_weights: Dict[str, float]) -> float:
     """Calculate overall weighted average based on year weights"""
     if not modules or not year_weights:
         return 0.0
-
-    year_averages = {}
-    for year in year_weights.keys():
-        year_averages[year] = calculate_year_average(modules, year)
-
-    total_weight = sum(weight for year, weight in year_weights.items() if year_averages.get(year, 0) > 0)
-    if total_weight == 0:
-        return 0.0
-
-    weighted_sum = sum(year_averages.get(year, 0) * weight for year, weight in year_weights.items())
-    return round(weighted_sum / total_weight, 1)
+    return GradeAggregate(modules).overall_average(year_weights)
 
 def calculate_remaining_grade_needed(
     current_average: float,
@@ -95,9 +214,10 @@ def calculate_remaining_grade_needed(
 
     return round(points_needed / remaining_credits, 1)
 
-def get_dashboard_stats(email: str) -> Dict[str, Any]:
+def get_dashboard_stats(email: str, ctx: Optional[UserDataContext] = None) -> Dict[str, Any]:
     """Generate dashboard statistics for a user"""
-    user_doc = get_user_by_email(email)
+    ctx = get_context(email, ctx)
+    user_doc = ctx.user_doc
     if not user_doc:
         return {"error": "User not found"}
 
@@ -106,7 +226,7 @@ def get_dashboard_stats(email: str) -> Dict[str, Any]:
     year_settings = {y.get("year"): y.get("weight", 0) for y in calculator_config.get("years", []) if y.get("active", False)}
 
     # Get modules
-    modules = get_user_modules(email)
+    modules = ctx.modules
     
     # Calculate statistics
     stats = {
@@ -124,64 +244,59 @@ def get_dashboard_stats(email: str) -> Dict[str, Any]:
     if not modules:
         return stats
 
+    # Single pass over the modules; everything below reads from the aggregate
+    aggregate = get_aggregate(ctx)
+
     # Calculate completed credits
-    stats["completedCredits"] = sum(m.get("credits", 0) for m in modules)
+    stats["completedCredits"] = aggregate.total.credits
 
     # Calculate total credits from config
     stats["totalCredits"] = sum(y.get("credits", 0) for y in calculator_config.get("years", []) if y.get("active", False))
 
     # Find top module
-    if modules:
-        top_module = max(modules, key=lambda m: m.get("score", 0))
-        stats["topModule"] = {
-            "name": top_module.get("name", "Unknown"),
-            "score": top_module.get("score", 0)
-        }
+    top_module = aggregate.top_module
+    stats["topModule"] = {
+        "name": top_module.get("name", "Unknown"),
+        "score": top_module.get("score", 0)
+    }
 
     # Calculate year averages and organize modules by year and semester
     modules_by_year_semester = {}
+    year_configs = _year_configs_by_name(calculator_config)
     
     for year, weight in year_settings.items():
-        year_avg = calculate_year_average(modules, year)
+        year_bucket = aggregate.year_bucket(year)
+        year_avg = year_bucket.weighted_average
         stats["yearlyAverages"][year] = year_avg
 
-        year_modules = [m for m in modules if m.get("year") == year]
-        completed_credits = sum(m.get("credits", 0) for m in year_modules)
-        year_config = next((y for y in calculator_config.get("years", []) if y.get("year") == year), None)
+        year_config = year_configs.get(year)
         total_credits = year_config.get("credits", 0) if year_config else 0
 
         # Calculate semester averages for this year
-        semesters_in_year = {}
         semesters_data = []
         
-        # Get distinct semesters in this year's modules
-        semester_set = set(m.get("semester", 1) for m in year_modules)
-        
-        for semester in sorted(semester_set):
-            semester_avg = calculate_semester_average(modules, year, semester)
+        for semester in aggregate.semesters(year):
+            semester_bucket = aggregate.semester_bucket(year, semester)
+            semester_avg = aggregate.semester_average(year, semester)
             semester_key = f"{year}_sem{semester}"
             stats["semesterAverages"][semester_key] = semester_avg
             
-            # Get modules for this semester
-            semester_modules = [m for m in year_modules if m.get("semester", 1) == semester]
-            semester_credits = sum(m.get("credits", 0) for m in semester_modules)
-            
             semesters_data.append({
                 "semester": semester,
                 "average": semester_avg,
-                "credits": semester_credits
+                "credits": semester_bucket.credits
             })
             
             # Organize modules for the frontend
             if year not in modules_by_year_semester:
                 modules_by_year_semester[year] = {}
                 
-            modules_by_year_semester[year][semester] = semester_modules
+            modules_by_year_semester[year][semester] = semester_bucket.modules
 
         stats["yearData"].append({
             "name": year,
             "average": year_avg,
-            "credits": completed_credits,
+            "credits": year_bucket.credits,
             "totalCredits": total_credits,
             "weight": weight,
             "semesters": semesters_data
@@ -191,25 +306,10 @@ def get_dashboard_stats(email: str) -> Dict[str, Any]:
     stats["modulesByYearSemester"] = modules_by_year_semester
 
     # Calculate overall average
-    stats["overallAverage"] = calculate_overall_average(modules, year_settings)
+    stats["overallAverage"] = aggregate.overall_average(year_settings)
 
     # Calculate grade distribution
-    ranges = [
-        {"name": "0-39%", "range": [0, 39], "count": 0},
-        {"name": "40-49%", "range": [40, 49], "count": 0},
-        {"name": "50-59%", "range": [50, 59], "count": 0},
-        {"name": "60-69%", "range": [60, 69], "count": 0},
-        {"name": "70-100%", "range": [70, 100], "count": 0}
-    ]
-
-    for m in modules:
-        score = m.get("score", 0)
-        for r in ranges:
-            if r["range"][0] <= score <= r["range"][1]:
-                r["count"] += 1
-                break
-
-    stats["gradeDistribution"] = ranges
+    stats["gradeDistribution"] = aggregate.grade_distribution()
 
     # Calculate target grades needed
     remaining_credits = stats["totalCredits"] - stats["completedCredits"]
@@ -227,9 +327,17 @@ def get_dashboard_stats(email: str) -> Dict[str, Any]:
 
     return stats
 
-def get_prediction_analysis(email: str) -> Dict[str, Any]:
+def _year_configs_by_name(calculator_config: dict) -> Dict[str, dict]:
+    """Map year name to its calculator config entry (first entry wins, like the old lookups)"""
+    year_configs = {}
+    for year_config in calculator_config.get("years", []):
+        year_configs.setdefault(year_config.get("year"), year_config)
+    return year_configs
+
+def get_prediction_analysis(email: str, ctx: Optional[UserDataContext] = None) -> Dict[str, Any]:
     """Generate prediction analysis for future performance"""
-    modules = get_user_modules(email)
+    ctx = get_context(email, ctx)
+    modules = ctx.modules
     
     if not modules:
         return {
@@ -239,15 +347,12 @@ def get_prediction_analysis(email: str) -> Dict[str, Any]:
             "variability": 0
         }
         
-    # Calculate average, best and worst scores
-    scores = [m.get("score", 0) for m in modules]
-    avg_score = sum(scores) / len(scores) if scores else 0
-    best_score = max(scores) if scores else 0
-    worst_score = min(scores) if scores else 0
-    
-    # Calculate variability (standard deviation)
-    variance = sum((s - avg_score) ** 2 for s in scores) / len(scores) if scores else 0
-    std_dev = variance ** 0.5
+    # Average, best, worst and variability (standard deviation) of the raw scores
+    total = get_aggregate(ctx).total
+    avg_score = total.mean
+    best_score = total.max_score
+    worst_score = total.min_score
+    std_dev = total.std_dev
     
     # Calculate prediction metrics
     best_case = min(100, avg_score + (best_score - avg_score) * 0.5)
@@ -261,9 +366,10 @@ def get_prediction_analysis(email: str) -> Dict[str, Any]:
         "variability": round(std_dev, 1)
     }
 
-def calculate_completion_percentages(email: str) -> dict:
+def calculate_completion_percentages(email: str, ctx: Optional[UserDataContext] = None) -> dict:
     """Calculate the achieved, lost, and remaining percentage breakdown"""
-    user_doc = get_user_by_email(email)
+    ctx = get_context(email, ctx)
+    user_doc = ctx.user_doc
     if not user_doc:
         return {"achieved": 0, "lost": 0, "remaining": 100}
     
@@ -271,25 +377,20 @@ def calculate_completion_percentages(email: str) -> dict:
     calculator_config = user_doc.get("calculator", {})
     years_config = calculator_config.get("years", [])
     
-    # Get all modules
-    modules = get_user_modules(email)
-    
     # Calculate total credits in degree
     total_credits = sum(year.get("credits", 0) for year in years_config if year.get("active", False))
     if total_credits == 0:
         return {"achieved": 0, "lost": 0, "remaining": 100}
     
     # Calculate credits obtained so far
-    earned_credits = sum(module.get("credits", 0) for module in modules)
+    total = get_aggregate(ctx).total
+    earned_credits = total.credits
     
     # Calculate percentage achieved (credits earned / total credits)
     achieved_percentage = (earned_credits / total_credits) * 100
     
     # Get current average score
-    average_score = 0
-    if modules:
-        total_weighted_score = sum(module.get("score", 0) * module.get("credits", 0) for module in modules)
-        average_score = total_weighted_score / earned_credits if earned_credits > 0 else 0
+    average_score = total.weighted_sum / earned_credits if earned_credits > 0 else 0
     
     # Calculate maximum possible score (100%)
     max_possible_score = 100
@@ -306,9 +407,30 @@ def calculate_completion_percentages(email: str) -> dict:
         "remaining": round(remaining_percentage, 1)
     }
 
-def calculate_target_grade_requirements(email: str) -> dict:
+def _year_requirements(threshold: float, year_data: Dict[str, dict]) -> tuple:
+    """Grade needed on the remaining credits of each unfinished year to reach the threshold"""
+    required_year_grades = {}
+    is_possible = True
+
+    for year, data in year_data.items():
+        if data["remainingCredits"] > 0:
+            # Calculate what's needed in remaining modules to achieve the target
+            current_points = data["average"] * data["earnedCredits"]
+            target_points = threshold * data["totalCredits"]
+            needed_grade = (target_points - current_points) / data["remainingCredits"]
+
+            # Check if needed grade is realistic (between 0 and 100)
+            if needed_grade > 100:
+                is_possible = False
+
+            required_year_grades[year] = max(0, min(100, round(needed_grade, 1)))
+
+    return required_year_grades, is_possible
+
+def calculate_target_grade_requirements(email: str, ctx: Optional[UserDataContext] = None) -> dict:
     """Calculate what grades are needed in remaining modules to achieve target grades"""
-    user_doc = get_user_by_email(email)
+    ctx = get_context(email, ctx)
+    user_doc = ctx.user_doc
     if not user_doc:
         return {}
     
@@ -320,22 +442,20 @@ def calculate_target_grade_requirements(email: str) -> dict:
     year_settings = {y.get("year"): y.get("weight", 0) for y in calculator_config.get("years", []) if y.get("active", False)}
     
     # Get modules
-    modules = get_user_modules(email)
+    aggregate = get_aggregate(ctx)
+    year_configs = _year_configs_by_name(calculator_config)
     
     # Get year averages and earned credits by year
     year_data = {}
     for year, weight in year_settings.items():
-        year_modules = [m for m in modules if m.get("year") == year]
-        earned_credits = sum(m.get("credits", 0) for m in year_modules)
+        year_bucket = aggregate.year_bucket(year)
+        earned_credits = year_bucket.credits
         
-        year_config = next((y for y in calculator_config.get("years", []) if y.get("year") == year), None)
+        year_config = year_configs.get(year)
         total_credits = year_config.get("credits", 0) if year_config else 0
         
-        # Calculate year average
-        year_avg = calculate_year_average(modules, year)
-        
         year_data[year] = {
-            "average": year_avg,
+            "average": year_bucket.weighted_average,
             "earnedCredits": earned_credits,
             "totalCredits": total_credits,
             "remainingCredits": total_credits - earned_credits,
@@ -351,64 +471,25 @@ def calculate_target_grade_requirements(email: str) -> dict:
     ]
     
     for target in targets:
-        # Calculate required grade for each year with remaining credits
-        required_year_grades = {}
-        is_possible = True
-        
-        for year, data in year_data.items():
-            if data["remainingCredits"] > 0:
-                # Calculate what's needed in remaining modules to achieve the target
-                current_points = data["average"] * data["earnedCredits"]
-                target_points = target["threshold"] * data["totalCredits"]
-                remaining_points = target_points - current_points
-                
-                # Calculate average needed in remaining modules
-                if data["remainingCredits"] > 0:
-                    needed_grade = remaining_points / data["remainingCredits"]
-                    
-                    # Check if needed grade is realistic (between 0 and 100)
-                    if needed_grade > 100:
-                        is_possible = False
-                    
-                    required_year_grades[year] = max(0, min(100, round(needed_grade, 1)))
-                else:
-                    required_year_grades[year] = 0
-        
-        target["yearRequirements"] = required_year_grades
-        target["isPossible"] = is_possible
+        target["yearRequirements"], target["isPossible"] = _year_requirements(target["threshold"], year_data)
     
     # Also add the user's specific target
+    user_requirements, user_possible = _year_requirements(target_grade, year_data)
     user_target = {
         "name": "My Target",
         "threshold": target_grade,
         "needed": 0,
-        "yearRequirements": {},
-        "isPossible": True
+        "yearRequirements": user_requirements,
+        "isPossible": user_possible
     }
     
-    for year, data in year_data.items():
-        if data["remainingCredits"] > 0:
-            current_points = data["average"] * data["earnedCredits"]
-            target_points = target_grade * data["totalCredits"]
-            remaining_points = target_points - current_points
-            
-            if data["remainingCredits"] > 0:
-                needed_grade = remaining_points / data["remainingCredits"]
-                
-                if needed_grade > 100:
-                    user_target["isPossible"] = False
-                
-                user_target["yearRequirements"][year] = max(0, min(100, round(needed_grade, 1)))
-            else:
-                user_target["yearRequirements"][year] = 0
-    
     # Insert user target at the beginning
     targets.insert(0, user_target)
     
     return {
         "targets": targets,
         "currentAverages": {year: data["average"] for year, data in year_data.items()},
-        "weightedAverage": calculate_overall_average(modules, year_settings),
+        "weightedAverage": aggregate.overall_average(year_settings),
         "isDegreeFinished": all(data["remainingCredits"] == 0 for data in year_data.values())
     }
 
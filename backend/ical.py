@@ -0,0 +1,214 @@
+# ical.py
+"""
+iCalendar (RFC 5545) export and import for calendar events.
+
+Export walks an event iterator and yields the calendar line by line, so no list of
+events or VEVENT blocks is built up. Recurring events are exported once with an
+RRULE (plus EXDATE and RECURRENCE-ID blocks for their exceptions).
+
+Import reads the file line by line and yields one event dict per VEVENT, in the
+shape CalendarEvent expects. The event id is derived from the UID, so
+re-importing the same file is recognised instead of duplicating events. Only the
+parts of RRULE that recurrence.py supports (DAILY/WEEKLY/MONTHLY with
+INTERVAL, BYDAY, COUNT, UNTIL) are understood. Times are taken as wall-clock
+times; TZID is not converted.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+PRODID = "-//GradeGuard//Calendar//EN"
+UID_DOMAIN = "gradeguard"
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+class ICalendarError(ValueError):
+    pass
+
+# ---- export ----
+
+def _escape(text: str) -> str:
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def _fold(line: str) -> str:
+    """Split a content line into chunks of at most 75 octets (RFC 5545 3.1)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, current, size, limit = [], "", 0, 75
+    for char in line:
+        char_size = len(char.encode("utf-8"))
+        if size + char_size > limit:
+            parts.append(current)
+            current, size, limit = "", 0, 74  # continuation lines start with a space
+        current += char
+        size += char_size
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+def _compact_date(iso_date: str) -> str:
+    return iso_date[:10].replace("-", "")
+
+def _start_end_lines(event: dict, day: str):
+    if event.get("all_day", True) or not event.get("start_time"):
+        yield f"DTSTART;VALUE=DATE:{_compact_date(day)}"
+        return
+    yield f"DTSTART:{_compact_date(day)}T{event['start_time'].replace(':', '')[:4]}00"
+    if event.get("end_time"):
+        yield f"DTEND:{_compact_date(day)}T{event['end_time'].replace(':', '')[:4]}00"
+
+def _rrule(rule: dict) -> str:
+    parts = [f"FREQ={rule['freq'].upper()}"]
+    if rule.get("interval", 1) != 1:
+        parts.append(f"INTERVAL={rule['interval']}")
+    if rule.get("by_weekday"):
+        parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in rule["by_weekday"]))
+    if rule.get("count"):
+        parts.append(f"COUNT={rule['count']}")
+    if rule.get("until"):
+        parts.append(f"UNTIL={_compact_date(rule['until'])}")
+    return "RRULE:" + ";".join(parts)
+
+def _vevent_lines(event: dict, stamp: str, day: Optional[str] = None, recurrence_id: Optional[str] = None):
+    uid = f"{event['id']}@{UID_DOMAIN}"
+    yield "BEGIN:VEVENT"
+    yield f"UID:{uid}"
+    yield f"DTSTAMP:{stamp}"
+    if recurrence_id:
+        yield f"RECURRENCE-ID;VALUE=DATE:{_compact_date(recurrence_id)}"
+    yield from _start_end_lines(event, day or event["date"])
+    yield f"SUMMARY:{_escape(event.get('title', ''))}"
+    if event.get("description"):
+        yield f"DESCRIPTION:{_escape(event['description'])}"
+    if event.get("type"):
+        yield f"CATEGORIES:{_escape(event['type'])}"
+
+    rule = event.get("recurrence") if not recurrence_id else None
+    if rule:
+        yield _rrule(rule)
+        if rule.get("exdates"):
+            yield "EXDATE;VALUE=DATE:" + ",".join(_compact_date(d) for d in rule["exdates"])
+    yield "END:VEVENT"
+
+def iter_ics_lines(events: Iterable[dict]) -> Iterator[str]:
+    """The calendar as folded CRLF-terminated lines, one event at a time"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    for line in ("BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN"):
+        yield _fold(line)
+
+    for event in events:
+        for line in _vevent_lines(event, stamp):
+            yield _fold(line)
+        # Changed occurrences of a recurring event
+        for day, changes in ((event.get("recurrence") or {}).get("overrides") or {}).items():
+            occurrence = {**event, **changes, "id": event["id"]}
+            for line in _vevent_lines(occurrence, stamp, day=changes.get("date", day), recurrence_id=day):
+                yield _fold(line)
+
+    yield _fold("END:VCALENDAR")
+
+# ---- import ----
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    pending = None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+def _unescape(text: str) -> str:
+    out, chars = [], iter(text)
+    for char in chars:
+        if char == "\\":
+            nxt = next(chars, "")
+            out.append("\n" if nxt in ("n", "N") else nxt)
+        else:
+            out.append(char)
+    return "".join(out)
+
+def _parse_datetime(value: str):
+    """("YYYY-MM-DD", "HH:MM" or None) from a DATE or DATE-TIME value"""
+    value = value.strip()
+    day = f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+    if "T" in value:
+        time = value.split("T", 1)[1]
+        return day, f"{time[0:2]}:{time[2:4]}"
+    return day, None
+
+def _parse_rrule(value: str) -> dict:
+    parts = dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+    freq = parts.get("FREQ", "").lower()
+    if freq not in ("daily", "weekly", "monthly"):
+        raise ICalendarError(f"Unsupported RRULE frequency: {parts.get('FREQ')}")
+    rule = {"freq": freq, "interval": int(parts.get("INTERVAL", 1))}
+    if parts.get("BYDAY"):
+        # Ignore ordinal prefixes such as "1MO", which only apply to monthly rules
+        rule["by_weekday"] = [WEEKDAYS.index(day[-2:]) for day in parts["BYDAY"].split(",")]
+    if parts.get("COUNT"):
+        rule["count"] = int(parts["COUNT"])
+    if parts.get("UNTIL"):
+        rule["until"] = _parse_datetime(parts["UNTIL"])[0]
+    return rule
+
+def event_id_for_uid(uid: str) -> str:
+    """Stable event id for an iCalendar UID (our own exports map back to the original id)"""
+    if uid.endswith(f"@{UID_DOMAIN}"):
+        return uid[:-len(UID_DOMAIN) - 1]
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, uid))
+
+def iter_ics_events(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    Yield one dict per VEVENT: CalendarEvent fields plus "recurrence_id" for a changed
+    occurrence of a recurring event, or "error" when the VEVENT can't be imported.
+    """
+    event = None
+    for line in _unfold(lines):
+        if line == "BEGIN:VEVENT":
+            event = {"all_day": True}
+            continue
+        if event is None:
+            continue
+        if line == "END:VEVENT":
+            if "error" not in event and not event.get("date"):
+                event["error"] = "VEVENT without DTSTART"
+            yield event
+            event = None
+            continue
+
+        name, _, value = line.partition(":")
+        name, *params = name.split(";")
+        try:
+            if name == "UID":
+                event["id"] = event_id_for_uid(value)
+            elif name == "SUMMARY":
+                event["title"] = _unescape(value)
+            elif name == "DESCRIPTION":
+                event["description"] = _unescape(value)
+            elif name == "CATEGORIES":
+                event["type"] = _unescape(value).split(",")[0].lower() or "general"
+            elif name == "DTSTART":
+                event["date"], start_time = _parse_datetime(value)
+                if start_time and "VALUE=DATE" not in params:
+                    event["start_time"], event["all_day"] = start_time, False
+            elif name == "DTEND":
+                _, end_time = _parse_datetime(value)
+                if end_time:
+                    event["end_time"] = end_time
+            elif name == "RRULE":
+                event.setdefault("recurrence", {}).update(_parse_rrule(value))
+            elif name == "EXDATE":
+                exdates = [_parse_datetime(v)[0] for v in value.split(",")]
+                event.setdefault("recurrence", {}).setdefault("exdates", []).extend(exdates)
+            elif name == "RECURRENCE-ID":
+                event["recurrence_id"] = _parse_datetime(value)[0]
+        except (ICalendarError, ValueError, IndexError) as e:
+            event["error"] = f"{name}: {str(e)}"
+
+    if event is not None:
+        raise ICalendarError("Unterminated VEVENT")
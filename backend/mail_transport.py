@@ -0,0 +1,207 @@
+# mail_transport.py
+"""
+Pooled SMTP delivery.
+
+SMTPConnectionPool keeps up to `size` authenticated connections open so a run of
+emails pays for the TCP/TLS handshake and login once per connection instead of once
+per message. MailTransport splits queued messages into batches, sends each batch
+over a single pooled connection (batches run in parallel, one per connection),
+reconnects and retries once when a connection drops or the server answers 421 (a 5xx
+rejection is recorded as failed and the connection kept), and reports per-batch
+throughput and latency.
+
+Nothing here reads the environment, so it can be pointed at a local aiosmtpd-style
+stand-in: MailTransport(SMTPConnectionPool("localhost", 8025, use_tls=False)).
+"""
+import ssl
+import time
+import queue
+import logging
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+def _is_refusal(error: Exception) -> bool:
+    """
+    A permanent (5xx) rejection of this message or its recipient: retrying won't help,
+    but the connection itself is still usable. Anything else (421 "closing channel",
+    a dropped connection, other transient replies) means the connection can't be trusted.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return 500 <= error.smtp_code < 600
+    return False
+
+class SMTPConnectionPool:
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 size=2, timeout=30, max_idle_seconds=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self._idle = queue.LifoQueue()  # (connection, last_used)
+        self._slots = threading.BoundedSemaphore(size)
+        self._ssl_context = ssl.create_default_context() if use_tls else None
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            connection.starttls(context=self._ssl_context)
+        if self.username and self.password:
+            connection.login(self.username, self.password)
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except Exception:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def acquire(self) -> smtplib.SMTP:
+        """Take an idle connection (or open a new one); blocks while all `size` are in use."""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    connection, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - last_used <= self.max_idle_seconds:
+                    return connection
+                # Servers drop idle sessions; don't bother trying a stale one
+                self._close(connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        if broken:
+            self._close(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+        self._slots.release()
+
+    def reconnect(self, connection) -> smtplib.SMTP:
+        """Replace a broken connection without giving up its slot."""
+        self._close(connection)
+        return self._connect()
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
+class MailTransport:
+    def __init__(self, pool: SMTPConnectionPool, batch_size=50):
+        self.pool = pool
+        self.batch_size = batch_size
+
+    def send(self, from_addr, to_addr, message) -> bool:
+        return self.send_batch([(from_addr, to_addr, message)])["sent"] == 1
+
+    def send_batch(self, messages) -> dict:
+        """
+        Send [(from_addr, to_addr, message), ...]. Returns a summary with the number sent
+        and failed, which messages failed (`failed_indexes`, positions in `messages`),
+        per-batch latency and overall throughput.
+        """
+        started = time.perf_counter()
+        starts = range(0, len(messages), self.batch_size)
+        batches = [messages[i:i + self.batch_size] for i in starts]
+
+        if len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+                results = list(executor.map(self._send_on_one_connection, batches))
+        else:
+            results = [self._send_on_one_connection(batch) for batch in batches]
+
+        elapsed = time.perf_counter() - started
+        sent = sum(r["sent"] for r in results)
+        summary = {
+            "sent": sent,
+            "failed": sum(r["failed"] for r in results),
+            "failures": [f for r in results for f in r["failures"]],
+            "failed_indexes": [start + i for start, r in zip(starts, results) for i in r["failed_indexes"]],
+            "batches": [{"size": r["size"], "sent": r["sent"], "latency_ms": r["latency_ms"]} for r in results],
+            "elapsed_seconds": round(elapsed, 3),
+            "messages_per_second": round(sent / elapsed, 1) if elapsed > 0 else 0
+        }
+        if messages:
+            logging.info(
+                f"Mail batch run: {sent}/{len(messages)} sent in {len(batches)} batches, "
+                f"{summary['elapsed_seconds']}s ({summary['messages_per_second']} msg/s)"
+            )
+        return summary
+
+    def _send_on_one_connection(self, batch) -> dict:
+        started = time.perf_counter()
+        result = {"size": len(batch), "sent": 0, "failed": 0, "failures": [], "failed_indexes": []}
+
+        def fail(index, to_addr, error):
+            result["failed"] += 1
+            result["failures"].append((to_addr, error))
+            result["failed_indexes"].append(index)
+
+        try:
+            connection = self.pool.acquire()
+        except Exception as e:
+            logging.error(f"Could not open SMTP connection: {str(e)}")
+            for index, (_, to_addr, _) in enumerate(batch):
+                fail(index, to_addr, str(e))
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return result
+
+        broken = False
+        try:
+            for index, (from_addr, to_addr, message) in enumerate(batch):
+                for attempt in range(2):
+                    try:
+                        connection.sendmail(from_addr, to_addr, message.as_string())
+                        result["sent"] += 1
+                        break
+                    except OSError as e:
+                        if _is_refusal(e):
+                            fail(index, to_addr, str(e))
+                            break
+                        # 421, SMTPServerDisconnected, socket errors: discard the connection and retry once
+                        if attempt == 0:
+                            try:
+                                connection = self.pool.reconnect(connection)
+                                continue
+                            except Exception as reconnect_error:
+                                e = reconnect_error
+                        broken = True
+                        fail(index, to_addr, str(e))
+                        break
+                if broken:
+                    break
+        except Exception as e:
+            # Anything else (a message that can't be encoded, SMTPNotSupportedError, ...):
+            # fail this message and don't trust the connection's state any more
+            logging.error(f"Unexpected error sending email to {to_addr}: {str(e)}")
+            broken = True
+            fail(index, to_addr, str(e))
+        finally:
+            # The slot must always go back to the pool, or acquire() eventually blocks for good
+            self.pool.release(connection, broken=broken)
+
+        if broken:
+            # Everything after the failed message in this batch was not attempted
+            for index in range(result["sent"] + result["failed"], len(batch)):
+                fail(index, batch[index][1], "Connection lost")
+
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
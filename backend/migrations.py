@@ -0,0 +1,212 @@
+# migrations.py
+"""
+One-off data migrations and backfills.
+
+Run from the backend folder with the same environment variables as the Function App
+(e.g. the values in local.settings.json):
+
+    python migrations.py modules [--dry-run]
+    python migrations.py catalog [--dry-run]
+    python migrations.py seed-catalog [--catalog-file PATH] [--dry-run]
+    python migrations.py cohort-stats [--dry-run]
+    python migrations.py events [--dry-run]
+    python migrations.py event-directory [--dry-run]
+    python migrations.py reminder-queue [--dry-run]
+"""
+import os
+import json
+import argparse
+from database import (
+    _container, _modules_container, _uni_container, _events_container, etag_merge, event_partition,
+    EVENT_DIRECTORY_ID, event_directory_pk, _reminder_queue_container, run_bounded
+)
+from reminder_queue import reminder_bucket, read_cursor, write_cursor, queue_item
+from cohort_stats import rebuild_cohort_stats
+from university_catalog import MAJOR_DICTIONARY_ID, compact_university, major_dictionary
+
+# Output of filter/json-converter.py
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "filter", "universities.json")
+
+# Cosmos system properties that must not be copied into a new document
+SYSTEM_PROPERTIES = ("_rid", "_self", "_etag", "_attachments", "_ts")
+
+def _strip_system_properties(doc: dict) -> dict:
+    return {key: value for key, value in doc.items() if key not in SYSTEM_PROPERTIES}
+
+def migrate_modules(dry_run: bool = False) -> int:
+    """
+    Move module documents from the users container (partitioned by id) into the
+    modules container (partitioned by user_email). Safe to re-run: documents are
+    upserted into the new container before the legacy copy is deleted.
+    """
+    query = "SELECT * FROM c WHERE c.type = 'module'"
+    migrated = 0
+
+    for legacy_doc in _container.query_items(query=query, enable_cross_partition_query=True):
+        if not legacy_doc.get("user_email"):
+            print(f"Skipping module {legacy_doc.get('id')} without user_email")
+            continue
+
+        if not dry_run:
+            _modules_container.upsert_item(_strip_system_properties(legacy_doc))
+            _container.delete_item(item=legacy_doc["id"], partition_key=legacy_doc["id"])
+        migrated += 1
+
+    print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} modules")
+    return migrated
+
+def migrate_catalog(dry_run: bool = False) -> int:
+    """
+    Convert university documents that still embed a full "majors" list to the
+    normalized catalog: their major names go into the shared major dictionary
+    (written once) and the documents keep only sparse "major_counts".
+    """
+    query = "SELECT * FROM c WHERE IS_DEFINED(c.majors) AND c.id != @dictionary_id"
+    parameters = [{"name": "@dictionary_id", "value": MAJOR_DICTIONARY_ID}]
+    legacy_docs = list(_uni_container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+
+    major_names = list(dict.fromkeys(
+        major["major_name"] for doc in legacy_docs for major in doc.get("majors", [])
+    ))
+    if not dry_run:
+        major_dictionary.add_all(major_names)
+        for doc in legacy_docs:
+            etag_merge(_uni_container, doc["id"], doc["id"], compact_university)
+
+    print(f"{'Would compact' if dry_run else 'Compacted'} {len(legacy_docs)} universities "
+          f"({len(major_names)} distinct majors)")
+    return len(legacy_docs)
+
+def seed_catalog(dry_run: bool = False, path: str = CATALOG_FILE) -> int:
+    """
+    Load the catalog written by filter/json-converter.py: its majors are added to the
+    shared major dictionary and universities that don't exist yet are created. Major
+    IDs in the file are positions in the file's own list, so any "major_counts" are
+    re-keyed by major name to the dictionary's IDs. Safe to re-run: existing
+    universities (and their counters) are left alone.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    file_majors = catalog.get("majors", [])
+
+    query = "SELECT c.id FROM c WHERE c.id != @dictionary_id"
+    parameters = [{"name": "@dictionary_id", "value": MAJOR_DICTIONARY_ID}]
+    existing = {
+        doc["id"] for doc in _uni_container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True)
+    }
+    new_universities = [uni for uni in catalog.get("universities", []) if uni["id"] not in existing]
+
+    if not dry_run:
+        major_dictionary.add_all(file_majors)
+
+        def create_university(uni):
+            counts = {}
+            for file_id, count in uni.get("major_counts", {}).items():
+                major_id = str(major_dictionary.id_for(file_majors[int(file_id)], create=True))
+                counts[major_id] = counts.get(major_id, 0) + count
+            return _uni_container.create_item(body={**uni, "major_counts": counts})
+
+        for uni, _, error in run_bounded(create_university, new_universities):
+            if error:
+                print(f"Error creating university {uni['id']}: {str(error)}")
+
+    print(f"{'Would seed' if dry_run else 'Seeded'} {len(file_majors)} majors and "
+          f"{len(new_universities)} new universities ({len(existing)} already present)")
+    return len(new_universities)
+
+def migrate_events(dry_run: bool = False) -> int:
+    """
+    Move calendar events from per-event partitions (pk = "{email}:{id}") into month
+    buckets (pk = "{email}:{YYYY-MM}", or "{email}:recurring" for recurring
+    events). Safe to re-run: each event is written to its
+    bucket before the old copy is deleted, and events already bucketed are skipped.
+    """
+    query = f"SELECT * FROM c WHERE c.id != '{EVENT_DIRECTORY_ID}'"
+    migrated = 0
+
+    for event in _events_container.query_items(query=query, enable_cross_partition_query=True):
+        if not event.get("user_email") or not event.get("date"):
+            print(f"Skipping event {event.get('id')} without user_email/date")
+            continue
+
+        bucket = event_partition(event["user_email"], event)
+        if event.get("pk") == bucket:
+            continue
+
+        if not dry_run:
+            _events_container.upsert_item({**_strip_system_properties(event), "pk": bucket})
+            _events_container.delete_item(item=event["id"], partition_key=event["pk"])
+        migrated += 1
+
+    print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} events")
+    return migrated
+
+def rebuild_event_directories(dry_run: bool = False) -> int:
+    """
+    Write every user's event directory (event id -> pk) from the events themselves,
+    so update/delete never need the fallback query. Run after `events`.
+    """
+    query = f"SELECT c.id, c.pk, c.user_email FROM c WHERE c.id != '{EVENT_DIRECTORY_ID}'"
+    directories = {}
+    for event in _events_container.query_items(query=query, enable_cross_partition_query=True):
+        if event.get("user_email"):
+            directories.setdefault(event["user_email"], {})[event["id"]] = event["pk"]
+
+    if not dry_run:
+        for user_email, events in directories.items():
+            _events_container.upsert_item({
+                "id": EVENT_DIRECTORY_ID,
+                "pk": event_directory_pk(user_email),
+                "type": "event_directory",
+                "events": events
+            })
+
+    print(f"{'Would write' if dry_run else 'Wrote'} event directories for {len(directories)} users")
+    return len(directories)
+
+def backfill_reminder_queue(dry_run: bool = False) -> int:
+    """
+    Queue every unsent reminder in the hour bucket it is due in and move the queue
+    cursor back to the oldest of them, so the next dispatch run sends overdue ones.
+    Safe to re-run: queue items are upserted under the reminder id.
+    """
+    query = "SELECT * FROM c WHERE c.type = 'reminder' AND c.sent = false"
+    items = [
+        queue_item(reminder, reminder_bucket(reminder["reminder_date"]))
+        for reminder in _container.query_items(query=query, enable_cross_partition_query=True)
+        if reminder.get("reminder_date")
+    ]
+
+    if not dry_run and items:
+        results = run_bounded(_reminder_queue_container.upsert_item, items)
+        for item, _, error in results:
+            if error:
+                print(f"Error queueing reminder {item['id']}: {str(error)}")
+        write_cursor(min([item["pk"] for item in items] + [read_cursor()]))
+
+    print(f"{'Would queue' if dry_run else 'Queued'} {len(items)} unsent reminders")
+    return len(items)
+
+COMMANDS = {
+    "modules": migrate_modules,
+    "catalog": migrate_catalog,
+    "seed-catalog": seed_catalog,
+    "cohort-stats": rebuild_cohort_stats,
+    "events": migrate_events,
+    "event-directory": rebuild_event_directories,
+    "reminder-queue": backfill_reminder_queue,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="GradeHome data migrations")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--catalog-file", default=CATALOG_FILE, help="universities.json to load (seed-catalog)")
+    args = parser.parse_args()
+    if args.command == "seed-catalog":
+        seed_catalog(dry_run=args.dry_run, path=args.catalog_file)
+    else:
+        COMMANDS[args.command](dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
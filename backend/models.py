@@ -46,6 +46,24 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: constr(min_length=8, max_length=20)
 
+class Recurrence(BaseModel):
+    """RRULE-style repeat rule; the event's own date is the first occurrence"""
+    freq: str  # "daily", "weekly" or "monthly"
+    interval: conint(ge=1) = 1
+    by_weekday: Optional[List[conint(ge=0, le=6)]] = None  # weekly only; 0 = Monday
+    count: Optional[conint(ge=1)] = None  # Total occurrences, including skipped ones
+    until: Optional[str] = None  # ISO date of the last possible occurrence
+    exdates: List[str] = []  # ISO dates of cancelled occurrences
+    overrides: Dict[str, dict] = {}  # ISO date -> fields that differ on that day
+
+    @field_validator("freq")
+    @classmethod
+    def validate_freq(cls, value):
+        allowed = ["daily", "weekly", "monthly"]
+        if value not in allowed:
+            raise ValueError("freq must be one of: " + ", ".join(allowed))
+        return value
+
 class CalendarEvent(BaseModel):
     id: Optional[str] = None
     user_email: str
@@ -58,6 +76,7 @@ class CalendarEvent(BaseModel):
     type: str = "general"  # e.g., "assignment", "exam", "study"
     color: Optional[str] = None  # Color code for the event
     completed: bool = False
+    recurrence: Optional[Recurrence] = None
 
 class UserProfileUpdate(BaseModel):
     firstName: Optional[str] = None
@@ -1,8 +1,10 @@
 import json
 import azure.functions as func
 from database import get_user_by_email, _container, get_university_doc, get_user_modules
+from database import list_user_modules, get_module_doc, create_module_doc, replace_module_doc, delete_module_doc
 from user_routes import verify_session
 from models import Module, Assessment, Examination
+from module_templates import module_templates
 import uuid
 from datetime import datetime
 from database import increment_university_and_major_counter, get_modules_with_stats
@@ -19,29 +21,13 @@ def get_all_modules(req: func.HttpRequest) -> func.HttpResponse:
         semester = req.params.get('semester')
         status = req.params.get('status')
 
-        # Start with base query
-        query = "SELECT * FROM c WHERE c.type = 'module' AND c.user_email = @email"
-        parameters = [{"name": "@email", "value": identity}]
-
-        # Add filters if provided
-        if year:
-            query += " AND c.year = @year"
-            parameters.append({"name": "@year", "value": year})
-        
-        if semester:
-            query += " AND c.semester = @semester"
-            parameters.append({"name": "@semester", "value": int(semester)})
-        
-        if status:
-            query += " AND c.status = @status"
-            parameters.append({"name": "@status", "value": status})
-
-        # Execute query
-        modules = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
+        # Single-partition query on the user's modules
+        modules = list_user_modules(
+            identity,
+            year=year,
+            semester=int(semester) if semester else None,
+            status=status
+        )
 
         return func.HttpResponse(json.dumps(modules), status_code=200)
     except Exception as e:
@@ -58,23 +44,13 @@ def get_module(req: func.HttpRequest) -> func.HttpResponse:
         return func.HttpResponse(json.dumps({"error": "Module ID is required"}), status_code=400)
 
     try:
-        # Query specifically with partition key and user check
-        query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @email AND c.type = 'module'"
-        parameters = [
-            {"name": "@id", "value": module_id},
-            {"name": "@email", "value": identity}
-        ]
-
-        modules = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-
-        if not modules:
+        # Point read within the user's partition
+        module = get_module_doc(identity, module_id)
+
+        if not module:
             return func.HttpResponse(json.dumps({"error": "Module not found or access denied"}), status_code=404)
 
-        return func.HttpResponse(json.dumps(modules[0]), status_code=200)
+        return func.HttpResponse(json.dumps(module), status_code=200)
     except Exception as e:
         return func.HttpResponse(json.dumps({"error": str(e)}), status_code=500)
 
@@ -142,7 +118,7 @@ def create_module(req: func.HttpRequest) -> func.HttpResponse:
             module.score = round(total_weighted_score / total_weight, 1)
 
         # Create module in database
-        result = _container.create_item(body=module.dict(exclude_none=True))
+        result = create_module_doc(module.dict(exclude_none=True))
 
         # If university and degree are specified, increment the university counter
         if module.university and module.degree:
@@ -172,23 +148,14 @@ def update_module(req: func.HttpRequest) -> func.HttpResponse:
     try:
         module_data = req.get_json()
 
-        # Verify ownership
-        query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @email AND c.type = 'module'"
-        parameters = [
-            {"name": "@id", "value": module_id},
-            {"name": "@email", "value": identity}
-        ]
+        # Verify ownership (point read in the user's partition)
+        existing_module = get_module_doc(identity, module_id)
 
-        existing_modules = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-
-        if not existing_modules:
+        if not existing_module:
             return func.HttpResponse(json.dumps({"error": "Module not found or access denied"}), status_code=404)
 
-        existing_module = existing_modules[0]
+        # Stored version, for the cohort statistics delta (existing_module is edited in place below)
+        previous_module = dict(existing_module)
         
         # Update timestamp
         module_data["updated_at"] = datetime.utcnow().isoformat()
@@ -228,7 +195,7 @@ def update_module(req: func.HttpRequest) -> func.HttpResponse:
             existing_module["score"] = round(total_weighted_score / total_weight, 1)
 
         # Update in database
-        result = _container.replace_item(item=module_id, body=existing_module)
+        result = replace_module_doc(existing_module, previous=previous_module)
         
         # Add activity for module update
         module_obj = Module(**existing_module)
@@ -250,29 +217,17 @@ def delete_module(req: func.HttpRequest) -> func.HttpResponse:
 
     try:
         # Verify ownership and get module details before deletion
-        query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @email AND c.type = 'module'"
-        parameters = [
-            {"name": "@id", "value": module_id},
-            {"name": "@email", "value": identity}
-        ]
-
-        existing_modules = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-
-        if not existing_modules:
+        module_to_delete = get_module_doc(identity, module_id)
+
+        if not module_to_delete:
             return func.HttpResponse(json.dumps({"error": "Module not found or access denied"}), status_code=404)
         
-        module_to_delete = existing_modules[0]
-        
         # Add activity for module deletion
         module_obj = Module(**module_to_delete)
         add_module_activity(identity, module_obj, "Module Deleted")
 
         # Delete from database
-        _container.delete_item(item=module_id, partition_key=module_id)
+        delete_module_doc(identity, module_id, previous=module_to_delete)
         
         return func.HttpResponse(json.dumps({"message": "Module deleted successfully"}), status_code=200)
     except Exception as e:
@@ -324,14 +279,7 @@ def get_modules_by_year_semester(req: func.HttpRequest) -> func.HttpResponse:
 
     try:
         # Get all modules for the user
-        query = "SELECT * FROM c WHERE c.type = 'module' AND c.user_email = @email"
-        parameters = [{"name": "@email", "value": identity}]
-
-        modules = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
+        modules = get_user_modules(identity)
 
         # Organize modules by year and semester
         organized = {}
@@ -367,38 +315,8 @@ def get_module_suggestions(req: func.HttpRequest) -> func.HttpResponse:
         university = user_doc.get("university", "")
         degree = user_doc.get("degree", "")
         
-        # For now, return empty suggestions
-        # In a real implementation, this would query a course catalog or template modules
-        suggestions = []
-        
-        # Example: Add some default modules based on degree
-        if degree == "COMPUTER SCIENCE":
-            suggestions = [
-                {
-                    "name": "Programming I",
-                    "code": "COMP1001",
-                    "credits": 15,
-                    "description": "Introduction to programming concepts and practices",
-                    "year": "Year 1",
-                    "semester": 1
-                },
-                {
-                    "name": "Computer Systems",
-                    "code": "COMP1002", 
-                    "credits": 15,
-                    "description": "Introduction to computer architecture and systems",
-                    "year": "Year 1",
-                    "semester": 1
-                },
-                {
-                    "name": "Data Structures and Algorithms",
-                    "code": "COMP1003",
-                    "credits": 15,
-                    "description": "Study of fundamental data structures and algorithms",
-                    "year": "Year 1",
-                    "semester": 2
-                }
-            ]
+        # Degree-level suggestions from the template catalog
+        suggestions = module_templates.suggestions(degree)
         
         return func.HttpResponse(json.dumps(suggestions), status_code=200)
     except Exception as e:
@@ -0,0 +1,78 @@
+# module_templates.py
+"""
+Module template catalog.
+
+Template modules (used to pre-fill a student's years) and degree-level module
+suggestions live in catalog/module_templates.json rather than in route code. The file
+is read once per process, on first use, into indexes keyed by
+(university, degree, year, semester) and by degree; reload() picks up an edited
+file without restarting.
+
+The returned lists are shared by every caller, so treat them as read-only.
+"""
+import os
+import json
+import threading
+from typing import Dict, List, Optional
+
+MODULE_TEMPLATES_PATH = os.environ.get(
+    "MODULE_TEMPLATES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog", "module_templates.json")
+)
+
+class ModuleTemplateCatalog:
+    def __init__(self, path: str = MODULE_TEMPLATES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._by_program: Dict[tuple, Dict[str, Dict[int, List[dict]]]] = {}  # (university, degree) -> year -> semester -> modules
+        self._by_term: Dict[tuple, List[dict]] = {}  # (university, degree, year, semester) -> modules
+        self._suggestions: Dict[str, List[dict]] = {}  # degree -> modules
+
+    def reload(self):
+        """Re-read the data file and swap in fresh indexes"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        by_program = {}
+        by_term = {}
+        for program in data.get("templates", []):
+            organized = by_program.setdefault((program["university"], program["degree"]), {})
+            for module in program.get("modules", []):
+                year, semester = module.get("year"), module.get("semester")
+                organized.setdefault(year, {}).setdefault(semester, []).append(module)
+                by_term.setdefault((program["university"], program["degree"], year, semester), []).append(module)
+
+        suggestions = {}
+        for entry in data.get("suggestions", []):
+            suggestions.setdefault(entry["degree"], []).extend(entry.get("modules", []))
+
+        with self._lock:
+            self._by_program, self._by_term, self._suggestions = by_program, by_term, suggestions
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def organized(self, university: str, degree: str) -> Dict[str, Dict[int, List[dict]]]:
+        """All templates for a program grouped as {year: {semester: [modules]}}"""
+        self._ensure_loaded()
+        return self._by_program.get((university, degree), {})
+
+    def modules_for(self, university: str, degree: str, year: str, semester: Optional[int] = None) -> List[dict]:
+        """Templates for one year, optionally narrowed to a semester"""
+        self._ensure_loaded()
+        if semester is not None:
+            return self._by_term.get((university, degree, year, semester), [])
+        return [
+            module
+            for modules in self.organized(university, degree).get(year, {}).values()
+            for module in modules
+        ]
+
+    def suggestions(self, degree: str) -> List[dict]:
+        self._ensure_loaded()
+        return self._suggestions.get(degree, [])
+
+module_templates = ModuleTemplateCatalog()
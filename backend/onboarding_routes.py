@@ -3,7 +3,7 @@ import azure.functions as func
 import json
 from datetime import datetime
 from user_routes import verify_session
-from database import get_user_by_email, _container
+from database import get_user_by_email, _container, count_user_modules
 
 def get_onboarding_status(req: func.HttpRequest) -> func.HttpResponse:
     """Check if user has completed the onboarding questionnaire"""
@@ -23,9 +23,7 @@ def get_onboarding_status(req: func.HttpRequest) -> func.HttpResponse:
         has_calculator_config = "calculator" in user_doc and len(user_doc.get("calculator", {})) > 0
         
         # Check if has any modules
-        query = f"SELECT COUNT(1) as count FROM c WHERE c.type = 'module' AND c.user_email = '{identity}'"
-        results = list(_container.query_items(query=query, enable_cross_partition_query=True))
-        has_modules = results[0]['count'] > 0 if results else False
+        has_modules = count_user_modules(identity) > 0
 
         # Determine actual completion status - a user might have skipped the formal onboarding
         # but already set up their account
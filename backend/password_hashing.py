@@ -0,0 +1,131 @@
+# password_hashing.py
+"""
+Password hashing service.
+
+bcrypt is deliberately slow, and running it on the Functions worker thread lets a
+burst of logins starve every other request on the host. Hashes and verifications run
+in a small process pool instead (PASSWORD_HASH_WORKERS processes, 0 = run inline),
+and at most PASSWORD_HASH_MAX_PENDING calls may be queued for it; further callers
+wait for a slot.
+
+New hashes use BCRYPT_ROUNDS. verify_and_update() reports when a stored hash was
+made with a different cost, so login can transparently re-hash the password after
+the setting changes. Per-operation timings are available from
+get_password_hash_stats().
+"""
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from passlib.hash import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(2, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32))
+
+_hasher = bcrypt.using(rounds=BCRYPT_ROUNDS)
+
+# ---- run in the worker processes ----
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.verify(password, hashed)
+
+# ---- pool ----
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the host process is multi-threaded
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+_stats = {
+    "hash": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "verify": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "rehash": 0,
+    "inline_fallbacks": 0
+}
+_stats_lock = threading.Lock()
+
+def _record(operation: str, elapsed_ms: float):
+    with _stats_lock:
+        entry = _stats[operation]
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+def get_password_hash_stats() -> dict:
+    """Count, average and max latency (queueing included) of hashes and verifications"""
+    with _stats_lock:
+        stats = {"rounds": BCRYPT_ROUNDS, "workers": PASSWORD_HASH_WORKERS,
+                 "rehash": _stats["rehash"], "inline_fallbacks": _stats["inline_fallbacks"]}
+        for operation in ("hash", "verify"):
+            entry = _stats[operation]
+            stats[operation] = {
+                "count": entry["count"],
+                "avg_ms": round(entry["total_ms"] / entry["count"], 1) if entry["count"] else 0,
+                "max_ms": round(entry["max_ms"], 1)
+            }
+        return stats
+
+def _run(operation: str, fn, *args):
+    started = time.perf_counter()
+    with _pending:
+        pool = _get_pool()
+        try:
+            result = pool.submit(fn, *args).result() if pool else fn(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            logging.error("Password hashing pool broke; running inline")
+            _reset_pool()
+            with _stats_lock:
+                _stats["inline_fallbacks"] += 1
+            result = fn(*args)
+    _record(operation, (time.perf_counter() - started) * 1000)
+    return result
+
+# ---- public API ----
+
+def hash_password(password: str) -> str:
+    return _run("hash", _hash, password, BCRYPT_ROUNDS)
+
+def verify_password(password: str, hashed: str) -> bool:
+    return _run("verify", _verify, password, hashed)
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the hash was made with a cost other than BCRYPT_ROUNDS"""
+    return _hasher.needs_update(hashed)
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(password matches, new hash to store or None if the stored one is current)"""
+    if not verify_password(password, hashed):
+        return False, None
+    if not needs_rehash(hashed):
+        return True, None
+    with _stats_lock:
+        _stats["rehash"] += 1
+    return True, hash_password(password)
@@ -1,7 +1,7 @@
 # password_reset_routes.py
 import azure.functions as func
 import json
-from passlib.hash import bcrypt
+from password_hashing import hash_password
 from database import get_user_by_email, _container
 from email_service import send_password_reset_email, verify_reset_token, invalidate_reset_token
 
@@ -73,7 +73,7 @@ def reset_password(req: func.HttpRequest) -> func.HttpResponse:
             )
         
         # Update password
-        user_doc["password"] = bcrypt.hash(new_password)
+        user_doc["password"] = hash_password(new_password)
         _container.upsert_item(user_doc)
         
         # Invalidate token
@@ -0,0 +1,126 @@
+# popularity_counters.py
+"""
+Buffered university/major popularity counters.
+
+Registrations and module creations used to re-read and upsert the whole university
+document for every +1, and concurrent writers overwrote each
+other's increments. Increments are now added to an in-process buffer and written as
+deltas: one ETag-guarded merge per university per flush, so counts stay exact under
+concurrency and a burst of N signups costs one write instead of N.
+
+increment_university_and_major_counter() (database.py) flushes before the invocation
+returns, because the Functions host can recycle an idle instance without running
+exit handlers. Increments from concurrent requests on one instance are still merged
+into a single write per university: a flush takes everything buffered so far.
+
+Deltas whose write fails go back into the buffer and are retried
+UNIVERSITY_COUNTER_FLUSH_SECONDS later (or by the next flush). Those retried deltas
+are the only loss window: if the instance is recycled before a retry succeeds, they
+are dropped. The atexit flush is a best effort on top of that. The buffer is also
+flushed as soon as UNIVERSITY_COUNTER_MAX_PENDING increments are waiting.
+"""
+import os
+import time
+import atexit
+import threading
+from typing import Dict, Tuple
+from database import _uni_container, etag_merge
+from university_catalog import add_major_counts
+
+UNIVERSITY_COUNTER_FLUSH_SECONDS = float(os.environ.get("UNIVERSITY_COUNTER_FLUSH_SECONDS", 5))
+UNIVERSITY_COUNTER_MAX_PENDING = int(os.environ.get("UNIVERSITY_COUNTER_MAX_PENDING", 100))
+UNIVERSITY_DOC_ID_TTL_SECONDS = float(os.environ.get("UNIVERSITY_DOC_ID_TTL_SECONDS", 600))
+
+class PopularityCounters:
+    def __init__(self, flush_seconds: float = UNIVERSITY_COUNTER_FLUSH_SECONDS,
+                 max_pending: int = UNIVERSITY_COUNTER_MAX_PENDING):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}  # university -> {"count": n, "majors": {lower: [name, n]}}
+        self._pending_total = 0
+        self._timer = None
+        self._doc_ids: Dict[str, Tuple[str, float]] = {}  # university name -> (document id, looked up at)
+
+    def _add(self, university: str, count: int, majors: dict):
+        entry = self._pending.setdefault(university, {"count": 0, "majors": {}})
+        entry["count"] += count
+        for key, (major_name, major_count) in majors.items():
+            entry["majors"].setdefault(key, [major_name, 0])[1] += major_count
+        self._pending_total += count
+
+    def _schedule_flush(self):
+        # Caller holds self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def increment(self, university: str, major: str):
+        with self._lock:
+            self._add(university, 1, {major.lower(): (major, 1)})
+            flush_now = self._pending_total >= self.max_pending
+            if not flush_now:
+                self._schedule_flush()
+        if flush_now:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending_total
+
+    def _document_id(self, university: str) -> str:
+        """Existing documents may not use the name as id, so look it up by name (cached for a while)"""
+        cached = self._doc_ids.get(university)
+        if cached and time.monotonic() - cached[1] < UNIVERSITY_DOC_ID_TTL_SECONDS:
+            return cached[0]
+        ids = list(_uni_container.query_items(
+            query="SELECT VALUE c.id FROM c WHERE c.name = @name",
+            parameters=[{"name": "@name", "value": university}],
+            enable_cross_partition_query=True
+        ))
+        doc_id = ids[0] if ids else university
+        self._doc_ids[university] = (doc_id, time.monotonic())
+        return doc_id
+
+    def _write(self, university: str, delta: dict) -> dict:
+        def apply_delta(doc):
+            doc["counter"] = doc.get("counter", 0) + delta["count"]
+            add_major_counts(doc, {major_name: count for major_name, count in delta["majors"].values()})
+
+        doc_id = self._document_id(university)
+        return etag_merge(
+            _uni_container,
+            doc_id,
+            doc_id,
+            apply_delta,
+            new_doc=lambda: {"id": university, "name": university, "counter": 0, "major_counts": {}}
+        )
+
+    def flush(self) -> int:
+        """Write all buffered deltas; returns the number of universities updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._pending_total = self._pending, {}, 0
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            from university_search import university_index
+            written = 0
+            for university, delta in batch.items():
+                try:
+                    doc = self._write(university, delta)
+                    university_index.record(doc)
+                    written += 1
+                except Exception as e:
+                    print(f"Error updating university counter for {university}: {str(e)}")
+                    # Keep the delta so the next flush retries it
+                    with self._lock:
+                        self._add(university, delta["count"], delta["majors"])
+                        self._schedule_flush()
+            return written
+
+popularity_counters = PopularityCounters()
+atexit.register(popularity_counters.flush)
@@ -0,0 +1,105 @@
+# recurrence.py
+"""
+Lazy expansion of recurring calendar events.
+
+A recurring event is stored once (the "master", with a `recurrence` rule, see
+models.Recurrence) and expanded only over the window a calendar view asks for.
+Occurrences are generated one at a time, so a weekly lecture with no end date costs
+the same as a single event until somebody looks at a week that contains it.
+
+Occurrence ids are "<master id>::<YYYY-MM-DD>", which is what update/delete use to
+change (override) or cancel (exdate) a single occurrence.
+"""
+from datetime import date, timedelta
+from typing import Iterator, Optional, Tuple
+
+OCCURRENCE_SEPARATOR = "::"
+
+def occurrence_id(master_id: str, day: date) -> str:
+    return f"{master_id}{OCCURRENCE_SEPARATOR}{day.isoformat()}"
+
+def split_occurrence_id(event_id: str) -> Tuple[str, Optional[str]]:
+    """("master id", "YYYY-MM-DD") for an occurrence id, (event_id, None) otherwise"""
+    if OCCURRENCE_SEPARATOR in event_id:
+        master_id, day = event_id.rsplit(OCCURRENCE_SEPARATOR, 1)
+        return master_id, day
+    return event_id, None
+
+def _add_months(day: date, months: int) -> Optional[date]:
+    """Same day-of-month `months` later, or None when that month is too short (RFC 5545)"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    try:
+        return day.replace(year=year, month=month)
+    except ValueError:
+        return None
+
+def occurrence_dates(start: date, rule: dict, window_start: Optional[date] = None) -> Iterator[date]:
+    """
+    Dates of every occurrence in order, starting at `start`. Without a count, periods
+    that end before window_start are skipped arithmetically rather than generated.
+    """
+    freq = rule["freq"]
+    interval = rule.get("interval") or 1
+    count = rule.get("count")
+    until = date.fromisoformat(rule["until"][:10]) if rule.get("until") else None
+
+    period = 0
+    if window_start and count is None and window_start > start:
+        if freq == "daily":
+            period = (window_start - start).days // interval
+        elif freq == "weekly":
+            period = max((window_start - start).days // (7 * interval) - 1, 0)
+        elif freq == "monthly":
+            months = (window_start.year - start.year) * 12 + window_start.month - start.month
+            period = max(months // interval - 1, 0)
+
+    week_start = start - timedelta(days=start.weekday())
+    weekdays = sorted(set(rule.get("by_weekday") or [start.weekday()]))
+    generated = 0
+
+    while True:
+        if freq == "daily":
+            candidates = [start + timedelta(days=period * interval)]
+        elif freq == "weekly":
+            first_day = week_start + timedelta(weeks=period * interval)
+            candidates = [first_day + timedelta(days=weekday) for weekday in weekdays]
+        elif freq == "monthly":
+            candidates = [_add_months(start, period * interval)]
+        else:
+            raise ValueError(f"Unsupported recurrence frequency: {freq}")
+
+        for day in candidates:
+            if day is None or day < start:
+                continue
+            if until and day > until:
+                return
+            yield day
+            generated += 1
+            if count is not None and generated >= count:
+                return
+        period += 1
+
+def expand_event(master: dict, window_start: str, window_end: str) -> Iterator[dict]:
+    """Occurrences of a recurring event whose date lies in [window_start, window_end]"""
+    rule = master["recurrence"]
+    start_day = date.fromisoformat(master["date"][:10])
+    time_suffix = master["date"][10:]  # Keep any "T09:00:00" part of the master's date
+    first_day = date.fromisoformat(window_start[:10])
+    exdates = set(rule.get("exdates") or [])
+    overrides = rule.get("overrides") or {}
+
+    for day in occurrence_dates(start_day, rule, window_start=first_day):
+        occurrence_date = day.isoformat() + time_suffix
+        if occurrence_date > window_end:
+            return
+        if occurrence_date < window_start or day.isoformat() in exdates:
+            continue
+
+        occurrence = {key: value for key, value in master.items() if key != "recurrence" and not key.startswith("_")}
+        occurrence["date"] = occurrence_date
+        occurrence.update(overrides.get(day.isoformat(), {}))
+        occurrence["id"] = occurrence_id(master["id"], day)
+        occurrence["recurring_event_id"] = master["id"]
+        occurrence["occurrence_date"] = day.isoformat()
+        yield occurrence
@@ -0,0 +1,135 @@
+# reminder_dispatcher.py
+"""
+Sends due reminders for both the HTTP process_reminders endpoint and the timer trigger.
+
+One run: read the due items from the reminder queue (only the hour buckets since
+the last run, see reminder_queue.py), claim them with a lease so overlapping runs
+don't send the same reminder twice, prefetch every recipient's user document in a
+single pass, render the emails with render_many() and send them with send_emails()
+in batches of REMINDER_DISPATCH_BATCH_SIZE (the mail transport spreads each batch
+over its pooled SMTP connections). Delivered items are then deleted from the queue
+and their reminders marked as sent; failed ones are released for the next run.
+Batches not started before REMINDER_DISPATCH_TIME_BUDGET_SECONDS runs out are left
+queued for the next run, so a big backlog can't overrun the timer interval.
+"""
+import os
+import time
+import logging
+from datetime import datetime
+from typing import List
+from database import _container, get_users_by_email, run_bounded
+from reminder_queue import read_cursor_state, find_due_items, claim_items, complete_items, release_items, new_worker_id
+from email_service import send_emails, reminder_values
+from email_templates import render_many
+
+REMINDER_DISPATCH_CONCURRENCY = int(os.environ.get("REMINDER_DISPATCH_CONCURRENCY", 8))
+REMINDER_DISPATCH_BATCH_SIZE = int(os.environ.get("REMINDER_DISPATCH_BATCH_SIZE", 100))
+REMINDER_DISPATCH_TIME_BUDGET_SECONDS = float(os.environ.get("REMINDER_DISPATCH_TIME_BUDGET_SECONDS", 240))
+
+def mark_reminders_sent(reminders: list, sent_at: str) -> int:
+    """Flag delivered reminders as sent on the user-facing documents; returns how many writes succeeded"""
+    def mark_sent(reminder):
+        return _container.patch_item(
+            item=reminder["reminder_id"],
+            partition_key=reminder["reminder_id"],
+            patch_operations=[
+                {"op": "set", "path": "/sent", "value": True},
+                {"op": "set", "path": "/sent_at", "value": sent_at}
+            ]
+        )
+
+    results = run_bounded(mark_sent, reminders, REMINDER_DISPATCH_CONCURRENCY)
+    for reminder, _, error in results:
+        if error:
+            logging.error(f"Error marking reminder {reminder.get('reminder_id')} as sent: {str(error)}")
+    return sum(1 for _, _, error in results if not error)
+
+def _send_batches(reminders: list, batch_size: int) -> List[list]:
+    """
+    Split reminders into send batches holding at most one message per recipient, so a
+    failure (which the transport reports by address) maps back to a single reminder.
+    """
+    rounds = []
+    seen = {}
+    for reminder in reminders:
+        occurrence = seen.get(reminder.get("user_email"), 0)
+        seen[reminder.get("user_email")] = occurrence + 1
+        if occurrence == len(rounds):
+            rounds.append([])
+        rounds[occurrence].append(reminder)
+    return [batch[i:i + batch_size] for batch in rounds for i in range(0, len(batch), batch_size)]
+
+def send_reminder_batch(reminders: list, users: dict) -> tuple:
+    """Render and send one batch; returns (delivered, failed) reminders"""
+    sendable = [r for r in reminders if users.get(r.get("user_email"))]
+    failed = [r for r in reminders if not users.get(r.get("user_email"))]
+    if not sendable:
+        return [], failed
+
+    rendered = render_many("reminder", [
+        reminder_values(users[r["user_email"]], r.get("event_title"), r.get("event_date"), r.get("event_time"))
+        for r in sendable
+    ])
+    try:
+        summary = send_emails([
+            (r["user_email"], subject, html_content, text_content)
+            for r, (subject, html_content, text_content) in zip(sendable, rendered)
+        ])
+    except Exception as e:
+        logging.error(f"Error sending {len(sendable)} reminder emails: {str(e)}")
+        return [], failed + sendable
+
+    failed_addresses = {to_addr for to_addr, _ in summary["failures"]}
+    # A failure the transport couldn't attribute to an address (e.g. no SMTP credentials) fails them all
+    unattributed = summary["failed"] > len(summary["failures"])
+    delivered = []
+    for reminder in sendable:
+        if unattributed or reminder["user_email"] in failed_addresses:
+            failed.append(reminder)
+        else:
+            delivered.append(reminder)
+    return delivered, failed
+
+def dispatch_due_reminders(now: datetime = None, concurrency: int = None, time_budget_seconds: float = None) -> dict:
+    """Send every due reminder (within the time budget) and return a summary of the run"""
+    started = time.monotonic()
+    concurrency = concurrency or REMINDER_DISPATCH_CONCURRENCY
+    time_budget_seconds = time_budget_seconds or REMINDER_DISPATCH_TIME_BUDGET_SECONDS
+    deadline = started + time_budget_seconds
+
+    now = now or datetime.utcnow()
+    now_iso = now.isoformat()
+    # Only send what this run manages to claim; overlapping runs skip each other's items
+    first_bucket, cursor_etag = read_cursor_state(now)
+    reminders, held = claim_items(find_due_items(now, first_bucket), new_worker_id(), now, concurrency=concurrency)
+    users = get_users_by_email([r.get("user_email") for r in reminders])
+
+    delivered = []
+    failed = []
+    deferred = []
+    for batch in _send_batches(reminders, REMINDER_DISPATCH_BATCH_SIZE):
+        # Leave batches that can't start within the budget for the next run
+        if time.monotonic() > deadline:
+            deferred.extend(batch)
+            continue
+        batch_delivered, batch_failed = send_reminder_batch(batch, users)
+        delivered.extend(batch_delivered)
+        failed.extend(batch_failed)
+
+    # Delivered items leave the queue; the rest are released (into the current hour) for the next run
+    dequeued = complete_items(delivered, concurrency)
+    release_items(failed + deferred, held, now, concurrency, cursor_etag=cursor_etag)
+    marked = mark_reminders_sent(delivered, now_iso)
+
+    summary = {
+        "due": len(reminders),
+        "held_elsewhere": len(held),
+        "sent": len(delivered),
+        "marked": marked,
+        "dequeued": dequeued,
+        "failed": len(failed),
+        "deferred": len(deferred),
+        "elapsed_seconds": round(time.monotonic() - started, 2)
+    }
+    logging.info(f"Reminder dispatch: {summary}")
+    return summary
@@ -0,0 +1,274 @@
+# reminder_queue.py
+"""
+Time-bucketed queue of pending reminders.
+
+Every reminder that hasn't been sent has one queue item in the reminder queue
+container, partitioned by the UTC hour it is due in (pk = "YYYY-MM-DDTHH"):
+
+    {"id": "<reminder id>", "pk": "2025-03-01T09", "reminder_id", "user_email",
+     "event_title", "event_date", "event_time", "reminder_date"}
+
+A cursor document (pk "cursor") records the oldest hour that may still hold items,
+so a dispatch run reads the hours from the cursor up to now with one
+single-partition query each (one cross-partition range query if it has fallen more
+than REMINDER_QUEUE_MAX_BUCKETS_PER_QUERY hours behind) instead of scanning every
+reminder. Delivered items are deleted from the queue; items that could not be
+delivered are carried into the current hour so the cursor can move past old hours.
+The cursor always stays CURSOR_SAFETY_BUCKETS hours behind the current one, so an
+item queued into an hour just as it ends is still read by the next run, and it is
+advanced with an ETag-conditional write: if another run moved it in the meantime,
+this run can only move it back (to the older of the two), never past the other
+run's items.
+
+Before sending, a dispatch run claims each item with an ETag-conditional write of
+`claimed_by`/`claimed_until`. Only the run whose write succeeds sends the email, so
+overlapping timer runs and calls to the HTTP endpoint don't send duplicates, and
+several workers can drain the queue in parallel. Completing, releasing and moving an
+item are conditional on the claimed ETag too. A claim that is never completed (the
+worker crashed) expires after REMINDER_CLAIM_LEASE_SECONDS and the item is sent by a
+later run.
+
+The reminder documents in the users container stay the user-facing record (with
+their `sent` flag); the queue only holds what is still to be sent.
+"""
+import os
+import uuid
+import socket
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError, CosmosResourceNotFoundError
+from database import _reminder_queue_container, run_bounded, etag_merge
+
+REMINDER_QUEUE_MAX_BUCKETS_PER_QUERY = int(os.environ.get("REMINDER_QUEUE_MAX_BUCKETS_PER_QUERY", 24))
+REMINDER_QUEUE_LOOKBACK_HOURS = int(os.environ.get("REMINDER_QUEUE_LOOKBACK_HOURS", 24))
+REMINDER_CLAIM_LEASE_SECONDS = int(os.environ.get("REMINDER_CLAIM_LEASE_SECONDS", 300))
+
+CURSOR_ID = "dispatch_cursor"
+CURSOR_PK = "cursor"
+CURSOR_SAFETY_BUCKETS = 1
+BUCKET_FORMAT = "%Y-%m-%dT%H"
+QUEUE_FIELDS = ("user_email", "event_title", "event_date", "event_time", "reminder_date")
+CLAIM_FIELDS = ("claimed_by", "claimed_until")
+
+def reminder_bucket(reminder_date: str) -> str:
+    """Hour bucket ("YYYY-MM-DDTHH") for an ISO date or date-time"""
+    if len(reminder_date) >= 13 and reminder_date[10] == "T":
+        return reminder_date[:13]
+    return f"{reminder_date[:10]}T00"
+
+def _bucket_of(moment: datetime) -> str:
+    return moment.strftime(BUCKET_FORMAT)
+
+def _hour_buckets(first: str, last: str) -> List[str]:
+    buckets = []
+    hour = datetime.strptime(first, BUCKET_FORMAT)
+    end = datetime.strptime(last, BUCKET_FORMAT)
+    while hour <= end:
+        buckets.append(_bucket_of(hour))
+        hour += timedelta(hours=1)
+    return buckets
+
+def queue_item(reminder: dict, bucket: str) -> dict:
+    item = {field: reminder.get(field) for field in QUEUE_FIELDS}
+    item.update({"id": reminder["id"], "pk": bucket, "reminder_id": reminder["id"]})
+    return item
+
+def _delete_item(item_id: str, bucket: str, etag: str = None):
+    """Delete a queue item (only if unchanged since `etag`, when given)"""
+    conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+    try:
+        _reminder_queue_container.delete_item(item=item_id, partition_key=bucket, **conditions)
+    except CosmosResourceNotFoundError:
+        pass
+
+def _unclaimed(item: dict) -> dict:
+    return {key: value for key, value in item.items() if not key.startswith("_") and key not in CLAIM_FIELDS}
+
+def new_worker_id() -> str:
+    """Identifies one dispatch run in claimed_by"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def enqueue_reminder(reminder: dict, previous: Optional[dict] = None, now: datetime = None):
+    """
+    Queue (or re-queue) an unsent reminder. `previous` is the stored reminder it
+    replaces, whose queue item is removed if it was in a different hour.
+    """
+    if previous and not previous.get("sent") and previous.get("reminder_date"):
+        remove_reminder(previous)
+    if reminder.get("sent"):
+        return None
+    # Reminders already due go into the current hour, which the cursor stays behind
+    bucket = max(reminder_bucket(reminder["reminder_date"]), _bucket_of(now or datetime.utcnow()))
+    return _reminder_queue_container.upsert_item(queue_item(reminder, bucket))
+
+def remove_reminder(reminder: dict):
+    """Take a reminder out of the queue (wherever enqueue_reminder put it)"""
+    bucket = reminder_bucket(reminder["reminder_date"])
+    _delete_item(reminder["id"], bucket)
+    # It may have been carried forward or queued late; those land in later hours
+    query = "SELECT c.id, c.pk FROM c WHERE c.id = @id AND c.pk > @bucket"
+    parameters = [{"name": "@id", "value": reminder["id"]}, {"name": "@bucket", "value": bucket}]
+    for item in _reminder_queue_container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True):
+        _delete_item(item["id"], item["pk"])
+
+def read_cursor_state(now: datetime = None) -> Tuple[str, Optional[str]]:
+    """(oldest hour bucket that may still hold queue items, the cursor's ETag or None)"""
+    try:
+        cursor = _reminder_queue_container.read_item(item=CURSOR_ID, partition_key=CURSOR_PK)
+        return cursor["next_bucket"], cursor["_etag"]
+    except CosmosResourceNotFoundError:
+        return _bucket_of((now or datetime.utcnow()) - timedelta(hours=REMINDER_QUEUE_LOOKBACK_HOURS)), None
+
+def read_cursor(now: datetime = None) -> str:
+    """Oldest hour bucket that may still hold queue items"""
+    return read_cursor_state(now)[0]
+
+def write_cursor(next_bucket: str, etag: str = None):
+    """
+    Move the cursor to next_bucket if it is unchanged since it was read with `etag`.
+    Otherwise (another run wrote it first, or no ETag is given) it is only ever moved
+    back, so one writer can't skip hours another still needs.
+    """
+    cursor = {"id": CURSOR_ID, "pk": CURSOR_PK, "type": "reminder_queue_cursor", "next_bucket": next_bucket}
+    if etag:
+        try:
+            return _reminder_queue_container.replace_item(
+                item=CURSOR_ID,
+                body=cursor,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified
+            )
+        except (CosmosAccessConditionFailedError, CosmosResourceNotFoundError):
+            pass
+
+    def move_back(doc):
+        doc["next_bucket"] = min(doc["next_bucket"], next_bucket)
+
+    return etag_merge(_reminder_queue_container, CURSOR_ID, CURSOR_PK, move_back, new_doc=lambda: dict(cursor))
+
+def find_due_items(now: datetime = None, first_bucket: str = None) -> List[dict]:
+    """
+    Queue items due by `now`, read from the hour buckets between the cursor (or
+    first_bucket, when the caller has already read it) and now
+    """
+    now = now or datetime.utcnow()
+    now_iso = now.isoformat()
+    buckets = _hour_buckets(first_bucket or read_cursor(now), _bucket_of(now))
+    if not buckets:
+        return []
+
+    if len(buckets) > REMINDER_QUEUE_MAX_BUCKETS_PER_QUERY:
+        query = "SELECT * FROM c WHERE c.pk >= @first AND c.pk <= @last AND c.reminder_date <= @now"
+        parameters = [
+            {"name": "@first", "value": buckets[0]},
+            {"name": "@last", "value": buckets[-1]},
+            {"name": "@now", "value": now_iso}
+        ]
+        return list(_reminder_queue_container.query_items(
+            query=query, parameters=parameters, enable_cross_partition_query=True
+        ))
+
+    def read_bucket(bucket):
+        return list(_reminder_queue_container.query_items(
+            query="SELECT * FROM c WHERE c.reminder_date <= @now",
+            parameters=[{"name": "@now", "value": now_iso}],
+            partition_key=bucket
+        ))
+
+    items = []
+    for bucket, rows, error in run_bounded(read_bucket, buckets):
+        if error:
+            raise error
+        items.extend(rows)
+    return items
+
+def claim_items(items: List[dict], worker_id: str, now: datetime = None,
+                lease_seconds: int = None, concurrency: int = None) -> Tuple[List[dict], List[dict]]:
+    """
+    Lease each item to worker_id with an ETag-conditional replace. Returns (claimed,
+    held): the items this worker now owns (with their new ETags) and the items
+    another worker holds an unexpired lease on or claimed first.
+    """
+    now = now or datetime.utcnow()
+    now_iso = now.isoformat()
+    claimed_until = (now + timedelta(seconds=lease_seconds or REMINDER_CLAIM_LEASE_SECONDS)).isoformat()
+
+    def claim(item):
+        if item.get("claimed_until") and item["claimed_until"] > now_iso and item.get("claimed_by") != worker_id:
+            return None
+        try:
+            return _reminder_queue_container.replace_item(
+                item=item["id"],
+                body={**_unclaimed(item), "claimed_by": worker_id, "claimed_until": claimed_until},
+                etag=item["_etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+        except (CosmosAccessConditionFailedError, CosmosResourceNotFoundError):
+            return None  # Another worker claimed (or completed) it first
+
+    claimed, held = [], []
+    for item, result, error in run_bounded(claim, items, concurrency):
+        if error:
+            logging.error(f"Error claiming reminder {item.get('id')}: {str(error)}")
+        if result:
+            claimed.append(result)
+        else:
+            held.append(item)
+    return claimed, held
+
+def complete_items(items: List[dict], concurrency: int = None) -> int:
+    """Delete delivered (claimed) items from the queue; returns how many were removed"""
+    def complete(item):
+        try:
+            _delete_item(item["id"], item["pk"], etag=item.get("_etag"))
+        except CosmosAccessConditionFailedError:
+            raise Exception("claim expired and was taken over by another worker")
+
+    results = run_bounded(complete, items, concurrency)
+    for item, _, error in results:
+        if error:
+            logging.error(f"Error removing reminder {item.get('id')} from the queue: {str(error)}")
+    return sum(1 for _, _, error in results if not error)
+
+def release_items(items: List[dict], held: List[dict] = (), now: datetime = None, concurrency: int = None,
+                  cursor_etag: str = None) -> int:
+    """
+    Give up the claims on undelivered items so the next run retries them. Items from
+    past hours are moved into the current one, then the cursor advances to the oldest
+    hour still in use (including hours with items `held` by other workers), at most to
+    CURSOR_SAFETY_BUCKETS hours before the current one. `cursor_etag` is the ETag the
+    cursor had when this run read it (see write_cursor). Returns how many items were
+    moved.
+    """
+    now = now or datetime.utcnow()
+    current = _bucket_of(now)
+
+    def release(item):
+        if item["pk"] >= current:
+            return _reminder_queue_container.replace_item(
+                item=item["id"],
+                body=_unclaimed(item),
+                etag=item["_etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+        _reminder_queue_container.upsert_item({**_unclaimed(item), "pk": current})
+        try:
+            _delete_item(item["id"], item["pk"], etag=item.get("_etag"))
+        except Exception:
+            # Keep only the old copy (it counts as stuck below), or the reminder would be sent twice
+            _delete_item(item["id"], current)
+            raise
+
+    results = run_bounded(release, items, concurrency)
+    stuck = [item["pk"] for item, _, error in results if error]
+    for item, _, error in results:
+        if error:
+            logging.error(f"Error releasing reminder {item.get('id')}: {str(error)}")
+
+    # Everything before the current hour has been delivered or moved, unless a move
+    # failed or another worker still holds it
+    oldest_safe = _bucket_of(now - timedelta(hours=CURSOR_SAFETY_BUCKETS))
+    write_cursor(min(stuck + [item["pk"] for item in held] + [oldest_safe]), etag=cursor_etag)
+    return sum(1 for item, _, error in results if not error and item["pk"] < current)
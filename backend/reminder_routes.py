@@ -2,9 +2,19 @@
 import azure.functions as func
 import json
 from datetime import datetime, timedelta
-from database import _container
+from database import _container, find_calendar_event
 from user_routes import verify_session
-from email_service import send_reminder_email
+from reminder_dispatcher import dispatch_due_reminders
+from reminder_queue import enqueue_reminder, remove_reminder
+
+def _save_reminder(reminder_data: dict):
+    """Store a reminder and (re-)queue it for dispatch"""
+    try:
+        previous = _container.read_item(item=reminder_data['id'], partition_key=reminder_data['id'])
+    except Exception:
+        previous = None
+    _container.upsert_item(reminder_data)
+    enqueue_reminder(reminder_data, previous=previous)
 
 def create_reminder(req: func.HttpRequest) -> func.HttpResponse:
     """Create a new reminder for an event"""
@@ -34,7 +44,7 @@ def create_reminder(req: func.HttpRequest) -> func.HttpResponse:
         reminder_data['sent'] = False
         
         # Save to database
-        _container.upsert_item(reminder_data)
+        _save_reminder(reminder_data)
         
         return func.HttpResponse(
             json.dumps({"message": "Reminder created successfully", "id": reminder_id}),
@@ -93,6 +103,8 @@ def delete_reminder(req: func.HttpRequest) -> func.HttpResponse:
         
         # Delete the reminder
         _container.delete_item(item=reminder_id, partition_key=reminder_id)
+        if not reminders[0].get('sent'):
+            remove_reminder(reminders[0])
         
         return func.HttpResponse(json.dumps({"message": "Reminder deleted successfully"}), status_code=200)
     except Exception as e:
@@ -101,46 +113,13 @@ def delete_reminder(req: func.HttpRequest) -> func.HttpResponse:
 def process_reminders(req: func.HttpRequest) -> func.HttpResponse:
     """Process due reminders and send notification emails (to be called by a timer trigger)"""
     try:
-        # Get current time
-        now = datetime.utcnow()
-        now_iso = now.isoformat()
-        
-        # Find reminders that are due but not sent yet
-        query = """
-        SELECT * FROM c 
-        WHERE c.type = 'reminder' 
-        AND c.sent = false 
-        AND c.reminder_date <= @now
-        """
-        parameters = [{"name": "@now", "value": now_iso}]
-        
-        reminders = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        
-        sent_count = 0
-        
-        # Process each reminder
-        for reminder in reminders:
-            user_email = reminder.get('user_email')
-            event_title = reminder.get('event_title')
-            event_date = reminder.get('event_date')
-            event_time = reminder.get('event_time')
-            
-            # Send reminder email
-            success = send_reminder_email(user_email, event_title, event_date, event_time)
-            
-            if success:
-                # Mark reminder as sent
-                reminder['sent'] = True
-                reminder['sent_at'] = now_iso
-                _container.upsert_item(reminder)
-                sent_count += 1
-        
+        summary = dispatch_due_reminders()
+
         return func.HttpResponse(
-            json.dumps({"message": f"Processed {len(reminders)} reminders, sent {sent_count} emails"}),
+            json.dumps({
+                "message": f"Processed {summary['due']} reminders, sent {summary['sent']} emails",
+                **summary
+            }),
             status_code=200
         )
     except Exception as e:
@@ -160,24 +139,12 @@ def create_event_reminder(req: func.HttpRequest) -> func.HttpResponse:
         if not event_id:
             return func.HttpResponse(json.dumps({"error": "Event ID is required"}), status_code=400)
         
-        # Query the event
-        query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @email"
-        parameters = [
-            {"name": "@id", "value": event_id},
-            {"name": "@email", "value": identity}
-        ]
-        
-        events = list(_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
+        # Look up the event in the events container
+        event = find_calendar_event(identity, event_id)
         
-        if not events:
+        if not event:
             return func.HttpResponse(json.dumps({"error": "Event not found"}), status_code=404)
         
-        event = events[0]
-        
         # Calculate reminder date (X days before event)
         event_date = datetime.fromisoformat(event.get('date').replace('Z', '+00:00'))
         reminder_date = event_date - timedelta(days=days_before)
@@ -198,7 +165,7 @@ def create_event_reminder(req: func.HttpRequest) -> func.HttpResponse:
         }
         
         # Save to database
-        _container.upsert_item(reminder_data)
+        _save_reminder(reminder_data)
         
         return func.HttpResponse(
             json.dumps({"message": "Event reminder created successfully", "id": reminder_data['id']}),
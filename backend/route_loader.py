@@ -0,0 +1,76 @@
+# route_loader.py
+"""
+Lazy route handler loading for function_app.py.
+
+function_app.py used to import every route module at the top, so every cold start
+paid for Cosmos, passlib, pydantic, requests, smtplib and the blob SDK before serving
+anything. Handlers are now resolved through lazy_handler(): the module is imported
+on the first call (in whichever worker thread gets there first) and the function is
+cached after that. Each import is timed; the timings are logged as they happen and
+are available from get_import_times().
+
+At startup log_startup_summary() logs function_app's own load time and the route
+modules left for first use. With ROUTE_IMPORT_PROFILE=true it imports those modules
+right away instead, so every import cost shows up in the startup log (this gives up
+the faster cold start, so it is meant for diagnosing, not for production).
+"""
+import os
+import time
+import logging
+import importlib
+import threading
+from typing import Callable, Dict, List
+
+ROUTE_IMPORT_PROFILE = os.environ.get("ROUTE_IMPORT_PROFILE", "false").lower() == "true"
+
+_import_times: Dict[str, float] = {}  # module -> milliseconds (including its own imports)
+_import_lock = threading.RLock()
+_deferred_modules: List[str] = []  # modules behind lazy handlers, in registration order
+
+def import_timed(module_name: str):
+    """importlib.import_module, recording how long the first import took"""
+    with _import_lock:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        if module_name not in _import_times:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            _import_times[module_name] = elapsed_ms
+            logging.info(f"Imported {module_name} in {elapsed_ms} ms")
+        return module
+
+def record_import_time(module_name: str, started: float):
+    """Record an import done eagerly (e.g. function_app's own top-level imports)"""
+    _import_times[module_name] = round((time.perf_counter() - started) * 1000, 1)
+
+def get_import_times() -> Dict[str, float]:
+    with _import_lock:
+        return dict(_import_times)
+
+def lazy_handler(module_name: str, name: str) -> Callable:
+    """A stand-in for `from module_name import name` that imports on first call"""
+    resolved = []
+    if module_name not in _deferred_modules:
+        _deferred_modules.append(module_name)
+
+    def handler(*args, **kwargs):
+        if not resolved:
+            resolved.append(getattr(import_timed(module_name), name))
+        return resolved[0](*args, **kwargs)
+
+    handler.__name__ = name
+    handler.__qualname__ = f"lazy:{module_name}.{name}"
+    return handler
+
+def log_startup_summary(app_module: str = "function_app"):
+    """Log the app's load time and the route modules deferred to first use (or, when profiling, their import times)"""
+    if ROUTE_IMPORT_PROFILE:
+        for module_name in _deferred_modules:
+            import_timed(module_name)
+    times = get_import_times()
+    pending = [module_name for module_name in _deferred_modules if module_name not in times]
+    imported = ", ".join(f"{name} {ms} ms" for name, ms in times.items() if name != app_module)
+    logging.info(
+        f"{app_module} loaded in {times.get(app_module)} ms; "
+        f"imported: {imported or 'none'}; "
+        f"deferred to first use: {', '.join(pending) or 'none'}"
+    )
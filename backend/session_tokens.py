@@ -0,0 +1,124 @@
+# session_tokens.py
+"""
+Stateless signed session tokens (SESSION_BACKEND=signed).
+
+Tokens are HS256 JWTs carrying the user's email, a session id (jti) and an expiry,
+so validating one is pure CPU. Keys come from SESSION_SIGNING_KEYS as a
+comma-separated list of "key_id:secret" pairs: the first key signs new tokens and
+every listed key is accepted for verification, which lets keys be rotated by
+prepending a new one and dropping the oldest once its tokens have expired.
+
+Each logged-out token gets its own small revocation document in the users container
+(id "session_revocation:<jti>") with a Cosmos TTL that runs out when the token
+expires, so logouts never contend on a shared document and nothing accumulates.
+(The users container needs TTL switched on, with no default, for them to be
+removed; expired ones are ignored either way.) Each instance re-reads the
+unexpired revocations at most every SESSION_REVOCATION_REFRESH_SECONDS.
+"""
+import os
+import time
+import uuid
+import threading
+import jwt
+from database import _container
+
+SESSION_SIGNING_KEYS = os.environ.get("SESSION_SIGNING_KEYS", "")
+SESSION_REVOCATION_REFRESH_SECONDS = int(os.environ.get("SESSION_REVOCATION_REFRESH_SECONDS", 30))
+REVOCATION_ID_PREFIX = "session_revocation:"
+
+_revoked = {}  # jti -> exp (unix seconds)
+_revoked_loaded_at = None
+_revoked_lock = threading.Lock()
+
+def _signing_keys() -> list:
+    """[(key_id, secret), ...] with the active signing key first."""
+    keys = []
+    for entry in SESSION_SIGNING_KEYS.split(","):
+        if ":" in entry:
+            key_id, secret = entry.strip().split(":", 1)
+            keys.append((key_id, secret))
+    if not keys:
+        raise ValueError("SESSION_SIGNING_KEYS is not configured")
+    return keys
+
+def issue_token(email: str, ttl_seconds: int) -> str:
+    key_id, secret = _signing_keys()[0]
+    now = int(time.time())
+    payload = {
+        "sub": email,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + ttl_seconds
+    }
+    return jwt.encode(payload, secret, algorithm="HS256", headers={"kid": key_id})
+
+def decode_token(token: str):
+    """Return (payload, None) for a valid, unrevoked token, else (None, error message)."""
+    try:
+        key_id = jwt.get_unverified_header(token).get("kid")
+        secret = dict(_signing_keys()).get(key_id)
+        if not secret:
+            return None, "Invalid session"
+        payload = jwt.decode(token, secret, algorithms=["HS256"], options={"require": ["sub", "jti", "exp"]})
+    except jwt.ExpiredSignatureError:
+        return None, "Session expired"
+    except jwt.InvalidTokenError:
+        return None, "Invalid session"
+
+    if is_revoked(payload["jti"]):
+        return None, "Invalid session"
+    return payload, None
+
+def _read_revocations() -> dict:
+    """jti -> exp for every revoked token that hasn't expired yet"""
+    query = "SELECT c.jti, c.exp FROM c WHERE c.type = 'session_revocation' AND c.exp > @now"
+    parameters = [{"name": "@now", "value": int(time.time())}]
+    return {
+        doc["jti"]: doc["exp"]
+        for doc in _container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True)
+    }
+
+def is_revoked(jti: str) -> bool:
+    global _revoked, _revoked_loaded_at
+    with _revoked_lock:
+        stale = _revoked_loaded_at is None or time.monotonic() - _revoked_loaded_at > SESSION_REVOCATION_REFRESH_SECONDS
+    if stale:
+        try:
+            revoked = _read_revocations()
+        except Exception as e:
+            print(f"Error refreshing session revocation list: {e}")
+            revoked = None
+        with _revoked_lock:
+            if revoked is not None:
+                _revoked = revoked
+            _revoked_loaded_at = time.monotonic()
+    with _revoked_lock:
+        return jti in _revoked
+
+def revoke_token(token: str) -> bool:
+    """Record a token's jti as revoked until the token expires."""
+    try:
+        key_id = jwt.get_unverified_header(token).get("kid")
+        secret = dict(_signing_keys()).get(key_id)
+        if not secret:
+            return False
+        payload = jwt.decode(token, secret, algorithms=["HS256"], options={"verify_exp": False})
+    except jwt.InvalidTokenError:
+        return False
+
+    now = int(time.time())
+    if payload.get("exp", 0) <= now:
+        return True  # Already unusable
+
+    doc_id = f"{REVOCATION_ID_PREFIX}{payload['jti']}"
+    _container.upsert_item({
+        "id": doc_id,
+        "type": "session_revocation",
+        "jti": payload["jti"],
+        "exp": payload["exp"],
+        "ttl": payload["exp"] - now  # Cosmos deletes it once the token could no longer be used
+    })
+
+    with _revoked_lock:
+        _revoked[payload["jti"]] = payload["exp"]
+    return True
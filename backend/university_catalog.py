@@ -0,0 +1,132 @@
+# university_catalog.py
+"""
+Normalized university catalog.
+
+Every university used to carry its own copy of the full majors list. Now the major
+names live once, in a shared dictionary document (id MAJOR_DICTIONARY_ID in the
+universities container) where a major's ID is its position in the list, and a
+university document only keeps sparse counts for the majors that have been picked:
+
+    {"id": "...", "name": "...", "counter": 3, "major_counts": {"12": 2, "40": 1}}
+
+expand_university() turns a compact document back into the shape the API has always
+returned ("majors": [{"major_name", "counter"}, ...] covering every known major), so
+only responses pay for the expansion. Documents still in the old shape are passed
+through unchanged and compacted the next time their counters are written.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from database import _uni_container, etag_merge
+
+MAJOR_DICTIONARY_ID = "catalog:majors"
+MAJOR_DICTIONARY_TTL_SECONDS = int(os.environ.get("MAJOR_DICTIONARY_TTL_SECONDS", 600))
+
+class MajorDictionary:
+    def __init__(self, ttl_seconds: int = MAJOR_DICTIONARY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}  # lowercased name -> id
+        self._loaded_at = None
+
+    def _load(self, doc: Optional[dict]):
+        names = doc.get("majors", []) if doc else []
+        with self._lock:
+            self._names = list(names)
+            self._ids = {name.lower(): i for i, name in enumerate(names)}
+            self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            try:
+                doc = _uni_container.read_item(item=MAJOR_DICTIONARY_ID, partition_key=MAJOR_DICTIONARY_ID)
+            except CosmosResourceNotFoundError:
+                doc = None
+            except Exception as e:
+                # Throttling, timeouts...: keep serving the names we have and try again next call
+                logging.warning(f"Could not refresh the major dictionary: {str(e)}")
+                return
+            self._load(doc)
+
+    def names(self) -> List[str]:
+        self._ensure_fresh()
+        return self._names
+
+    def add_all(self, major_names: List[str]):
+        """Append any majors the dictionary doesn't have yet (one write for the whole list, none if all are known)"""
+        self._ensure_fresh()
+        if all(name.lower() in self._ids for name in major_names):
+            return
+        def append_majors(doc):
+            known = {name.lower() for name in doc["majors"]}
+            for major_name in major_names:
+                if major_name.lower() not in known:
+                    doc["majors"].append(major_name)
+                    known.add(major_name.lower())
+
+        doc = etag_merge(
+            _uni_container,
+            MAJOR_DICTIONARY_ID,
+            MAJOR_DICTIONARY_ID,
+            append_majors,
+            new_doc=lambda: {"id": MAJOR_DICTIONARY_ID, "name": MAJOR_DICTIONARY_ID, "type": "major_dictionary", "majors": []}
+        )
+        self._load(doc)
+
+    def id_for(self, major_name: str, create: bool = False) -> Optional[int]:
+        """ID of a major (case-insensitive); with create=True, unknown majors are appended"""
+        self._ensure_fresh()
+        key = major_name.lower()
+        if key not in self._ids and create:
+            self.add_all([major_name])
+        return self._ids.get(key)
+
+major_dictionary = MajorDictionary()
+
+def is_catalog_document(doc: dict) -> bool:
+    """True for universities, False for the shared major dictionary"""
+    return doc.get("id") != MAJOR_DICTIONARY_ID
+
+def compact_university(doc: dict) -> dict:
+    """Move an old-style "majors" list into sparse "major_counts" (in place)"""
+    majors = doc.pop("majors", None)
+    counts = doc.setdefault("major_counts", {})
+    if majors:
+        # Register every name, not just the counted ones, so zero-count majors still expand
+        major_dictionary.add_all([major["major_name"] for major in majors])
+    for major in majors or []:
+        if major.get("counter"):
+            major_id = str(major_dictionary.id_for(major["major_name"], create=True))
+            counts[major_id] = counts.get(major_id, 0) + major["counter"]
+    return doc
+
+def add_major_counts(doc: dict, deltas: Dict[str, int]):
+    """Add {major_name: count} to a university document, compacting it if needed"""
+    compact_university(doc)
+    counts = doc["major_counts"]
+    for major_name, count in deltas.items():
+        major_id = str(major_dictionary.id_for(major_name, create=True))
+        counts[major_id] = counts.get(major_id, 0) + count
+
+def expand_university(doc: dict) -> dict:
+    """The API shape of a university: every known major with its counter"""
+    if doc is None or "major_counts" not in doc:
+        return doc
+    counts = doc["major_counts"]
+    expanded = {key: value for key, value in doc.items() if key != "major_counts"}
+    expanded["majors"] = [
+        {"major_name": name, "counter": counts.get(str(major_id), 0)}
+        for major_id, name in enumerate(major_dictionary.names())
+    ]
+    return expanded
+
+def get_compact_catalog(universities: List[dict]) -> dict:
+    """The normalized catalog for clients that can expand it themselves (old-style documents are left as stored)"""
+    return {
+        "majors": major_dictionary.names(),
+        "universities": universities
+    }
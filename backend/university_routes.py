@@ -4,7 +4,8 @@ import json
 import datetime
 import uuid
 from user_routes import verify_session
-from database import get_user_by_email, get_university_doc, _container
+from database import get_user_by_email, get_university_doc, _container, create_module_docs
+from module_templates import module_templates
 
 def get_university_modules(req: func.HttpRequest) -> func.HttpResponse:
     """Get default modules for a specific university and degree"""
@@ -32,166 +33,8 @@ def get_university_modules(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400
             )
             
-        # In a real implementation, this would query a database of university module templates
-        # For demonstration, we'll return some example modules for University of Southampton CS
-        
-        modules = []
-        
-        if university_name == "University of Southampton" and degree_name == "COMPUTER SCIENCE":
-            # Year 1 modules
-            modules.extend([
-                {
-                    "name": "Programming I",
-                    "code": "COMP1001",
-                    "credits": 15,
-                    "year": "Year 1",
-                    "semester": 1,
-                    "description": "Introduction to programming principles and practices using Python"
-                },
-                {
-                    "name": "Computer Systems I",
-                    "code": "COMP1002",
-                    "credits": 15,
-                    "year": "Year 1",
-                    "semester": 1,
-                    "description": "Introduction to computer architecture and systems"
-                },
-                {
-                    "name": "Foundations of Computer Science",
-                    "code": "COMP1003",
-                    "credits": 15,
-                    "year": "Year 1",
-                    "semester": 1,
-                    "description": "Mathematical foundations of computing"
-                },
-                {
-                    "name": "Professional Development",
-                    "code": "COMP1004",
-                    "credits": 15,
-                    "year": "Year 1",
-                    "semester": 1,
-                    "description": "Development of professional and transferable skills"
-                },
-                {
-                    "name": "Data Structures and Algorithms",
-                    "code": "COMP1005",
-                    "credits": 15,
-                    "year": "Year 1",
-                    "semester": 2,
-                    "description": "Study of fundamental data structures and algorithms"
-                },
-                {
-                    "name": "Web Development",
-                    "code": "COMP1006",
-                    "credits": 15,
-                    "year": "Year 1",
-                    "semester": 2,
-                    "description": "Design and implementation of web-based applications"
-                }
-            ])
-            
-            # Year 2 modules
-            modules.extend([
-                {
-                    "name": "Programming II",
-                    "code": "COMP2001",
-                    "credits": 15,
-                    "year": "Year 2",
-                    "semester": 1,
-                    "description": "Advanced programming concepts using Java"
-                },
-                {
-                    "name": "Software Engineering",
-                    "code": "COMP2002",
-                    "credits": 15,
-                    "year": "Year 2",
-                    "semester": 1,
-                    "description": "Software development methodologies and practices"
-                },
-                {
-                    "name": "Intelligent Systems",
-                    "code": "COMP2003",
-                    "credits": 15,
-                    "year": "Year 2",
-                    "semester": 1,
-                    "description": "Introduction to artificial intelligence and machine learning"
-                },
-                {
-                    "name": "Computer Networks",
-                    "code": "COMP2004",
-                    "credits": 15,
-                    "year": "Year 2",
-                    "semester": 2,
-                    "description": "Principles and practice of computer networking"
-                },
-                {
-                    "name": "Distributed Systems",
-                    "code": "COMP2005",
-                    "credits": 15,
-                    "year": "Year 2",
-                    "semester": 2,
-                    "description": "Design and implementation of distributed computing systems"
-                }
-            ])
-            
-            # Year 3 modules
-            modules.extend([
-                {
-                    "name": "Final Year Project",
-                    "code": "COMP3001",
-                    "credits": 30,
-                    "year": "Year 3",
-                    "semester": 1,
-                    "description": "Individual research and development project"
-                },
-                {
-                    "name": "Cybersecurity",
-                    "code": "COMP3002",
-                    "credits": 15,
-                    "year": "Year 3",
-                    "semester": 1,
-                    "description": "Security principles and practices in computing"
-                },
-                {
-                    "name": "Data Mining",
-                    "code": "COMP3003",
-                    "credits": 15,
-                    "year": "Year 3",
-                    "semester": 1,
-                    "description": "Techniques for knowledge discovery in databases"
-                },
-                {
-                    "name": "Advanced Databases",
-                    "code": "COMP3004",
-                    "credits": 15,
-                    "year": "Year 3",
-                    "semester": 2,
-                    "description": "Advanced concepts in database management systems"
-                },
-                {
-                    "name": "Computer Vision",
-                    "code": "COMP3005",
-                    "credits": 15,
-                    "year": "Year 3",
-                    "semester": 2,
-                    "description": "Theory and applications of computer vision"
-                }
-            ])
-        
-        # Group modules by year and semester
-        organized = {}
-        
-        for module in modules:
-            year = module.get("year")
-            semester = module.get("semester")
-            
-            if year not in organized:
-                organized[year] = {}
-                
-            if semester not in organized[year]:
-                organized[year][semester] = []
-                
-            organized[year][semester].append(module)
+        # Templates grouped by year and semester
+        organized = module_templates.organized(university_name, degree_name)
         
         return func.HttpResponse(json.dumps(organized), status_code=200)
     except Exception as e:
@@ -287,159 +130,14 @@ def import_template_modules(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400
             )
             
-        # Get template modules
-        # In a real implementation, this would query a database of university module templates
-        # For demonstration, we use the same example modules as in get_university_modules
-        
-        modules = []
-        
-        if university_name == "University of Southampton" and degree_name == "COMPUTER SCIENCE":
-            # Filter for requested year
-            if year == "Year 1":
-                modules.extend([
-                    {
-                        "name": "Programming I",
-                        "code": "COMP1001",
-                        "credits": 15,
-                        "year": "Year 1",
-                        "semester": 1,
-                        "description": "Introduction to programming principles and practices using Python"
-                    },
-                    {
-                        "name": "Computer Systems I",
-                        "code": "COMP1002",
-                        "credits": 15,
-                        "year": "Year 1",
-                        "semester": 1,
-                        "description": "Introduction to computer architecture and systems"
-                    },
-                    {
-                        "name": "Foundations of Computer Science",
-                        "code": "COMP1003",
-                        "credits": 15,
-                        "year": "Year 1",
-                        "semester": 1,
-                        "description": "Mathematical foundations of computing"
-                    },
-                    {
-                        "name": "Professional Development",
-                        "code": "COMP1004",
-                        "credits": 15,
-                        "year": "Year 1",
-                        "semester": 1,
-                        "description": "Development of professional and transferable skills"
-                    },
-                    {
-                        "name": "Data Structures and Algorithms",
-                        "code": "COMP1005",
-                        "credits": 15,
-                        "year": "Year 1",
-                        "semester": 2,
-                        "description": "Study of fundamental data structures and algorithms"
-                    },
-                    {
-                        "name": "Web Development",
-                        "code": "COMP1006",
-                        "credits": 15,
-                        "year": "Year 1",
-                        "semester": 2,
-                        "description": "Design and implementation of web-based applications"
-                    }
-                ])
-            elif year == "Year 2":
-                modules.extend([
-                    {
-                        "name": "Programming II",
-                        "code": "COMP2001",
-                        "credits": 15,
-                        "year": "Year 2",
-                        "semester": 1,
-                        "description": "Advanced programming concepts using Java"
-                    },
-                    {
-                        "name": "Software Engineering",
-                        "code": "COMP2002",
-                        "credits": 15,
-                        "year": "Year 2",
-                        "semester": 1,
-                        "description": "Software development methodologies and practices"
-                    },
-                    {
-                        "name": "Intelligent Systems",
-                        "code": "COMP2003",
-                        "credits": 15,
-                        "year": "Year 2",
-                        "semester": 1,
-                        "description": "Introduction to artificial intelligence and machine learning"
-                    },
-                    {
-                        "name": "Computer Networks",
-                        "code": "COMP2004",
-                        "credits": 15,
-                        "year": "Year 2",
-                        "semester": 2,
-                        "description": "Principles and practice of computer networking"
-                    },
-                    {
-                        "name": "Distributed Systems",
-                        "code": "COMP2005",
-                        "credits": 15,
-                        "year": "Year 2",
-                        "semester": 2,
-                        "description": "Design and implementation of distributed computing systems"
-                    }
-                ])
-            elif year == "Year 3":
-                modules.extend([
-                    {
-                        "name": "Final Year Project",
-                        "code": "COMP3001",
-                        "credits": 30,
-                        "year": "Year 3",
-                        "semester": 1,
-                        "description": "Individual research and development project"
-                    },
-                    {
-                        "name": "Cybersecurity",
-                        "code": "COMP3002",
-                        "credits": 15,
-                        "year": "Year 3",
-                        "semester": 1,
-                        "description": "Security principles and practices in computing"
-                    },
-                    {
-                        "name": "Data Mining",
-                        "code": "COMP3003",
-                        "credits": 15,
-                        "year": "Year 3",
-                        "semester": 1,
-                        "description": "Techniques for knowledge discovery in databases"
-                    },
-                    {
-                        "name": "Advanced Databases",
-                        "code": "COMP3004",
-                        "credits": 15,
-                        "year": "Year 3",
-                        "semester": 2,
-                        "description": "Advanced concepts in database management systems"
-                    },
-                    {
-                        "name": "Computer Vision",
-                        "code": "COMP3005",
-                        "credits": 15,
-                        "year": "Year 3",
-                        "semester": 2,
-                        "description": "Theory and applications of computer vision"
-                    }
-                ])
-        
-        # Further filter by semester if requested
+        # Get template modules for the requested year (and semester)
         if semester:
             semester = int(semester)
-            modules = [m for m in modules if m.get("semester") == semester]
+        modules = module_templates.modules_for(university_name, degree_name, year, semester or None)
             
-        # Add the modules to the user's account
-        imported_count = 0
+        # Build the module documents, then write them in one bulk call
+        now = datetime.datetime.utcnow().isoformat()
+        module_docs = []
         
         for template in modules:
             # Create module object
@@ -469,19 +167,17 @@ def import_template_modules(req: func.HttpRequest) -> func.HttpResponse:
                         "score": 0
                     }
                 ],
-                "created_at": datetime.datetime.utcnow().isoformat(),
-                "updated_at": datetime.datetime.utcnow().isoformat()
+                "created_at": now,
+                "updated_at": now
             }
+            module_docs.append(module_data)
             
-            # Create in database
-            _container.create_item(body=module_data)
-            imported_count += 1
+        results = create_module_docs(identity, module_docs)
+        imported_count = sum(1 for result in results if result["ok"])
+        failed = [{"id": result["id"], "error": result["error"]} for result in results if not result["ok"]]
             
         # Add activity
         if imported_count > 0:
-            # Get user doc again
-            user_doc = get_user_by_email(identity)
-            
             # Initialize dashboardConfig if needed
             if "dashboardConfig" not in user_doc:
                 user_doc["dashboardConfig"] = {}
@@ -510,7 +206,8 @@ def import_template_modules(req: func.HttpRequest) -> func.HttpResponse:
         return func.HttpResponse(
             json.dumps({
                 "message": f"Successfully imported {imported_count} modules",
-                "importedCount": imported_count
+                "importedCount": imported_count,
+                "failed": failed
             }),
             status_code=200
         )
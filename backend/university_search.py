@@ -0,0 +1,143 @@
+# university_search.py
+"""
+In-memory search index over the university catalog.
+
+Only (id, name, counter) is held in memory. A query is answered from two indexes:
+a prefix trie over the words of each name (so "south" finds "University of
+Southampton" before anything else) and a trigram index that finds the remaining
+substring matches, which keeps the old CONTAINS(LOWER(c.name), ...) behaviour.
+Each group is ranked by counter (most popular first). Only the requested page is
+loaded from Cosmos, with one ARRAY_CONTAINS query.
+
+The index is built on first use and rebuilt once it is older than
+UNIVERSITY_INDEX_TTL_SECONDS. Counter changes made by this instance are applied
+in place via record(); mark_dirty() forces a rebuild on the next search.
+"""
+import os
+import re
+import time
+import threading
+from typing import Dict, List, Set, Tuple
+from database import _uni_container
+from university_catalog import MAJOR_DICTIONARY_ID, expand_university
+
+UNIVERSITY_INDEX_TTL_SECONDS = int(os.environ.get("UNIVERSITY_INDEX_TTL_SECONDS", 600))
+
+_WORD_RE = re.compile(r"\w+")
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ids: Set[str] = set()
+
+class UniversitySearchIndex:
+    def __init__(self, ttl_seconds: int = UNIVERSITY_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._names: Dict[str, str] = {}  # id -> lowercased name
+        self._counters: Dict[str, int] = {}
+        self._trie = _TrieNode()
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    def _add(self, doc_id: str, name: str, counter: int):
+        name_lower = (name or "").lower()
+        self._names[doc_id] = name_lower
+        self._counters[doc_id] = counter or 0
+
+        for word in _WORD_RE.findall(name_lower):
+            node = self._trie
+            for char in word:
+                node = node.children.setdefault(char, _TrieNode())
+                node.ids.add(doc_id)
+        for gram in _trigrams(name_lower):
+            self._trigrams.setdefault(gram, set()).add(doc_id)
+
+    def build(self):
+        """(Re)load the catalog projection from Cosmos and rebuild both indexes"""
+        rows = list(_uni_container.query_items(
+            query="SELECT c.id, c.name, c.counter FROM c WHERE c.id != @dictionary_id",
+            parameters=[{"name": "@dictionary_id", "value": MAJOR_DICTIONARY_ID}],
+            enable_cross_partition_query=True
+        ))
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row["id"], row.get("name"), row.get("counter", 0))
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > self.ttl_seconds:
+            self.build()
+
+    def mark_dirty(self):
+        self._built_at = None
+
+    def record(self, doc: dict):
+        """Apply a university document written by this instance (new name or new counter)"""
+        if self._built_at is None:
+            return  # Not built yet; the next build will include it
+        with self._lock:
+            if doc["id"] in self._names:
+                self._counters[doc["id"]] = doc.get("counter", 0)
+            else:
+                self._add(doc["id"], doc.get("name"), doc.get("counter", 0))
+
+    def _rank(self, ids) -> List[str]:
+        return sorted(ids, key=lambda doc_id: (-self._counters.get(doc_id, 0), self._names[doc_id]))
+
+    def search_ids(self, query: str) -> List[str]:
+        """All matching ids: word-prefix matches first, then other substring matches"""
+        self._ensure_fresh()
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        with self._lock:
+            # The trie handles a single word; for a phrase, start from the first word
+            words = _WORD_RE.findall(query)
+            prefix_hits: Set[str] = set()
+            if words:
+                node = self._trie
+                for char in words[0]:
+                    node = node.children.get(char)
+                    if node is None:
+                        break
+                else:
+                    prefix_hits = {doc_id for doc_id in node.ids if query in self._names[doc_id]}
+
+            if len(query) < 3:
+                # Too short for trigrams; scan the (small) name table directly
+                substring_hits = {doc_id for doc_id, name in self._names.items() if query in name}
+            else:
+                postings = sorted((self._trigrams.get(gram, set()) for gram in _trigrams(query)), key=len)
+                candidates = set.intersection(*postings) if postings else set()
+                substring_hits = {doc_id for doc_id in candidates if query in self._names[doc_id]}
+
+            return self._rank(prefix_hits) + self._rank(substring_hits - prefix_hits)
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Tuple[List[dict], int]:
+        """Return (full university documents for the requested page, total number of matches)"""
+        ids = self.search_ids(query)
+        page = ids[offset:offset + limit]
+        if not page:
+            return [], len(ids)
+
+        docs = _uni_container.query_items(
+            query="SELECT * FROM c WHERE ARRAY_CONTAINS(@ids, c.id)",
+            parameters=[{"name": "@ids", "value": page}],
+            enable_cross_partition_query=True
+        )
+        by_id = {doc["id"]: doc for doc in docs}
+        return [expand_university(by_id[doc_id]) for doc_id in page if doc_id in by_id], len(ids)
+
+university_index = UniversitySearchIndex()
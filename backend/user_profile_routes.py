@@ -6,6 +6,7 @@ from models import UserProfileUpdate
 from database import get_user_by_email, _container
 from user_routes import verify_session
 from blob_storage import generate_avatar_upload_url
+from avatar_thumbnails import avatar_thumbnails_for
 
 def get_user_profile(req: func.HttpRequest) -> func.HttpResponse:
     is_valid, identity = verify_session(req)
@@ -24,6 +25,7 @@ def get_user_profile(req: func.HttpRequest) -> func.HttpResponse:
             "lastName": user_doc.get("lastName", ""),
             "email": user_doc.get("email", ""),
             "avatar": user_doc.get("avatar", ""),
+            "avatarThumbnails": avatar_thumbnails_for(user_doc),
             "dateOfBirth": user_doc.get("dateOfBirth", ""),
             "phone": user_doc.get("phone", ""),
             "bio": user_doc.get("bio", ""),
@@ -65,6 +67,7 @@ def update_user_profile(req: func.HttpRequest) -> func.HttpResponse:
             "lastName": user_doc.get("lastName", ""),
             "email": user_doc.get("email", ""),
             "avatar": user_doc.get("avatar", ""),
+            "avatarThumbnails": avatar_thumbnails_for(user_doc),
             "dateOfBirth": user_doc.get("dateOfBirth", ""),
             "phone": user_doc.get("phone", ""),
             "bio": user_doc.get("bio", "")
@@ -4,9 +4,13 @@ import os
 import json
 import datetime
 import uuid
-from passlib.hash import bcrypt
+import time
+import threading
+from collections import OrderedDict
 from pydantic import ValidationError
 from azure.functions import HttpRequest, HttpResponse
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError
 
 from models import User, UserLogin
 from database import (
@@ -14,15 +18,62 @@ from database import (
     get_user_by_email,
     increment_university_and_major_counter,
     get_university_doc,
-    search_universities,
     update_user_calculator,
     _container
 )
+from university_search import university_index
+from password_hashing import hash_password, verify_and_update
+from university_catalog import expand_university, get_compact_catalog, is_catalog_document
 
 # Session configuration
 SESSION_COOKIE_NAME = "session_id"
 SESSION_TIMEOUT_SECONDS = 2592000  # 30 days
 
+# "cosmos": session documents in the users container (default)
+# "signed": stateless HMAC-signed tokens, see session_tokens.py
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "cosmos").lower()
+
+# In-process session cache. Entries are re-read from the database after
+# SESSION_CACHE_TTL_SECONDS, which bounds how long a logout on another instance
+# can go unnoticed here.
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("SESSION_CACHE_MAX_ENTRIES", 10000))
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get("SESSION_CACHE_TTL_SECONDS", 300))
+
+_session_cache = OrderedDict()  # session_id -> (email, created datetime or None, cached_at)
+_session_cache_lock = threading.Lock()
+_session_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+def _get_cached_session(session_id: str):
+    """Return (email, created) from the cache, or None on a miss or stale entry."""
+    with _session_cache_lock:
+        entry = _session_cache.get(session_id)
+        if entry is None or time.monotonic() - entry[2] > SESSION_CACHE_TTL_SECONDS:
+            if entry is not None:
+                del _session_cache[session_id]
+            _session_cache_stats["misses"] += 1
+            return None
+        _session_cache.move_to_end(session_id)
+        _session_cache_stats["hits"] += 1
+        return entry[0], entry[1]
+
+def _cache_session(session_id: str, email: str, created):
+    with _session_cache_lock:
+        _session_cache[session_id] = (email, created, time.monotonic())
+        _session_cache.move_to_end(session_id)
+        while len(_session_cache) > SESSION_CACHE_MAX_ENTRIES:
+            _session_cache.popitem(last=False)
+            _session_cache_stats["evictions"] += 1
+
+def invalidate_cached_session(session_id: str):
+    with _session_cache_lock:
+        if _session_cache.pop(session_id, None) is not None:
+            _session_cache_stats["invalidations"] += 1
+
+def get_session_cache_stats() -> dict:
+    """Hit/miss counters and current size of the session cache."""
+    with _session_cache_lock:
+        return dict(_session_cache_stats, size=len(_session_cache))
+
 def get_session(session_id: str) -> dict:
     """Get session from database instead of memory."""
     try:
@@ -33,7 +84,14 @@ def get_session(session_id: str) -> dict:
         return None
 
 def create_session(email: str) -> str:
-    """Create a session for the given email, store in database, return session_id."""
+    """Create a session for the given email and return the cookie value."""
+    if SESSION_BACKEND == "signed":
+        from session_tokens import issue_token
+        return issue_token(email, SESSION_TIMEOUT_SECONDS)
+    return _create_document_session(email)
+
+def _create_document_session(email: str) -> str:
+    """Create a session document in the database and return its session_id."""
     session_id = uuid.uuid4().hex
     session_doc = {
         "id": f"session:{session_id}",
@@ -64,27 +122,44 @@ def verify_session(req: HttpRequest) -> (bool, str):
     session_id = cookies.get(SESSION_COOKIE_NAME)
     if not session_id:
         return False, "Missing session_id cookie"
+
+    if SESSION_BACKEND == "signed":
+        from session_tokens import decode_token
+        payload, error = decode_token(session_id)
+        if not payload:
+            return False, error
+        return True, payload["sub"]
     
-    session = get_session(session_id)
-    if not session:
-        return False, "Invalid session"
+    cached = _get_cached_session(session_id)
+    if cached:
+        email, created = cached
+    else:
+        session = get_session(session_id)
+        if not session:
+            return False, "Invalid session"
+
+        email = session["email"]
+        try:
+            created = datetime.datetime.fromisoformat(session["created"])
+        except Exception as e:
+            print(f"Error checking session expiration: {e}")
+            # Continue if there's an error parsing the date
+            created = None
+        _cache_session(session_id, email, created)
 
     # Optional: enforce actual expiration
-    try:
-        created = datetime.datetime.fromisoformat(session["created"])
+    if created is not None:
         age_seconds = (datetime.datetime.utcnow() - created).total_seconds()
         if age_seconds > SESSION_TIMEOUT_SECONDS:
             # Session expired
+            invalidate_cached_session(session_id)
             try:
                 _container.delete_item(item=f"session:{session_id}", partition_key=f"session:{session_id}")
             except Exception as e:
                 print(f"Error deleting expired session: {e}")
             return False, "Session expired"
-    except Exception as e:
-        print(f"Error checking session expiration: {e}")
-        # Continue if there's an error parsing the date
 
-    return True, session["email"]
+    return True, email
 
 
 def register_user(req: HttpRequest) -> HttpResponse:
@@ -111,7 +186,7 @@ def register_user(req: HttpRequest) -> HttpResponse:
         )
 
     generated_userid = str(uuid.uuid4())
-    hashed_password = bcrypt.hash(user_in.password)
+    hashed_password = hash_password(user_in.password)
     user_doc = {
         "id": user_in.email,  # email as partition key
         "userid": generated_userid,
@@ -175,13 +250,30 @@ def login_user(req: HttpRequest) -> HttpResponse:
             mimetype="application/json"
         )
 
-    if not bcrypt.verify(user_in.password, user_doc["password"]):
+    password_ok, new_hash = verify_and_update(user_in.password, user_doc["password"])
+    if not password_ok:
         return HttpResponse(
             json.dumps({"error": "Invalid email or password."}),
             status_code=401,
             mimetype="application/json"
         )
 
+    # The stored hash used a different BCRYPT_ROUNDS; replace it while we have the password,
+    # unless the document changed since we read it (e.g. a concurrent password change)
+    if new_hash:
+        try:
+            _container.patch_item(
+                item=user_doc["id"],
+                partition_key=user_doc["id"],
+                patch_operations=[{"op": "set", "path": "/password", "value": new_hash}],
+                etag=user_doc["_etag"],
+                match_condition=MatchConditions.IfNotModified
+            )
+        except CosmosAccessConditionFailedError:
+            pass  # Re-hashed on a later login
+        except Exception as e:
+            print(f"Error re-hashing password: {str(e)}")
+
     session_id = create_session(user_doc["email"])
     response = HttpResponse(
         json.dumps({"message": "Login successful."}),
@@ -220,7 +312,11 @@ def get_universities_endpoint(req: HttpRequest) -> HttpResponse:
     # (unchanged)
     try:
         from database import get_all_universities_docs
-        docs = get_all_universities_docs()
+        docs = [doc for doc in get_all_universities_docs() if is_catalog_document(doc)]
+        # ?format=compact returns the normalized catalog (shared major list + sparse counts)
+        if req.params.get("format") == "compact":
+            return HttpResponse(json.dumps(get_compact_catalog(docs)), status_code=200, mimetype="application/json")
+        docs = [expand_university(doc) for doc in docs]
         return HttpResponse(json.dumps(docs), status_code=200, mimetype="application/json")
     except Exception as e:
         return HttpResponse(json.dumps({"error": str(e)}),
@@ -238,7 +334,7 @@ def get_university_endpoint(req: HttpRequest) -> HttpResponse:
             mimetype="application/json"
         )
     try:
-        doc = get_university_doc(name)
+        doc = expand_university(get_university_doc(name))
         if not doc:
             return HttpResponse(
                 json.dumps({"error": "University not found."}),
@@ -365,8 +461,11 @@ def search_universities_endpoint(req: HttpRequest) -> HttpResponse:
                             status_code=400,
                             mimetype="application/json")
     try:
-        results = search_universities(query, limit=limit, offset=offset)
-        return HttpResponse(json.dumps(results), status_code=200, mimetype="application/json")
+        results, total = university_index.search(query, limit=limit, offset=offset)
+        return HttpResponse(json.dumps(results),
+                            status_code=200,
+                            mimetype="application/json",
+                            headers={"X-Total-Count": str(total)})
     except Exception as e:
         return HttpResponse(json.dumps({"error": str(e)}),
                             status_code=500,
@@ -378,7 +477,14 @@ def logout_user(req: HttpRequest) -> HttpResponse:
     cookies = parse_cookies(req)
     session_id = cookies.get(SESSION_COOKIE_NAME)
     
-    if session_id:
+    if session_id and SESSION_BACKEND == "signed":
+        try:
+            from session_tokens import revoke_token
+            revoke_token(session_id)
+        except Exception as e:
+            print(f"Error revoking session token: {e}")
+    elif session_id:
+        invalidate_cached_session(session_id)
         try:
             # Delete session from database
             _container.delete_item(
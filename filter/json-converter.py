@@ -9,27 +9,35 @@ output_file = 'universities.json'
 with open(universities_file, 'r', encoding='utf-8') as f:
     university_lines = [line.strip() for line in f if line.strip()]
 
-# Read majors from CSV (each line is one major name)
+# Read majors from CSV (each line is one major name, after a "Major" header)
 with open(majors_file, 'r', encoding='utf-8') as f:
     major_lines = [line.strip() for line in f if line.strip()]
+if major_lines and major_lines[0].lower() == 'major':
+    major_lines = major_lines[1:]
 
-# Create a list of major objects (each with a counter initialized to 0)
-majors_list = [{"major_name": major, "counter": 0} for major in major_lines]
+# Create the normalized catalog:
+# - "majors" is the major list; a major's ID in this file is its index in the list.
+# - Each university keeps sparse counters keyed by major ID, so a new university
+#   starts with an empty "major_counts" instead of its own copy of every major.
+# Load it with `python migrations.py seed-catalog` (from backend/): the majors are
+# merged into the "catalog:majors" dictionary by name, so the IDs used in Cosmos
+# always come from that dictionary, not from positions in this file.
+catalog = {
+    "majors": major_lines,
+    "universities": [
+        {
+            "id": uni,
+            "name": uni,
+            "counter": 0,
+            "major_counts": {}
+        }
+        for uni in university_lines
+    ]
+}
 
-# Create the JSON data:
-# For each university, include its name, counter, and the list of majors.
-# (Here every university gets the same full list of majors.)
-universities_json = [
-    {
-        "name": uni,
-        "counter": 0,
-        "majors": majors_list
-    }
-    for uni in university_lines
-]
-
-# Write the JSON data to the output file with pretty formatting
+# Write compact JSON; the catalog is data for loading, not for reading by hand
 with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(universities_json, f, indent=2, ensure_ascii=False)
+    json.dump(catalog, f, separators=(',', ':'), ensure_ascii=False)
 
-print(f"Successfully created {output_file} with {len(universities_json)} university entries.")
+print(f"Successfully created {output_file} with {len(catalog['universities'])} university entries "
+      f"and {len(catalog['majors'])} majors.")